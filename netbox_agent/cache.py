@@ -0,0 +1,107 @@
+import logging
+import threading
+
+from netbox_agent.capabilities import get_capabilities
+from netbox_agent.config import config
+from netbox_agent.state import load_state, save_state
+
+
+class NetboxCache:
+    """
+    Run-scoped identity map for NetBox reference objects
+
+    Sites, racks, roles, device types, platforms, tags, manufacturers... are
+    looked up many times during a single run but never change under our feet.
+    Lookups are memoized by (endpoint, filters) so every repeated call returns
+    the very same `Record` instead of issuing a new GET.
+
+    Only found objects are kept: a lookup returning `None` is retried on the
+    next call, as the caller is usually about to create the object and will
+    `store()` it.
+
+    The cache is shared by the concurrent sync phases, only the bookkeeping
+    is done under the lock: two threads missing the same key both issue the
+    lookup. The creations of `get_or_create()` are serialized, so that two
+    phases don't create the same object.
+    """
+
+    def __init__(self):
+        self.records = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.create_lock = threading.Lock()
+
+    def _key(self, endpoint, filters):
+        return (endpoint.url, tuple(sorted(filters.items())))
+
+    def get(self, endpoint, **filters):
+        key = self._key(endpoint, filters)
+        with self.lock:
+            if key in self.records:
+                self.hits += 1
+                return self.records[key]
+            self.misses += 1
+        record = endpoint.get(**filters)
+        if record is not None:
+            with self.lock:
+                record = self.records.setdefault(key, record)
+        return record
+
+    def store(self, endpoint, record, **filters):
+        """
+        Register a freshly created `record` so that the next `get()` with
+        the same `filters` returns it
+        """
+        with self.lock:
+            self.records[self._key(endpoint, filters)] = record
+        return record
+
+    def get_or_create(self, endpoint, create, **filters):
+        """
+        Return the object matching `filters`, or the one returned by
+        `create()` (None when planned)
+        """
+        record = self.get(endpoint, **filters)
+        if record is not None:
+            return record
+        with self.create_lock:
+            # another phase may have created it in the meantime
+            record = self.get(endpoint, **filters)
+            if record is None:
+                record = create()
+                if record is not None:
+                    self.store(endpoint, record, **filters)
+        return record
+
+    def clear(self):
+        with self.lock:
+            self.records = {}
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "records": len(self.records)}
+
+    def log_stats(self):
+        logging.debug(
+            "NetBox lookup cache: {hits} hits, {misses} misses ({records} records)".format(
+                **self.stats()
+            )
+        )
+
+
+cache = NetboxCache()
+
+
+def get_choices(endpoint):
+    """
+    Return `endpoint.choices()`, cached on disk for the NetBox instance and
+    version as those large OPTIONS responses only change between releases
+    """
+    name = "choices-" + "-".join(endpoint.url.rstrip("/").split("/")[-2:])
+    key = {"url": config.netbox.url, "version": get_capabilities().version}
+
+    choices = load_state(name, key, config.cache.choices_ttl)
+    if choices is None:
+        choices = endpoint.choices()
+        save_state(name, key, choices)
+    return choices
@@ -0,0 +1,63 @@
+import logging
+import re
+
+import pynetbox
+from packaging import version
+
+from netbox_agent.config import config
+from netbox_agent.config import netbox_instance as nb
+from netbox_agent.state import load_state, save_state
+
+
+class Capabilities:
+    """
+    Features of the Netbox instance the agent talks to
+
+    They are derived from the Netbox version, probed once per run with a
+    single `/api/status/` call, so that the code never has to branch on
+    `nb.version` (which issues an HTTP request each time it is accessed).
+    Only the features which differ between the supported versions (3.7 and
+    later) are listed.
+    """
+
+    def __init__(self, netbox_version):
+        self.version = netbox_version
+        self._version = version.parse(netbox_version)
+
+        # MAC addresses are objects of their own since Netbox 4.2
+        self.has_mac_address_objects = self.at_least("4.2")
+
+    def at_least(self, netbox_version):
+        return self._version >= version.parse(netbox_version)
+
+
+def probe_netbox_version():
+    try:
+        netbox_version = nb.status()["netbox-version"]
+    except (pynetbox.RequestError, KeyError):
+        netbox_version = nb.version
+    # Some builds report versions such as `4.2.3-Docker-3.2.0`
+    match = re.match(r"v?(\d+(\.\d+)*)", netbox_version or "")
+    if match is None:
+        raise Exception("Unable to find Netbox version (got: {})".format(netbox_version))
+    return match.group(1)
+
+
+_capabilities = None
+
+
+def get_capabilities():
+    """
+    Return the Netbox capabilities, probed once per run and cached on disk
+    for `cache.capabilities_ttl` seconds
+    """
+    global _capabilities
+    if _capabilities is None:
+        key = {"url": config.netbox.url}
+        netbox_version = load_state("capabilities", key, config.cache.capabilities_ttl)
+        if netbox_version is None:
+            netbox_version = probe_netbox_version()
+            save_state("capabilities", key, netbox_version)
+        _capabilities = Capabilities(netbox_version)
+        logging.debug("Netbox version: {}".format(netbox_version))
+    return _capabilities
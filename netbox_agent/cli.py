@@ -1,9 +1,11 @@
 import sys
-from packaging import version
-import netbox_agent.dmidecode as dmidecode
+from netbox_agent.cache import cache
+from netbox_agent.collectors import collectors
+from netbox_agent.commands import commands
+from netbox_agent.capabilities import get_capabilities
 from netbox_agent.config import config
-from netbox_agent.config import netbox_instance as nb
 from netbox_agent.logging import logging  # NOQA
+from netbox_agent.plan import Plan, plan
 from netbox_agent.vendors.dell import DellHost
 from netbox_agent.vendors.generic import GenericHost
 from netbox_agent.vendors.hp import HPHost
@@ -22,7 +24,15 @@ MANUFACTURERS = {
 
 
 def run(config):
-    dmi = dmidecode.parse()
+    if not get_capabilities().at_least("3.7"):
+        print("netbox-agent is not compatible with Netbox prior to version 3.7")
+        return 1
+
+    if config.apply:
+        Plan.load(config.apply).apply()
+        return 0
+
+    dmi = collectors.get("dmidecode")
 
     if config.virtual.enabled or is_vm(dmi):
         if config.virtual.hypervisor:
@@ -35,16 +45,12 @@ def run(config):
             raise Exception(
                 "virtual.cluster_name parameter is mandatory because it's a hypervisor"
             )
-        manufacturer = dmidecode.get_by_type(dmi, "Chassis")[0].get("Manufacturer")
+        manufacturer = dmi.chassis.get("Manufacturer")
         try:
             server = MANUFACTURERS[manufacturer](dmi=dmi)
         except KeyError:
             server = GenericHost(dmi=dmi)
 
-    if version.parse(nb.version) < version.parse("3.7"):
-        print("netbox-agent is not compatible with Netbox prior to version 3.7")
-        return 1
-
     if (
         config.register
         or config.update_all
@@ -56,6 +62,20 @@ def run(config):
         server.netbox_create_or_update(config)
     if config.debug:
         server.print_debug()
+    if plan.enabled:
+        logging.info(
+            "Plan: {create} creations, {update} updates, {delete} deletions".format(
+                **plan.summary()
+            )
+        )
+        if plan.summary()["create"]:
+            logging.warning(
+                "The plan is partial, the changes depending on the planned creations "
+                "will only be planned on the next run"
+            )
+        print(plan.to_json())
+    cache.log_stats()
+    commands.log_stats()
     return 0
 
 
@@ -0,0 +1,175 @@
+import threading
+
+import netbox_agent.dmidecode as dmidecode
+from netbox_agent.commands import is_tool
+from netbox_agent.config import config
+from netbox_agent.ipmi import IPMI
+from netbox_agent.lldp import LLDP
+from netbox_agent.lshw import LSHW, LSHW_CLASSES
+from netbox_agent.raid.hp import HPRaid
+from netbox_agent.raid.omreport import OmreportRaid
+from netbox_agent.raid.storcli import StorcliRaid
+from netbox_agent.sysfs import Sysfs
+
+HARDWARE_CLASSES = tuple(LSHW_CLASSES)
+
+# hardware classes read by each `Inventory.do_netbox_*` step
+INVENTORY_STEPS = {
+    "cpus": ("cpu",),
+    "memories": ("memory",),
+    "interfaces": ("network",),
+    "motherboard": ("motherboard",),
+    "gpus": ("gpu",),
+    "disks": ("storage",),
+    "raid_cards": (),
+}
+# the inventory of a blade expansion only has its GPUs, disks and RAID cards
+EXPANSION_STEPS = ("gpus", "disks", "raid_cards")
+
+
+def get_raid(manufacturer):
+    """
+    Return the RAID collector matching the server manufacturer and the
+    installed tools, or None
+    """
+    raid_class = None
+    if manufacturer in ("Dell", "Huawei"):
+        if is_tool("omreport"):
+            raid_class = OmreportRaid
+        if is_tool("storcli"):
+            raid_class = StorcliRaid
+    elif manufacturer in ("HP", "HPE"):
+        if is_tool("ssacli"):
+            raid_class = HPRaid
+
+    if not raid_class:
+        return None
+    return raid_class()
+
+
+def get_inventory_steps(update_expansion=False):
+    """
+    Return the `Inventory.do_netbox_*` steps run by the sync, none unless
+    the inventory is enabled and updated
+    """
+    if not config.inventory:
+        return ()
+    if not (config.register or config.update_all or config.update_inventory):
+        return ()
+    return EXPANSION_STEPS if update_expansion else tuple(INVENTORY_STEPS)
+
+
+def get_inventory_classes():
+    """
+    Return the hardware classes read by the inventory steps of the run
+    """
+    classes = set()
+    for step in get_inventory_steps():
+        classes.update(INVENTORY_STEPS[step])
+    return [c for c in HARDWARE_CLASSES if c in classes]
+
+
+def get_lshw():
+    """
+    Run lshw for the hardware classes it collects among the ones read by
+    the inventory steps
+    """
+    return LSHW(
+        classes=[c for c in get_inventory_classes() if getattr(config.collectors, c) == "lshw"],
+        streaming=config.collectors.lshw_streaming,
+    )
+
+
+class Hardware:
+    """
+    Hardware inventory with the interface of `LSHW`, each hardware class
+    coming from the collector chosen by its `collectors.<class>` option
+    """
+
+    def _get(self, hwclass):
+        return collectors.get(getattr(config.collectors, hwclass))
+
+    def get_hw_linux(self, hwclass):
+        return self._get(hwclass).get_hw_linux(hwclass)
+
+    @property
+    def cpus(self):
+        return self.get_hw_linux("cpu")
+
+    @property
+    def memories(self):
+        return self.get_hw_linux("memory")
+
+    @property
+    def interfaces(self):
+        return self.get_hw_linux("network")
+
+    @property
+    def disks(self):
+        return self.get_hw_linux("storage")
+
+    @property
+    def gpus(self):
+        return self.get_hw_linux("gpu")
+
+    @property
+    def vendor(self):
+        return self._get("motherboard").vendor
+
+    @property
+    def motherboard(self):
+        return self._get("motherboard").motherboard
+
+    @property
+    def motherboard_serial(self):
+        return self._get("motherboard").motherboard_serial
+
+
+class Collectors:
+    """
+    Registry of the local hardware collectors
+
+    A collector (ie: the parsed `lshw` output) is only created the first
+    time it is asked for, and the same instance is then shared by every
+    consumer for the rest of the process, so that each command runs once.
+
+    Collectors taking arguments are kept per arguments. Concurrent sync
+    phases asking for the same collector wait for its creation, different
+    collectors are created in parallel.
+    """
+
+    def __init__(self):
+        self.factories = {}
+        self.instances = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def register(self, name, factory):
+        self.factories[name] = factory
+
+    def get(self, name, *args):
+        key = (name,) + args
+        with self.lock:
+            if key in self.instances:
+                return self.instances[key]
+            lock = self.locks.setdefault(key, threading.Lock())
+
+        with lock:
+            if key not in self.instances:
+                self.instances[key] = self.factories[name](*args)
+        return self.instances[key]
+
+    def clear(self):
+        with self.lock:
+            self.instances.clear()
+            self.locks.clear()
+
+
+collectors = Collectors()
+collectors.register("dmidecode", dmidecode.parse)
+collectors.register("lshw", get_lshw)
+collectors.register("sysfs", lambda: Sysfs(collectors.get("dmidecode")))
+collectors.register("hardware", Hardware)
+collectors.register("ipmi", IPMI)
+collectors.register("lldp", LLDP)
+collectors.register("raid", get_raid)
@@ -0,0 +1,199 @@
+import contextlib
+import logging
+import shutil
+import subprocess
+import threading
+import time
+
+from netbox_agent.config import config
+
+# exit status of the commands timing out or not found, as in a shell
+TIMED_OUT = 124
+NOT_FOUND = 127
+
+
+class Commands:
+    """
+    Runner of the external commands of the collectors
+
+    Every command is stopped after `commands.timeout` seconds (or the timeout
+    given to the call), so that a hung `omreport` or `ssacli` doesn't stall
+    the whole agent, and at most `commands.max_parallel` commands run at once
+    when it is set.
+
+    With `cache`, the output of a command is kept for the rest of the run,
+    keyed by its argv (or its shell command line), so that asking twice for
+    the same infos (ie: `mount`, the hostname command) only runs it once.
+    It is up to each call, for the commands whose output doesn't change
+    during a run. The tools found on PATH are always memoized.
+
+    Each run is recorded with its exit status and duration, `log_stats()`
+    prints them at the end of the run.
+    """
+
+    def __init__(self):
+        self.outputs = {}
+        self.paths = {}
+        self.records = []
+        self.hits = 0
+        self.lock = threading.Lock()
+        self.semaphore = None
+
+    def which(self, name):
+        with self.lock:
+            if name not in self.paths:
+                self.paths[name] = shutil.which(name)
+            return self.paths[name]
+
+    def is_tool(self, name):
+        """Check whether `name` is on PATH and marked as executable."""
+        return self.which(name) is not None
+
+    def _slot(self):
+        if not config.commands.max_parallel:
+            return contextlib.nullcontext()
+        with self.lock:
+            if self.semaphore is None:
+                self.semaphore = threading.BoundedSemaphore(config.commands.max_parallel)
+        return self.semaphore
+
+    def _record(self, command, returncode, duration, timed_out=False):
+        record = {
+            "command": command if isinstance(command, str) else " ".join(command),
+            "returncode": returncode,
+            "duration": duration,
+            "timed_out": timed_out,
+        }
+        with self.lock:
+            self.records.append(record)
+        if timed_out:
+            logging.warning(
+                "Command '{}' timed out after {:.0f}s".format(record["command"], duration)
+            )
+        else:
+            logging.debug(
+                "Command '{}' exited with {} in {:.3f}s".format(
+                    record["command"], returncode, duration
+                )
+            )
+        return record
+
+    def run(self, command, timeout=None, stderr=True, cache=False):
+        """
+        Run `command`, a list of arguments or a shell command line, and
+        return its exit status and output (with stderr unless `stderr` is
+        False)
+
+        A command timing out, or which can't be run, exits with `TIMED_OUT`
+        or `NOT_FOUND` like it would in a shell.
+        """
+        key = command if isinstance(command, str) else tuple(command)
+        if cache:
+            with self.lock:
+                if key in self.outputs:
+                    self.hits += 1
+                    return self.outputs[key]
+        if timeout is None:
+            timeout = config.commands.timeout or None
+
+        timed_out = False
+        with self._slot():
+            start = time.monotonic()
+            try:
+                result = subprocess.run(
+                    command,
+                    shell=isinstance(command, str),
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT if stderr else subprocess.DEVNULL,
+                    universal_newlines=True,
+                    errors="replace",
+                    timeout=timeout,
+                    check=False,
+                )
+                returncode, output = result.returncode, result.stdout
+            except subprocess.TimeoutExpired as e:
+                timed_out = True
+                returncode, output = TIMED_OUT, e.stdout or ""
+                if isinstance(output, bytes):
+                    output = output.decode(errors="replace")
+            except OSError as e:
+                returncode, output = NOT_FOUND, str(e)
+        self._record(command, returncode, time.monotonic() - start, timed_out)
+
+        if cache:
+            with self.lock:
+                self.outputs[key] = (returncode, output)
+        return returncode, output
+
+    def getstatusoutput(self, command, **kwargs):
+        """
+        Same as `subprocess.getstatusoutput`: the exit status and output of
+        `command`, without its trailing newline
+        """
+        returncode, output = self.run(command, **kwargs)
+        return returncode, output[:-1] if output.endswith("\n") else output
+
+    def getoutput(self, command, **kwargs):
+        return self.getstatusoutput(command, **kwargs)[1]
+
+    @contextlib.contextmanager
+    def popen(self, command, timeout=None, stderr=subprocess.DEVNULL):
+        """
+        Start `command` and yield its process, to parse its output while
+        it is read
+
+        The process is killed after the timeout, its output then ends early.
+        """
+        if timeout is None:
+            timeout = config.commands.timeout or None
+        with self._slot():
+            start = time.monotonic()
+            with subprocess.Popen(
+                command, stdout=subprocess.PIPE, stderr=stderr, universal_newlines=True
+            ) as process:
+                killed = threading.Event()
+
+                def kill():
+                    killed.set()
+                    process.kill()
+
+                timer = threading.Timer(timeout, kill) if timeout else None
+                if timer is not None:
+                    timer.start()
+                try:
+                    yield process
+                finally:
+                    if timer is not None:
+                        timer.cancel()
+        self._record(command, process.returncode, time.monotonic() - start, killed.is_set())
+
+    def clear(self):
+        with self.lock:
+            self.outputs.clear()
+            self.paths.clear()
+            self.records = []
+            self.hits = 0
+            self.semaphore = None
+
+    def stats(self):
+        return {
+            "commands": len(self.records),
+            "hits": self.hits,
+            "failed": sum(1 for r in self.records if r["returncode"]),
+            "timed_out": sum(1 for r in self.records if r["timed_out"]),
+            "duration": sum(r["duration"] for r in self.records),
+        }
+
+    def log_stats(self):
+        logging.debug(
+            "Commands: {commands} run in {duration:.2f}s, {hits} cached, {failed} failed, "
+            "{timed_out} timed out".format(**self.stats())
+        )
+
+
+commands = Commands()
+
+
+def is_tool(name):
+    """Check whether `name` is on PATH and marked as executable."""
+    return commands.is_tool(name)
@@ -1,10 +1,13 @@
 import logging
 import sys
+from typing import List
 
 import jsonargparse
 import pynetbox
 import requests
 import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 def get_config():
@@ -48,6 +51,25 @@ def get_config():
         action="store_true",
         help="Manage blade expansions as external devices",
     )
+    p.add_argument(
+        "--plan",
+        action="store_true",
+        help="Print the changes to make in Netbox as a JSON plan instead of applying them. "
+        "The plan is partial when it creates objects: the changes depending on them are "
+        "only planned on the next run, once they exist",
+    )
+    p.add_argument("--apply", help="Apply a JSON plan file generated with --plan and exit")
+    p.add_argument(
+        "--phase-workers",
+        type=int,
+        default=1,
+        help="Number of sync phases (network, inventory, PSU, hypervisor) run concurrently",
+    )
+    p.add_argument(
+        "--force-sync",
+        action="store_true",
+        help="Do a full sync even if the local facts are unchanged since the last one",
+    )
 
     p.add_argument("--log_level", default="debug")
     p.add_argument("--netbox.ssl_ca_certs_file", help="SSL CA certificates file")
@@ -56,6 +78,95 @@ def get_config():
     p.add_argument(
         "--netbox.ssl_verify", default=True, action="store_true", help="Disable SSL verification"
     )
+    p.add_argument(
+        "--netbox.pool_size",
+        type=int,
+        default=10,
+        help="Maximum number of kept-alive connections to Netbox",
+    )
+    p.add_argument(
+        "--netbox.connect_timeout",
+        type=float,
+        default=5,
+        help="Timeout in seconds to establish a connection to Netbox",
+    )
+    p.add_argument(
+        "--netbox.read_timeout",
+        type=float,
+        default=60,
+        help="Timeout in seconds to wait for a Netbox response",
+    )
+    p.add_argument(
+        "--netbox.retries",
+        type=int,
+        default=3,
+        help="Number of retries on connection errors and 429/503 responses",
+    )
+    p.add_argument(
+        "--netbox.backoff_factor",
+        type=float,
+        default=0.5,
+        help="Exponential backoff factor between retries, Retry-After is honored",
+    )
+    p.add_argument(
+        "--netbox.gzip",
+        type=bool,
+        default=True,
+        help="Ask Netbox for gzip compressed responses",
+    )
+    p.add_argument(
+        "--netbox.bulk_size",
+        type=int,
+        default=100,
+        help="Maximum number of objects sent in a single bulk request",
+    )
+    p.add_argument(
+        "--cache.directory",
+        default="/var/cache/netbox_agent",
+        help="Directory where netbox-agent keeps its state between runs",
+    )
+    p.add_argument(
+        "--cache.choices_ttl",
+        type=int,
+        default=86400,
+        help="Lifetime in seconds of the cached Netbox choices, 0 to disable",
+    )
+    p.add_argument(
+        "--cache.capabilities_ttl",
+        type=int,
+        default=0,
+        help="Lifetime in seconds of the cached Netbox version and capabilities, 0 to disable",
+    )
+    p.add_argument(
+        "--cache.ipmi_ttl",
+        type=int,
+        default=0,
+        help="Lifetime in seconds of the cached BMC LAN settings, 0 to disable. A changed "
+        "BMC IP, MAC or VLAN only reaches Netbox once it expires",
+    )
+    p.add_argument(
+        "--commands.timeout",
+        type=float,
+        default=300,
+        help="Timeout in seconds of the external commands (lshw, omreport, ssacli...), 0 to disable",
+    )
+    p.add_argument(
+        "--commands.max_parallel",
+        type=int,
+        default=0,
+        help="Maximum number of external commands run at once, 0 for no limit",
+    )
+    p.add_argument(
+        "--fingerprint.custom_field",
+        default="netbox_agent_fingerprint",
+        help="Device custom field storing the fingerprint of the last synced local facts",
+    )
+    p.add_argument(
+        "--fingerprint.max_age",
+        type=int,
+        default=86400,
+        help="Maximum time in seconds between two full syncs of unchanged local facts",
+    )
     p.add_argument("--virtual.enabled", action="store_true", help="Is a virtual machine or not")
     p.add_argument("--virtual.cluster_name", help="Cluster name of VM")
     p.add_argument("--virtual.hypervisor", action="store_true", help="Is a hypervisor or not")
@@ -132,6 +243,45 @@ def get_config():
         default="temp",
         help="Which MAC address to use as primary. Permanent requires ethtool and fallbacks to temporary",
     )
+    p.add_argument(
+        "--network.ethtool",
+        choices=("ioctl", "command"),
+        default="ioctl",
+        help="How to get the link infos, with the ethtool ioctl or by running ethtool",
+    )
+    p.add_argument(
+        "--network.probe_workers",
+        type=int,
+        default=1,
+        help="Number of interfaces probed at once with ethtool",
+    )
+    p.add_argument(
+        "--network.probe_timeout",
+        type=float,
+        default=10,
+        help="Timeout of each ethtool command, in seconds. It only bounds the command, "
+        "not the ioctl and sysfs reads used instead of it by default",
+    )
+    p.add_argument(
+        "--network.scan",
+        choices=("netifaces", "netlink"),
+        default="netifaces",
+        help="How to list the interfaces and their addresses, netlink dumps them all at once",
+    )
+    for nic_class, nic_collectors in (
+        ("physical", ["addresses", "link", "module", "permanent_mac"]),
+        ("bond", ["addresses", "link", "bonding"]),
+        ("vlan", ["addresses", "link"]),
+        ("virtual", ["addresses", "link"]),
+        ("loopback", ["addresses"]),
+    ):
+        p.add_argument(
+            "--network.collectors.{}".format(nic_class),
+            type=List[str],
+            default=nic_collectors,
+            help="Infos collected on the {} interfaces, among addresses, link, module, "
+            "permanent_mac and bonding".format(nic_class),
+        )
     p.add_argument(
         "--inventory",
         action="store_true",
@@ -145,6 +295,18 @@ def get_config():
     p.add_argument(
         "--force-disk-refresh", action="store_true", help="Forces disks detection reprocessing"
     )
+    for hwclass in ("cpu", "memory", "network", "storage", "gpu", "motherboard"):
+        p.add_argument(
+            "--collectors.{}".format(hwclass),
+            choices=("lshw", "sysfs"),
+            default="lshw",
+            help="Collector of the {} inventory, sysfs doesn't run lshw".format(hwclass),
+        )
+    p.add_argument(
+        "--collectors.lshw_streaming",
+        action="store_true",
+        help="Parse the lshw output as it is read to lower the memory used on big servers",
+    )
     p.add_argument("--dump-disks-map", help="File path to dump physical/virtual disks map")
 
     options = p.parse_args()
@@ -154,6 +316,50 @@ def get_config():
 config = get_config()
 
 
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """
+    HTTP adapter applying a default timeout to every request, as pynetbox
+    doesn't set any
+    """
+
+    def __init__(self, timeout=None, *args, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def get_http_session():
+    session = requests.Session()
+    retries = Retry(
+        total=config.netbox.retries,
+        backoff_factor=config.netbox.backoff_factor,
+        status_forcelist=(429, 503),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = TimeoutHTTPAdapter(
+        timeout=(config.netbox.connect_timeout, config.netbox.read_timeout),
+        max_retries=retries,
+        pool_connections=config.netbox.pool_size,
+        pool_maxsize=config.netbox.pool_size,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate" if config.netbox.gzip else "identity"
+
+    ca_certs_file = config.netbox.ssl_ca_certs_file
+    if ca_certs_file is not None:
+        session.verify = ca_certs_file
+    elif config.netbox.ssl_verify is False:
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        session.verify = False
+    return session
+
+
 def get_netbox_instance():
     if config.netbox.url is None or config.netbox.token is None:
         logging.error("Netbox URL and token are mandatory")
@@ -163,16 +369,7 @@ def get_netbox_instance():
         url=get_config().netbox.url,
         token=get_config().netbox.token,
     )
-    ca_certs_file = config.netbox.ssl_ca_certs_file
-    if ca_certs_file is not None:
-        session = requests.Session()
-        session.verify = ca_certs_file
-        nb.http_session = session
-    elif config.netbox.ssl_verify is False:
-        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-        session = requests.Session()
-        session.verify = False
-        nb.http_session = session
+    nb.http_session = get_http_session()
 
     return nb
 
@@ -2,13 +2,12 @@ import logging
 import re as _re
 import subprocess as _subprocess
 import sys
+from functools import cached_property
 
-from netbox_agent.misc import is_tool
+from netbox_agent import smbios
+from netbox_agent.commands import commands, is_tool
 
 _handle_re = _re.compile("^Handle\\s+(.+),\\s+DMI\\s+type\\s+(\\d+),\\s+(\\d+)\\s+bytes$")
-_in_block_re = _re.compile("^\\t\\t(.+)$")
-_record_re = _re.compile("\\t(.+):\\s+(.+)$")
-_record2_re = _re.compile("\\t(.+):$")
 
 _type2str = {
     0: "BIOS",
@@ -58,21 +57,98 @@ _type2str = {
 _str2type = {}
 for type_id, type_str in _type2str.items():
     _str2type[type_str] = type_id
+    _str2type[type_str.strip()] = type_id
+
+
+class DMI(dict):
+    """
+    Parsed dmidecode output
+
+    It is still the dict of the records by handle, with the records also
+    indexed by type and name at parse time, so that looking them up doesn't
+    scan the whole output. The first system, chassis, baseboard and BIOS
+    records are available with their values stripped.
+    """
+
+    def __init__(self, data=()):
+        super().__init__(data)
+        self._by_type = {}
+        self._by_name = {}
+        for entry in self.values():
+            self._index(entry)
+
+    def _index(self, entry):
+        self._by_type.setdefault(entry["DMIType"], []).append(entry)
+        self._by_name.setdefault(entry.get("DMIName"), []).append(entry)
+
+    def __setitem__(self, handle, entry):
+        if handle in self:
+            del self[handle]
+        super().__setitem__(handle, entry)
+        self._index(entry)
+
+    def __delitem__(self, handle):
+        entry = self[handle]
+        super().__delitem__(handle)
+        self._by_type[entry["DMIType"]].remove(entry)
+        self._by_name[entry.get("DMIName")].remove(entry)
+
+    def get_by_type(self, type_id):
+        if isinstance(type_id, str):
+            type_id = _str2type.get(type_id)
+            if type_id is None:
+                return None
+        return list(self._by_type.get(type_id, []))
+
+    def get_by_name(self, name):
+        return list(self._by_name.get(name, []))
+
+    def _first(self, type_id):
+        entries = self._by_type.get(type_id)
+        if not entries:
+            return {}
+        return {
+            key: value.strip() if isinstance(value, str) else value
+            for key, value in entries[0].items()
+        }
+
+    @cached_property
+    def bios(self):
+        return self._first(0)
+
+    @cached_property
+    def system(self):
+        return self._first(1)
+
+    @cached_property
+    def baseboard(self):
+        return self._first(2)
+
+    @cached_property
+    def chassis(self):
+        return self._first(3)
 
 
 def parse(output=None):
     """
     parse the full output of the dmidecode
-    command and return a dic containing the parsed information
+    command and return a DMI containing the parsed information
+
+    `output` may be a string or an iterable of lines. Without it, the
+    SMBIOS tables are read directly from sysfs, the dmidecode command is
+    only run when they are not readable, and its output parsed as it comes
     """
     if output:
         buffer = output
     else:
+        try:
+            return DMI(smbios.parse(*smbios.read_tables()))
+        except (OSError, smbios.ParseError) as e:
+            logging.debug("Unable to read the SMBIOS tables, using dmidecode: {}".format(e))
         buffer = _execute_cmd()
     if isinstance(buffer, bytes):
         buffer = buffer.decode("utf-8")
-    _data = _parse(buffer)
-    return _data
+    return DMI(_parse(buffer))
 
 
 def get_by_type(data, type_id):
@@ -122,6 +198,9 @@ def get_by_type(data, type_id):
     41   Onboard Devices Extended Information
     42   Management Controller Host Interface
     """
+    if isinstance(data, DMI):
+        return data.get_by_type(type_id)
+
     if isinstance(type_id, str):
         type_id = _str2type.get(type_id)
         if type_id is None:
@@ -136,88 +215,113 @@ def get_by_type(data, type_id):
 
 
 def _execute_cmd():
+    """
+    Run dmidecode and yield its output line by line
+    """
     if not is_tool("dmidecode"):
         logging.error(
             "Dmidecode does not seem to be present on your system. Add it your path or "
             "check the compatibility of this project with your distro."
         )
         sys.exit(1)
-    return _subprocess.check_output(
-        [
-            "dmidecode",
-        ],
-        stderr=_subprocess.PIPE,
-    )
+    with commands.popen(["dmidecode"]) as proc:
+        yield from proc.stdout
+    if proc.returncode:
+        raise _subprocess.CalledProcessError(proc.returncode, "dmidecode")
 
 
-def _parse(buffer):
-    output_data = {}
-    #  Each record is separated by double newlines
-    split_output = buffer.split("\n\n")
+def _parse_field(line):
+    """
+    Split a `\tKey: value` line, return (key, value), (key, None) for the
+    first line of a list, or None
+
+    As values may contain colons too, the key ends at the last colon
+    followed by some whitespace and a value.
+    """
+    tab = line.find("\t")
+    if tab < 0:
+        return None
+    rest = line[tab + 1 :]
+    colon = rest.rfind(":")
+    while colon > 0:
+        value = rest[colon + 1 :]
+        if len(value) > 1 and value[0].isspace():
+            return rest[:colon], value.lstrip() or value[-1]
+        colon = rest.rfind(":", 0, colon)
+    if len(rest) > 1 and rest[-1] == ":":
+        return rest[:-1], None
+    return None
+
+
+def _parse(lines):
+    """
+    Parse the dmidecode output, given as a string or as an iterable of lines
 
-    for record in split_output:
-        record_element = record.splitlines()
+    Records are separated by blank lines. A record starts with its handle
+    line and its name, the ones without any other line are inactive and
+    skipped. The lines following a `\tKey:` line and starting with two tabs
+    are gathered in a list.
+    """
+    if isinstance(lines, str):
+        lines = lines.splitlines()
+    else:
+        lines = (line.rstrip("\n") for line in lines)
 
-        #  Entries with less than 3 lines are incomplete / inactive; skip them
-        if len(record_element) < 3:
-            continue
+    output_data = {}
+    # position of the line in the current record, 0 expects a handle line
+    position = 0
+    handle = entry = block = items = None
 
-        handle_data = _handle_re.findall(record_element[0])
+    for line in lines:
+        if not line:
+            position = 0
+            continue
+        if position < 0:
+            # skipping a record without handle
+            continue
 
-        if not handle_data:
+        if position == 0:
+            handle_data = _handle_re.match(line)
+            if handle_data is None:
+                position = -1
+                continue
+            handle = handle_data.group(1)
+            entry = {
+                "DMIType": int(handle_data.group(2)),
+                "DMISize": int(handle_data.group(3)),
+            }
+            block = None
+            position = 1
+            continue
+        if position == 1:
+            entry["DMIName"] = line
+            position = 2
             continue
-        handle_data = handle_data[0]
-
-        dmi_handle = handle_data[0]
-
-        output_data[dmi_handle] = {}
-        output_data[dmi_handle]["DMIType"] = int(handle_data[1])
-        output_data[dmi_handle]["DMISize"] = int(handle_data[2])
-
-        #  Okay, we know 2nd line == name
-        output_data[dmi_handle]["DMIName"] = record_element[1]
-
-        in_block_elemet = ""
-        in_block_list = ""
-
-        #  Loop over the rest of the record, gathering values
-        for i in range(2, len(record_element), 1):
-            if i >= len(record_element):
-                break
-            #  Check whether we are inside a \t\t block
-            if in_block_elemet != "":
-                in_block_data = _in_block_re.findall(record_element[i])
-
-                if in_block_data:
-                    if not in_block_list:
-                        in_block_list = [in_block_data[0]]
-                    else:
-                        in_block_list.append(in_block_data[0])
-
-                    output_data[dmi_handle][in_block_elemet] = in_block_list
-                    continue
-                else:
-                    # We are out of the \t\t block; reset it again, and let
-                    # the parsing continue
-                    in_block_elemet = ""
-
-            record_data = _record_re.findall(record_element[i])
-
-            #  Is this the line containing handle identifier, type, size?
-            if record_data:
-                output_data[dmi_handle][record_data[0][0]] = record_data[0][1]
+        if position == 2:
+            output_data[handle] = entry
+            position = 3
+
+        if block is not None:
+            if line.startswith("\t\t") and len(line) > 2:
+                if items is None:
+                    items = entry[block] = []
+                items.append(line[2:])
                 continue
-
-            #  Didn't findall regular entry, maybe an array of data?
-
-            record_data2 = _record2_re.findall(record_element[i])
-            if record_data2:
-                #  This is an array of data - let the loop know we are inside
-                #  an array block
-                in_block_elemet = record_data2[0]
-                in_block_list = ""
-
+            block = None
+
+        # common "\tKey: value" line, see _parse_field() for the others
+        key, separator, value = line.rpartition(": ")
+        if separator and value and key[:1] == "\t" and ":" not in value:
+            key, value = key[1:], value.lstrip() or value[-1]
+        else:
+            field = _parse_field(line)
+            if field is None:
                 continue
+            key, value = field
+        if value is None:
+            block, items = key, None
+        else:
+            entry[key] = value
 
     if not output_data:
         raise ParseError("Unable to parse 'dmidecode' output")
@@ -1,7 +1,12 @@
+import array
+import errno
+import fcntl
+import logging
 import re
-import subprocess
-from shutil import which
+import socket
+import struct
 
+from netbox_agent.commands import commands, is_tool
 from netbox_agent.config import config
 
 #  Originally from https://github.com/opencoff/useful-scripts/blob/master/linktest.py
@@ -21,6 +26,85 @@ field_map = {
 }
 
 
+SIOCETHTOOL = 0x8946
+ETHTOOL_GPERMADDR = 0x20
+ETHTOOL_GMODULEINFO = 0x42
+ETHTOOL_GMODULEEEPROM = 0x43
+ETHTOOL_GLINKSETTINGS = 0x4C
+
+IFNAMSIZ = 16
+IFREQ_SIZE = 40
+MAX_ADDR_LEN = 32
+
+# struct ethtool_link_settings, followed by its link modes bitmaps
+LINK_SETTINGS = struct.Struct("=IIBBBBBBBbBBBB7I")
+# struct ethtool_modinfo
+MODULE_INFO = struct.Struct("=III8I")
+# struct ethtool_eeprom, struct ethtool_perm_addr
+EEPROM = struct.Struct("=IIII")
+PERM_ADDR = struct.Struct("=II")
+
+SPEED_UNKNOWN = 0xFFFFFFFF
+DUPLEXES = {0: "Half", 1: "Full"}
+PORTS = {
+    0x00: "Twisted Pair",
+    0x01: "AUI",
+    0x02: "BNC",
+    0x03: "MII",
+    0x04: "FIBRE",
+    0x05: "Direct Attach Copper",
+    0xEF: "None",
+    0xFF: "Other",
+}
+AUTONEG = {0: "off", 1: "on"}
+
+# speed of each bit of the link modes bitmaps (enum ethtool_link_mode_bit_indices),
+# 0 for the bits which are not a link mode
+LINK_MODE_SPEEDS = (
+    (10, 10, 100, 100, 1000, 1000)
+    + (0,) * 6
+    + (10000, 0, 0, 2500, 0, 1000, 10000, 10000, 0, 20000, 20000)
+    + (40000,) * 4
+    + (56000,) * 4
+    + (25000,) * 3
+    + (50000,) * 2
+    + (100000,) * 4
+    + (50000, 1000)
+    + (10000,) * 5
+    + (2500, 5000, 0, 0, 0)
+    + (50000,) * 5
+    + (100000,) * 5
+    + (200000,) * 5
+    + (100, 1000)
+    + (400000,) * 5
+    + (0,)
+    + (100000,) * 5
+    + (200000,) * 5
+    + (400000,) * 5
+    + (100, 100, 10)
+)
+
+# SFF-8024 identifiers of the modules, as named by `ethtool -m`
+MODULE_IDENTIFIERS = {
+    0x01: "GBIC",
+    0x03: "SFP",
+    0x05: "XENPAK",
+    0x06: "XFP",
+    0x07: "XFF",
+    0x09: "XPAK",
+    0x0A: "X2",
+    0x0C: "QSFP",
+    0x0E: "CXP",
+    0x11: "QSFP28",
+    0x13: "CDFP",
+    0x19: "OSFP",
+}
+
+
+# infos `Ethtool.parse` can get
+PROBES = ("link", "module", "permanent_mac")
+
+
 def merge_two_dicts(x, y):
     z = x.copy()
     z.update(y)
@@ -32,17 +116,128 @@ class Ethtool:
     This class aims to parse ethtool output
     There is several bindings to have something proper, but it requires
     compilation and other requirements.
+
+    Unless `network.ethtool` is `command`, the speed and duplex are read
+    from sysfs and the rest is asked to the kernel with the SIOCETHTOOL
+    ioctl, as the ethtool command does, rather than running ethtool 3 times
+    per interface. The ethtool command is run when the ioctl can't be used.
     """
 
-    def __init__(self, interface, *args, **kwargs):
+    def __init__(self, interface, *args, sysfs="/sys/class/net", timeout=None, **kwargs):
         self.interface = interface
+        self.sysfs = sysfs
+        self.timeout = timeout
+
+    def _run(self, *args):
+        """
+        Run ethtool on the interface, return its status and output
+        """
+        command = ["ethtool"] + list(args) + [self.interface]
+        return commands.getstatusoutput(command, timeout=self.timeout)
+
+    def _read_sysfs(self, name):
+        try:
+            with open("{}/{}/{}".format(self.sysfs, self.interface, name)) as f:
+                return f.read().strip()
+        # ie: the speed of a down interface can't be read
+        except OSError:
+            return None
+
+    def _ioctl(self, sock, data):
+        buf = array.array("B", data)
+        ifreq = struct.pack(
+            "{}sP".format(IFNAMSIZ), self.interface.encode(), buf.buffer_info()[0]
+        ).ljust(IFREQ_SIZE, b"\0")
+        fcntl.ioctl(sock.fileno(), SIOCETHTOOL, ifreq)
+        return buf.tobytes()
+
+    def _get_link_settings(self, sock):
+        fields = {"port": "-", "autoneg": "-", "max_speed": "-"}
+        request = [ETHTOOL_GLINKSETTINGS] + [0] * 20
+        try:
+            # the kernel first tells the size of the link modes bitmaps
+            request[9] = -LINK_SETTINGS.unpack(self._ioctl(sock, LINK_SETTINGS.pack(*request)))[9]
+            if request[9] <= 0:
+                return fields
+            nwords = request[9]
+            settings = self._ioctl(sock, LINK_SETTINGS.pack(*request) + bytes(3 * 4 * nwords))
+        except OSError as e:
+            if e.errno not in (errno.EOPNOTSUPP, errno.ENODEV, errno.EINVAL):
+                logging.debug("ETHTOOL_GLINKSETTINGS {}: {}".format(self.interface, e))
+            return fields
+
+        values = LINK_SETTINGS.unpack_from(settings)
+        if values[9] != nwords:
+            return fields
+        fields["port"] = PORTS.get(values[3], "Unknown! ({})".format(values[3]))
+        fields["autoneg"] = AUTONEG.get(values[5], "-")
+        supported = int.from_bytes(
+            settings[LINK_SETTINGS.size : LINK_SETTINGS.size + 4 * nwords], "little"
+        )
+        speeds = [
+            speed for bit, speed in enumerate(LINK_MODE_SPEEDS) if speed and supported >> bit & 1
+        ]
+        if speeds:
+            fields["max_speed"] = "{}Mb/s".format(max(speeds))
+        return fields
+
+    def _get_module(self, sock):
+        try:
+            info = self._ioctl(sock, MODULE_INFO.pack(ETHTOOL_GMODULEINFO, *(0,) * 10))
+            if not MODULE_INFO.unpack(info)[2]:
+                return {}
+            eeprom = self._ioctl(sock, EEPROM.pack(ETHTOOL_GMODULEEEPROM, 0, 0, 1) + b"\0")
+        except OSError:
+            return {}
+        identifier = MODULE_IDENTIFIERS.get(eeprom[EEPROM.size])
+        if identifier is None:
+            return {}
+        return {"form_factor": identifier}
+
+    def _get_permanent_address(self, sock):
+        try:
+            data = self._ioctl(
+                sock, PERM_ADDR.pack(ETHTOOL_GPERMADDR, MAX_ADDR_LEN) + bytes(MAX_ADDR_LEN)
+            )
+        except OSError:
+            return {}
+        size = PERM_ADDR.unpack_from(data)[1]
+        address = data[PERM_ADDR.size : PERM_ADDR.size + size]
+        if len(address) != 6 or not any(address):
+            return {}
+        return {"mac_address": ":".join("{:02x}".format(b) for b in address)}
+
+    def parse_ioctl(self, probes=PROBES):
+        """
+        Return the fields of `parse` from sysfs and the SIOCETHTOOL ioctl
+        """
+        fields = {}
+        if "link" in probes:
+            fields.update(speed="-", duplex="-", link="-")
+            speed = self._read_sysfs("speed")
+            if speed and speed.lstrip("-").isdigit() and int(speed) > 0:
+                fields["speed"] = "{}Mb/s".format(speed)
+            duplex = self._read_sysfs("duplex")
+            if duplex in ("full", "half"):
+                fields["duplex"] = duplex.capitalize()
+            carrier = self._read_sysfs("carrier")
+            fields["link"] = "yes" if carrier == "1" else "no"
+
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            if "link" in probes:
+                fields.update(self._get_link_settings(sock))
+            if "module" in probes:
+                fields.update(self._get_module(sock))
+            if "permanent_mac" in probes:
+                fields.update(self._get_permanent_address(sock))
+        return fields
 
     def _parse_ethtool_output(self):
         """
         parse ethtool output
         """
 
-        output = subprocess.getoutput("ethtool {}".format(self.interface))
+        _, output = self._run()
 
         fields = {
             "speed": "-",
@@ -80,7 +275,7 @@ class Ethtool:
         return fields
 
     def _parse_ethtool_module_output(self):
-        status, output = subprocess.getstatusoutput("ethtool -m {}".format(self.interface))
+        status, output = self._run("-m")
         if status == 0:
             r = re.search(r"Identifier.*\((\w+)\)", output)
             if r and len(r.groups()) > 0:
@@ -88,17 +283,30 @@ class Ethtool:
         return {}
 
     def parse_ethtool_mac_output(self):
-        status, output = subprocess.getstatusoutput("ethtool -P {}".format(self.interface))
+        status, output = self._run("-P")
         if status == 0:
             match = re.search(r"[0-9a-f:]{17}", output)
             if match and match.group(0) != "00:00:00:00:00:00":
                 return {"mac_address": match.group(0)}
         return {}
 
-    def parse(self):
-        if which("ethtool") is None:
+    def parse(self, probes=PROBES):
+        """
+        Return the infos of the interface given by `probes`: link (speed,
+        duplex, port...), module (form factor) and permanent_mac
+        """
+        if config.network.ethtool == "ioctl":
+            try:
+                return self.parse_ioctl(probes)
+            except OSError as e:
+                logging.debug("SIOCETHTOOL unavailable, running ethtool: {}".format(e))
+        if not is_tool("ethtool"):
             return None
-        output = self._parse_ethtool_output()
-        output.update(self._parse_ethtool_module_output())
-        output.update(self.parse_ethtool_mac_output())
+        output = {}
+        if "link" in probes:
+            output.update(self._parse_ethtool_output())
+        if "module" in probes:
+            output.update(self._parse_ethtool_module_output())
+        if "permanent_mac" in probes:
+            output.update(self.parse_ethtool_mac_output())
         return output
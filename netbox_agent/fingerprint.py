@@ -0,0 +1,145 @@
+import hashlib
+import json
+import logging
+
+import netbox_agent
+from netbox_agent.collectors import collectors, get_inventory_steps
+from netbox_agent.commands import commands
+from netbox_agent.config import config
+from netbox_agent.config import netbox_instance as nb
+
+# registers the nics collector
+from netbox_agent.network import Network  # noqa: F401
+from netbox_agent.plan import plan
+from netbox_agent.state import load_state, save_state
+
+# options that don't change what is written to Netbox
+IGNORED_OPTIONS = (
+    "apply",
+    "cache",
+    "config",
+    "debug",
+    "fingerprint",
+    "force_sync",
+    "log_level",
+    "netbox",
+    "plan",
+)
+
+
+class Fingerprint:
+    """
+    Hash of the normalized local facts of a server
+
+    After a successful sync the hash is stored in the `fingerprint.custom_field`
+    custom field of the device, and kept in the state directory along with the
+    device `last_updated` returned by Netbox. On the next run, if the local
+    hash is unchanged and the device hasn't been modified in Netbox since,
+    there is nothing to sync.
+
+    Volatile values (ie: disks used bytes, LLDP neighbors age) are left out.
+    RAID controllers are not queried, a full sync is done at least every
+    `fingerprint.max_age` seconds anyway.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.value = None
+
+    def get_facts(self):
+        server = self.server
+        facts = {
+            "version": getattr(netbox_agent, "__version__", None),
+            "config": {
+                key: value for key, value in config.as_dict().items() if key not in IGNORED_OPTIONS
+            },
+            "hostname": server.get_hostname(),
+            "location": [server.get_datacenter(), server.get_rack(), server.get_tenant()],
+            "platform": getattr(server.device_platform, "name", None),
+            "dmi": server.dmi,
+        }
+
+        # the NICs are scanned once per run, `Network` reuses them
+        nics = [dict(nic) for nic in collectors.get("nics")]
+        lldp = collectors.get("lldp") if config.network.lldp else None
+        if lldp:
+            for nic in nics:
+                nic["lldp"] = [
+                    lldp.get_switch_ip(nic["name"]),
+                    lldp.get_switch_port(nic["name"]),
+                    lldp.get_switch_vlan(nic["name"]),
+                ]
+        if config.network.ipmi:
+            nics.append(collectors.get("ipmi").parse())
+        facts["network"] = nics
+
+        # the hardware only read by the inventory steps which run
+        if get_inventory_steps():
+            lshw = collectors.get("hardware")
+            facts["inventory"] = {
+                "motherboard": [lshw.motherboard, lshw.motherboard_serial],
+                "cpus": lshw.cpus,
+                "memories": lshw.memories,
+                "interfaces": lshw.interfaces,
+                "gpus": lshw.gpus,
+                "disks": [
+                    {key: value for key, value in disk.items() if key != "size"}
+                    for disk in lshw.disks
+                ],
+            }
+
+        if config.virtual.hypervisor and config.virtual.list_guests_cmd:
+            facts["guests"] = sorted(
+                commands.getoutput(config.virtual.list_guests_cmd, cache=True).split()
+            )
+        return facts
+
+    def compute(self):
+        if self.value is None:
+            facts = json.dumps(self.get_facts(), sort_keys=True, default=str)
+            self.value = hashlib.sha256(facts.encode()).hexdigest()
+        return self.value
+
+    def _state_key(self):
+        return {"url": config.netbox.url, "serial": self.server.get_service_tag()}
+
+    def is_enabled(self):
+        return bool(config.fingerprint.custom_field) and not plan.enabled
+
+    def is_up_to_date(self):
+        """
+        Return True if the device is already in sync with the local facts,
+        at the cost of a single device lookup
+        """
+        if not self.is_enabled() or config.force_sync:
+            return False
+        state = load_state("fingerprint", self._state_key(), config.fingerprint.max_age)
+        if state is None or state.get("fingerprint") != self.compute():
+            return False
+
+        device = self.server.get_netbox_server()
+        if device is None:
+            return False
+        stored = (device.custom_fields or {}).get(config.fingerprint.custom_field)
+        return stored == self.compute() and device.last_updated == state.get("last_updated")
+
+    def save(self, device):
+        """
+        Store the fingerprint on the freshly synced `device`
+        """
+        if not self.is_enabled():
+            return
+        field = config.fingerprint.custom_field
+        if field not in (device.custom_fields or {}):
+            logging.debug(
+                "Custom field {} does not exist in Netbox, fingerprint not stored".format(field)
+            )
+            return
+
+        value = self.compute()
+        updated = nb.dcim.devices.update([{"id": device.id, "custom_fields": {field: value}}])
+        save_state(
+            "fingerprint",
+            self._state_key(),
+            {"fingerprint": value, "last_updated": updated[0].last_updated},
+        )
@@ -1,7 +1,8 @@
-import subprocess
-
+from netbox_agent.cache import cache
+from netbox_agent.commands import commands
 from netbox_agent.config import config
 from netbox_agent.config import netbox_instance as nb
+from netbox_agent.plan import plan
 
 
 class Hypervisor:
@@ -10,7 +11,8 @@ class Hypervisor:
         self.netbox_server = self.server.get_netbox_server()
 
     def get_netbox_cluster(self, name):
-        cluster = nb.virtualization.clusters.get(
+        cluster = cache.get(
+            nb.virtualization.clusters,
             name=name,
         )
         return cluster
@@ -19,7 +21,7 @@ class Hypervisor:
         cluster = self.get_netbox_cluster(config.virtual.cluster_name)
         if self.netbox_server.cluster != cluster:
             self.netbox_server.cluster = cluster
-            self.netbox_server.save()
+            plan.save(self.netbox_server)
         return True
 
     def get_netbox_virtual_guests(self):
@@ -35,7 +37,8 @@ class Hypervisor:
         return guest
 
     def create_netbox_virtual_guest(self, name):
-        guest = nb.virtualization.virtual_machines.create(
+        guest = plan.create(
+            nb.virtualization.virtual_machines,
             name=name,
             device=self.netbox_server.id,
             cluster=self.netbox_server.cluster.id,
@@ -43,7 +46,7 @@ class Hypervisor:
         return guest
 
     def get_virtual_guests(self):
-        status, output = subprocess.getstatusoutput(config.virtual.list_guests_cmd)
+        status, output = commands.getstatusoutput(config.virtual.list_guests_cmd, cache=True)
 
         if status == 0:
             return output.split()
@@ -59,18 +62,19 @@ class Hypervisor:
             if nb_guest.name not in guests:
                 # remove the device property from VMs not found on the hypervisor
                 nb_guest.device = None
-                nb_guest.save()
+                plan.save(nb_guest)
 
         for guest in guests:
             # loop over the VMs running in this hypervisor
             nb_guest = self.get_netbox_virtual_guest(guest)
             if not nb_guest:
                 # add the VM to Netbox
-                nb.virtualization.virtual_machines
                 nb_guest = self.create_netbox_virtual_guest(guest)
+                if nb_guest is None:
+                    continue
             if nb_guest.device != self.netbox_server:
                 # add the device property to VMs found on the hypervisor
                 nb_guest.device = self.netbox_server
-                nb_guest.save()
+                plan.save(nb_guest)
 
         return True
@@ -1,10 +1,10 @@
+from netbox_agent.cache import cache
+from netbox_agent.collectors import collectors
 from netbox_agent.config import config
 from netbox_agent.config import netbox_instance as nb
-from netbox_agent.lshw import LSHW
-from netbox_agent.misc import get_vendor, is_tool
-from netbox_agent.raid.hp import HPRaid
-from netbox_agent.raid.omreport import OmreportRaid
-from netbox_agent.raid.storcli import StorcliRaid
+from netbox_agent.misc import get_vendor
+from netbox_agent.plan import plan
+from netbox_agent.raid.base import RaidError
 import traceback
 import pynetbox
 import logging
@@ -56,39 +56,53 @@ class Inventory:
         self.device_id = netbox_server.id if netbox_server else None
         self.raid = None
         self.disks = []
+        # inventory items writes are gathered across all categories
+        # and sent in bulk by `flush_netbox_inventory`
+        self.pending_creates = []
+        self.pending_deletes = []
 
-        self.lshw = LSHW()
+        self.lshw = collectors.get("hardware")
 
     def create_netbox_tags(self):
         ret = []
         for key, tag in INVENTORY_TAG.items():
-            nb_tag = nb.extras.tags.get(name=tag["name"])
-            if not nb_tag:
-                nb_tag = nb.extras.tags.create(
+            nb_tag = cache.get_or_create(
+                nb.extras.tags,
+                lambda: plan.create(
+                    nb.extras.tags,
                     name=tag["name"],
                     slug=tag["slug"],
                     comments=tag["name"],
-                )
-            ret.append(nb_tag)
+                ),
+                name=tag["name"],
+            )
+            if nb_tag is not None:
+                ret.append(nb_tag)
         return ret
 
     def find_or_create_manufacturer(self, name):
         if name is None:
             return None
 
-        manufacturer = nb.dcim.manufacturers.get(
-            name=name,
-        )
-        if not manufacturer:
+        def create():
             logging.info("Creating missing manufacturer {name}".format(name=name))
-            manufacturer = nb.dcim.manufacturers.create(
+            return plan.create(
+                nb.dcim.manufacturers,
                 name=name,
                 slug=re.sub("[^A-Za-z0-9]+", "-", name).lower(),
             )
 
-            logging.info("Creating missing manufacturer {name}".format(name=name))
+        return cache.get_or_create(nb.dcim.manufacturers, create, name=name)
 
-        return manufacturer
+    def get_manufacturer_ref(self, name):
+        """
+        Return the value of the `manufacturer` field of an inventory item: the
+        manufacturer id, or its name while its creation is only planned
+        """
+        manufacturer = self.find_or_create_manufacturer(name)
+        if manufacturer is None:
+            return {"name": name} if name is not None else None
+        return manufacturer.id
 
     def get_netbox_inventory(self, device_id, tag):
         try:
@@ -99,12 +113,31 @@ class Inventory:
 
         return list(items)
 
-    def create_netbox_inventory_item(self, device_id, tags, vendor, name, serial, description):
-        manufacturer = self.find_or_create_manufacturer(vendor)
+    def queue_netbox_inventory_item(self, **params):
+        self.pending_creates.append(params)
 
-        _ = nb.dcim.inventory_items.create(
+    def delete_netbox_inventory_item(self, item):
+        self.pending_deletes.append(item)
+
+    def flush_netbox_inventory(self):
+        """
+        Send the gathered inventory items deletions and creations to Netbox
+        using bulk DELETE/POST requests on the list endpoint
+        """
+        deletes, creates = self.pending_deletes, self.pending_creates
+        self.pending_deletes, self.pending_creates = [], []
+
+        plan.bulk_delete(nb.dcim.inventory_items, deletes)
+        plan.bulk_create(nb.dcim.inventory_items, creates)
+        if deletes or creates:
+            logging.debug(
+                "Deleted {} and created {} inventory items".format(len(deletes), len(creates))
+            )
+
+    def create_netbox_inventory_item(self, device_id, tags, vendor, name, serial, description):
+        self.queue_netbox_inventory_item(
             device=device_id,
-            manufacturer=manufacturer.id,
+            manufacturer=self.get_manufacturer_ref(vendor),
             discovered=True,
             tags=tags,
             name="{}".format(name),
@@ -143,7 +176,7 @@ class Inventory:
                         serial=nb_motherboard.serial,
                     )
                 )
-                nb_motherboard.delete()
+                self.delete_netbox_inventory_item(nb_motherboard)
 
         # create interfaces that are not in netbox
         for motherboard in motherboards:
@@ -158,10 +191,9 @@ class Inventory:
                 )
 
     def create_netbox_interface(self, iface):
-        manufacturer = self.find_or_create_manufacturer(iface["vendor"])
-        _ = nb.dcim.inventory_items.create(
+        self.queue_netbox_inventory_item(
             device=self.device_id,
-            manufacturer=manufacturer.id,
+            manufacturer=self.get_manufacturer_ref(iface["vendor"]),
             discovered=True,
             tags=[{"name": INVENTORY_TAG["interface"]["name"]}],
             name="{}".format(iface["product"]),
@@ -184,7 +216,7 @@ class Inventory:
                         serial=nb_interface.serial,
                     )
                 )
-                nb_interface.delete()
+                self.delete_netbox_inventory_item(nb_interface)
 
         # create interfaces that are not in netbox
         for iface in interfaces:
@@ -193,10 +225,9 @@ class Inventory:
 
     def create_netbox_cpus(self):
         for cpu in self.lshw.get_hw_linux("cpu"):
-            manufacturer = self.find_or_create_manufacturer(cpu["vendor"])
-            _ = nb.dcim.inventory_items.create(
+            self.queue_netbox_inventory_item(
                 device=self.device_id,
-                manufacturer=manufacturer.id,
+                manufacturer=self.get_manufacturer_ref(cpu["vendor"]),
                 discovered=True,
                 tags=[{"name": INVENTORY_TAG["cpu"]["name"]}],
                 name=cpu["product"],
@@ -215,26 +246,15 @@ class Inventory:
 
         if not len(nb_cpus) or len(nb_cpus) and len(cpus) != len(nb_cpus):
             for x in nb_cpus:
-                x.delete()
+                self.delete_netbox_inventory_item(x)
 
             self.create_netbox_cpus()
 
     def get_raid_cards(self, filter_cards=False):
-        raid_class = None
-        if self.server.manufacturer in ("Dell", "Huawei"):
-            if is_tool("omreport"):
-                raid_class = OmreportRaid
-            if is_tool("storcli"):
-                raid_class = StorcliRaid
-        elif self.server.manufacturer in ("HP", "HPE"):
-            if is_tool("ssacli"):
-                raid_class = HPRaid
-
-        if not raid_class:
+        self.raid = collectors.get("raid", self.server.manufacturer)
+        if not self.raid:
             return []
 
-        self.raid = raid_class()
-
         if filter_cards and config.expansion_as_device and self.server.own_expansion_slot():
             return [
                 c for c in self.raid.get_controllers() if c.is_external() is self.update_expansion
@@ -243,14 +263,14 @@ class Inventory:
             return self.raid.get_controllers()
 
     def create_netbox_raid_card(self, raid_card):
-        manufacturer = self.find_or_create_manufacturer(raid_card.get_manufacturer())
+        manufacturer = self.get_manufacturer_ref(raid_card.get_manufacturer())
 
         name = raid_card.get_product_name()
         serial = raid_card.get_serial_number()
-        nb_raid_card = nb.dcim.inventory_items.create(
+        self.queue_netbox_inventory_item(
             device=self.device_id,
             discovered=True,
-            manufacturer=manufacturer.id if manufacturer else None,
+            manufacturer=manufacturer,
             tags=[{"name": INVENTORY_TAG["raid_card"]["name"]}],
             name="{}".format(name),
             serial="{}".format(serial),
@@ -262,7 +282,6 @@ class Inventory:
                 serial=serial,
             )
         )
-        return nb_raid_card
 
     def do_netbox_raid_cards(self):
         """
@@ -289,7 +308,7 @@ class Inventory:
                         serial=nb_raid_card.serial,
                     )
                 )
-                nb_raid_card.delete()
+                self.delete_netbox_inventory_item(nb_raid_card)
 
         # create card that are not in netbox
         for raid_card in raid_cards:
@@ -365,7 +384,7 @@ class Inventory:
     def create_netbox_disk(self, disk):
         manufacturer = None
         if "Vendor" in disk:
-            manufacturer = self.find_or_create_manufacturer(disk["Vendor"])
+            manufacturer = self.get_manufacturer_ref(disk["Vendor"])
 
         logicalname = disk.get("logicalname")
         desc = disk.get("description")
@@ -381,12 +400,12 @@ class Inventory:
             "serial": sn,
             "part_id": disk["Model"],
             "description": description,
-            "manufacturer": getattr(manufacturer, "id", None),
+            "manufacturer": manufacturer,
         }
         if config.process_virtual_drives:
             parms["custom_fields"] = disk.get("custom_fields", {})
 
-        _ = nb.dcim.inventory_items.create(**parms)
+        self.queue_netbox_inventory_item(**parms)
 
         logging.info(
             "Creating Disk {model} {serial}".format(
@@ -427,12 +446,11 @@ class Inventory:
                         serial=nb_disk.serial,
                     )
                 )
-                nb_disk.delete()
+                self.delete_netbox_inventory_item(nb_disk)
 
         if config.force_disk_refresh:
-            nb_disks = self.get_netbox_inventory(
-                device_id=self.device_id, tag=INVENTORY_TAG["disk"]["slug"]
-            )
+            # every disk has been queued for deletion above
+            nb_disks = []
 
         # create disks that are not in netbox
         for disk in disks:
@@ -440,12 +458,11 @@ class Inventory:
                 self.create_netbox_disk(disk)
 
     def create_netbox_memory(self, memory):
-        manufacturer = self.find_or_create_manufacturer(memory["vendor"])
         name = "Slot {} ({}GB)".format(memory["slot"], memory["size"])
-        nb_memory = nb.dcim.inventory_items.create(
+        self.queue_netbox_inventory_item(
             device=self.device_id,
             discovered=True,
-            manufacturer=manufacturer.id,
+            manufacturer=self.get_manufacturer_ref(memory["vendor"]),
             tags=[{"name": INVENTORY_TAG["memory"]["name"]}],
             name=name,
             part_id=memory["product"],
@@ -461,8 +478,6 @@ class Inventory:
             )
         )
 
-        return nb_memory
-
     def do_netbox_memories(self):
         memories = self.lshw.memories
         nb_memories = self.get_netbox_inventory(
@@ -476,7 +491,7 @@ class Inventory:
                         serial=nb_memory.serial,
                     )
                 )
-                nb_memory.delete()
+                self.delete_netbox_inventory_item(nb_memory)
 
         for memory in memories:
             if memory.get("serial") not in [x.serial for x in nb_memories]:
@@ -487,10 +502,9 @@ class Inventory:
             if "product" in gpu and len(gpu["product"]) > 50:
                 gpu["product"] = gpu["product"][:48] + ".."
 
-            manufacturer = self.find_or_create_manufacturer(gpu["vendor"])
-            _ = nb.dcim.inventory_items.create(
+            self.queue_netbox_inventory_item(
                 device=self.device_id,
-                manufacturer=manufacturer.id,
+                manufacturer=self.get_manufacturer_ref(gpu["vendor"]),
                 discovered=True,
                 tags=[{"name": INVENTORY_TAG["gpu"]["name"]}],
                 name=gpu["product"],
@@ -527,7 +541,7 @@ class Inventory:
         up_to_date = set(gpu_models) == set(nb_gpu_models)
         if not gpus or not up_to_date:
             for x in nb_gpus:
-                x.delete()
+                self.delete_netbox_inventory_item(x)
         if gpus and not up_to_date:
             self.create_netbox_gpus(gpus)
 
@@ -540,6 +554,15 @@ class Inventory:
             self.do_netbox_interfaces()
             self.do_netbox_motherboard()
         self.do_netbox_gpus()
-        self.do_netbox_disks()
-        self.do_netbox_raid_cards()
+        # the RAID tools are queried before any change is queued, a failing
+        # one would otherwise remove the RAID cards and disks from Netbox
+        try:
+            self.do_netbox_disks()
+            self.do_netbox_raid_cards()
+        except RaidError as e:
+            logging.error(
+                "Unable to query the RAID controllers, skipping the RAID cards and disks: "
+                "{}".format(e)
+            )
+        self.flush_netbox_inventory()
         return True
@@ -1,8 +1,170 @@
+import errno
+import fcntl
 import logging
-import subprocess
+import os
+import select
+import struct
+from array import array
 
 from netaddr import IPNetwork
 
+from netbox_agent.commands import commands
+from netbox_agent.config import config
+from netbox_agent.state import load_state, save_state
+
+IPMI_DEVICE = "/dev/ipmi0"
+
+IPMI_SYSTEM_INTERFACE_ADDR_TYPE = 0x0C
+IPMI_BMC_CHANNEL = 0x0F
+IPMI_MAX_ADDR_SIZE = 32
+IPMI_MAX_MSG_LENGTH = 272
+IPMI_NETFN_APP = 0x06
+IPMI_NETFN_TRANSPORT = 0x0C
+IPMI_GET_CHANNEL_INFO = 0x42
+IPMI_GET_LAN_CONFIG_PARAMS = 0x02
+IPMI_CHANNEL_MEDIUM_LAN = 0x04
+
+# LAN configuration parameters, named as by `ipmitool lan print`
+LAN_PARAMS = {
+    "IP Address": 3,
+    "MAC Address": 5,
+    "Subnet Mask": 6,
+    "802.1q VLAN ID": 20,
+}
+
+# struct ipmi_system_interface_addr, struct ipmi_req and struct ipmi_recv
+# (with their struct ipmi_msg) of the OpenIPMI driver
+SYSTEM_INTERFACE_ADDR = struct.Struct("@ihBx")
+IPMI_REQ = struct.Struct("@PIlBBHP")
+IPMI_RECV = struct.Struct("@iPIlBBHP")
+
+
+def _ioc(direction, nr, size):
+    return direction << 30 | size << 16 | ord("i") << 8 | nr
+
+
+IPMICTL_RECEIVE_MSG_TRUNC = _ioc(3, 11, IPMI_RECV.size)
+IPMICTL_SEND_COMMAND = _ioc(2, 13, IPMI_REQ.size)
+
+
+class IPMICommandError(OSError):
+    """
+    Non-zero completion code of an IPMI command
+    """
+
+
+class IPMIDevice:
+    """
+    BMC commands sent through the OpenIPMI device, as ipmitool does
+    """
+
+    def __init__(self, path=IPMI_DEVICE, timeout=5):
+        self.fd = os.open(path, os.O_RDWR)
+        self.timeout = timeout
+        self.msgid = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        os.close(self.fd)
+
+    def _ioctl(self, request, arg):
+        return fcntl.ioctl(self.fd, request, arg)
+
+    def command(self, netfn, cmd, data=b""):
+        """
+        Return the response data of a command, without its completion code
+        """
+        self.msgid += 1
+        addr = array(
+            "B",
+            SYSTEM_INTERFACE_ADDR.pack(IPMI_SYSTEM_INTERFACE_ADDR_TYPE, IPMI_BMC_CHANNEL, 0),
+        )
+        # a valid pointer even without data
+        buf = array("B", data or b"\0")
+        request = IPMI_REQ.pack(
+            addr.buffer_info()[0],
+            len(addr),
+            self.msgid,
+            netfn,
+            cmd,
+            len(data),
+            buf.buffer_info()[0],
+        )
+        self._ioctl(IPMICTL_SEND_COMMAND, request)
+
+        while True:
+            readable, _, _ = select.select([self.fd], [], [], self.timeout)
+            if not readable:
+                raise OSError(errno.ETIMEDOUT, "No answer from the BMC")
+            recv_addr = array("B", bytes(IPMI_MAX_ADDR_SIZE))
+            response = array("B", bytes(IPMI_MAX_MSG_LENGTH))
+            recv = bytearray(
+                IPMI_RECV.pack(
+                    0,
+                    recv_addr.buffer_info()[0],
+                    len(recv_addr),
+                    0,
+                    0,
+                    0,
+                    len(response),
+                    response.buffer_info()[0],
+                )
+            )
+            self._ioctl(IPMICTL_RECEIVE_MSG_TRUNC, recv)
+            _, _, _, msgid, _, _, length, _ = IPMI_RECV.unpack(recv)
+            # ie: the answer of a timed out command
+            if msgid == self.msgid:
+                break
+
+        response = response[:length].tobytes()
+        if not response or response[0] != 0:
+            raise IPMICommandError(
+                errno.EIO,
+                "IPMI command {:#04x} failed: {}".format(cmd, response[:1].hex() or "empty"),
+            )
+        return response[1:]
+
+    def get_lan_channel(self):
+        """
+        Return the first 802.3 LAN channel of the BMC
+        """
+        for channel in range(1, 12):
+            try:
+                info = self.command(IPMI_NETFN_APP, IPMI_GET_CHANNEL_INFO, bytes([channel]))
+            # ie: not a channel of this BMC, a timeout aborts the scan
+            except IPMICommandError:
+                continue
+            if len(info) > 1 and info[1] & 0x7F == IPMI_CHANNEL_MEDIUM_LAN:
+                return channel
+        raise OSError(errno.ENODEV, "No LAN channel on the BMC")
+
+    def get_lan_config(self):
+        """
+        Return the IP address, netmask, MAC address and VLAN of the BMC, as
+        printed by `ipmitool lan print`
+        """
+        channel = self.get_lan_channel()
+        values = {}
+        for name, param in LAN_PARAMS.items():
+            data = self.command(
+                IPMI_NETFN_TRANSPORT, IPMI_GET_LAN_CONFIG_PARAMS, bytes([channel, param, 0, 0])
+            )
+            # the first byte is the parameter revision
+            values[name] = data[1:]
+
+        lan = {
+            "IP Address": ".".join(str(b) for b in values["IP Address"][:4]),
+            "Subnet Mask": ".".join(str(b) for b in values["Subnet Mask"][:4]),
+            "MAC Address": ":".join("{:02x}".format(b) for b in values["MAC Address"][:6]),
+            "802.1q VLAN ID": "Disabled",
+        }
+        vlan = values["802.1q VLAN ID"]
+        if len(vlan) > 1 and vlan[1] & 0x80:
+            lan["802.1q VLAN ID"] = str(vlan[0] | (vlan[1] & 0x0F) << 8)
+        return lan
+
 
 class IPMI:
     """
@@ -36,20 +198,39 @@ class IPMI:
     Bad Password Threshold  : Not Available
     """
 
-    def __init__(self):
-        self.ret, self.output = subprocess.getstatusoutput("ipmitool lan print")
-        if self.ret != 0:
-            logging.warning("IPMI command failed: {}".format(self.output))
+    def __init__(self, device=IPMI_DEVICE):
+        # LAN settings of the BMC, cached for `cache.ipmi_ttl` seconds
+        key = {"device": device}
+        self.lan = load_state("ipmi", key, config.cache.ipmi_ttl)
+        if self.lan is not None:
+            return
 
-    def parse(self):
+        try:
+            with IPMIDevice(device) as ipmi_device:
+                self.lan = ipmi_device.get_lan_config()
+        except OSError as e:
+            logging.debug("Unable to query the BMC through {}: {}".format(device, e))
+            self.ret, self.output = commands.getstatusoutput("ipmitool lan print")
+            if self.ret != 0:
+                logging.warning("IPMI command failed: {}".format(self.output))
+                return
+            self.lan = self.parse_output(self.output)
+        save_state("ipmi", key, self.lan)
+
+    @staticmethod
+    def parse_output(output):
         _ipmi = {}
 
-        for line in self.output.splitlines():
+        for line in output.splitlines():
             key = line.split(":")[0].strip()
-            if key not in ["802.1q VLAN ID", "IP Address", "Subnet Mask", "MAC Address"]:
+            if key not in LAN_PARAMS:
                 continue
             value = ":".join(line.split(":")[1:]).strip()
             _ipmi[key] = value
+        return _ipmi
+
+    def parse(self):
+        _ipmi = self.lan or {}
 
         ret = {}
         ret["name"] = "IPMI"
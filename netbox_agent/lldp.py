@@ -1,71 +1,120 @@
+import json
 import logging
-import subprocess
 
-from netbox_agent.misc import is_tool
+from netbox_agent.commands import commands, is_tool
+
+
+def _first(values, key="value"):
+    # json0 puts every value in a list of dicts
+    if not values:
+        return None
+    return values[0].get(key)
+
+
+def _vlan_id(value):
+    return value.replace("vlan-", "").replace("VLAN", "")
 
 
 class LLDP:
+    """
+    Neighbors of the interfaces from `lldpctl -f json0`, or from the
+    `lldpctl -f keyvalue` output with older lldpd versions
+
+    Both are read once into a record per local interface:
+
+    {"eth0": {"mgmt-ip": "10.192.192.116", "ifname": None,
+              "descr": "xe-0/0/1", "vlan": {"296": {"pvid": True}}}}
+    """
+
     def __init__(self, output=None):
         if not is_tool("lldpctl"):
             logging.debug("lldpd package seems to be missing or daemon not running.")
         if output:
             self.output = output
         else:
-            self.output = subprocess.getoutput("lldpctl -f keyvalue")
-        self.data = self.parse()
+            self.output = commands.getoutput(["lldpctl", "-f", "json0"])
+            if not self.output.lstrip().startswith("{"):
+                self.output = commands.getoutput(["lldpctl", "-f", "keyvalue"])
+        self.neighbors = self.parse()
 
     def parse(self):
-        output_dict = {}
-        vlans = {}
+        if self.output.lstrip().startswith("{"):
+            neighbors = self.parse_json(self.output)
+        else:
+            neighbors = self.parse_keyvalue(self.output)
+        if not neighbors:
+            logging.debug("No LLDP output, please check your network config.")
+        return neighbors
+
+    @staticmethod
+    def parse_json(output):
+        neighbors = {}
+        for lldp in json.loads(output).get("lldp", []):
+            for interface in lldp.get("interface", []):
+                chassis = (interface.get("chassis") or [{}])[0]
+                port = (interface.get("port") or [{}])[0]
+                vlans = {}
+                for vlan in interface.get("vlan", []):
+                    vid = vlan.get("vlan-id") or _vlan_id(vlan.get("value", ""))
+                    vlans[str(vid)] = {"pvid": True} if vlan.get("pvid") in (True, "yes") else {}
+                neighbors[interface["name"]] = {
+                    "mgmt-ip": _first(chassis.get("mgmt-ip")),
+                    "ifname": next(
+                        (i.get("value") for i in port.get("id", []) if i.get("type") == "ifname"),
+                        None,
+                    ),
+                    "descr": _first(port.get("descr")),
+                    "vlan": vlans,
+                }
+        return neighbors
+
+    @staticmethod
+    def parse_keyvalue(output):
+        neighbors = {}
         vid = None
-        for entry in self.output.splitlines():
+        for entry in output.splitlines():
             if "=" not in entry:
                 continue
             path, value = entry.strip().split("=", 1)
-            split_path = path.split(".")
-            interface = split_path[1]
-            path_components, final = split_path[:-1], split_path[-1]
-            current_dict = output_dict
-
-            if vlans.get(interface) is None:
-                vlans[interface] = {}
-
-            for path_component in path_components:
-                if not isinstance(current_dict.get(path_component), dict):
-                    current_dict[path_component] = {}
-                current_dict = current_dict.get(path_component)
-                if "vlan-id" in path:
-                    vid = value
-                    vlans[interface][value] = vlans[interface].get(vid, {})
-                elif path.endswith("vlan"):
-                    vid = value.replace("vlan-", "").replace("VLAN", "")
-                    vlans[interface][vid] = vlans[interface].get(vid, {})
-                elif "pvid" in path:
-                    vlans[interface][vid]["pvid"] = True
-            if "vlan" not in path:
-                current_dict[final] = value
-        for interface, vlan in vlans.items():
-            output_dict["lldp"][interface]["vlan"] = vlan
-        if not output_dict:
-            logging.debug("No LLDP output, please check your network config.")
-        return output_dict
+            split_path = path.split(".", 2)
+            if len(split_path) < 3:
+                continue
+            neighbor = neighbors.setdefault(
+                split_path[1], {"mgmt-ip": None, "ifname": None, "descr": None, "vlan": {}}
+            )
+            key = split_path[2]
+            if key == "chassis.mgmt-ip":
+                # the first one, the next ones are usually IPv6 link-local
+                if neighbor["mgmt-ip"] is None:
+                    neighbor["mgmt-ip"] = value
+            elif key == "port.ifname":
+                neighbor["ifname"] = value
+            elif key == "port.descr":
+                neighbor["descr"] = value
+            elif key == "vlan.vlan-id":
+                vid = value
+                neighbor["vlan"].setdefault(vid, {})
+            elif key == "vlan.pvid":
+                neighbor["vlan"][vid]["pvid"] = True
+            elif key == "vlan":
+                vid = _vlan_id(value)
+                neighbor["vlan"].setdefault(vid, {})
+        return neighbors
 
     def get_switch_ip(self, interface):
         # lldp.eth0.chassis.mgmt-ip=100.66.7.222
-        if self.data.get("lldp", {}).get(interface) is None:
+        if interface not in self.neighbors:
             return None
-        return self.data["lldp"][interface]["chassis"].get("mgmt-ip")
+        return self.neighbors[interface]["mgmt-ip"]
 
     def get_switch_port(self, interface):
         # lldp.eth0.port.descr=GigabitEthernet1/0/1
-        if self.data.get("lldp", {}).get(interface) is None:
+        if interface not in self.neighbors:
             return None
-        if self.data["lldp"][interface]["port"].get("ifname"):
-            return self.data["lldp"][interface]["port"]["ifname"]
-        return self.data["lldp"][interface]["port"]["descr"]
+        return self.neighbors[interface]["ifname"] or self.neighbors[interface]["descr"]
 
     def get_switch_vlan(self, interface):
         # lldp.eth0.vlan.vlan-id=296
-        if self.data.get("lldp", {}).get(interface) is None:
+        if interface not in self.neighbors:
             return None
-        return self.data["lldp"][interface]["vlan"]
+        return self.neighbors[interface]["vlan"]
@@ -1,24 +1,248 @@
-from netbox_agent.misc import is_tool
-import subprocess
+from netbox_agent.commands import commands, is_tool
 import logging
 import json
+import io
+import re
 import sys
 
 
+# lshw classes of each hardware class
+LSHW_CLASSES = {
+    "cpu": ("processor",),
+    "memory": ("memory",),
+    "network": ("network",),
+    "storage": ("storage", "disk"),
+    "gpu": ("display",),
+    "motherboard": ("system", "bus"),
+}
+
+# slow lshw probes and the hardware classes needing them
+LSHW_PROBES = {
+    "usb": ("network", "storage"),
+    "ide": ("storage",),
+    "scsi": ("storage",),
+    "dmi": ("cpu", "memory", "motherboard"),
+    "spd": ("memory",),
+    "network": ("network",),
+}
+
+
+# fields of the lshw nodes kept by `load`, with the fields kept in their value
+NODE_FIELDS = dict.fromkeys(
+    (
+        "id",
+        "class",
+        "businfo",
+        "description",
+        "product",
+        "vendor",
+        "serial",
+        "slot",
+        "version",
+        "size",
+        "logicalname",
+    )
+)
+NODE_FIELDS["configuration"] = {"driver": None}
+NODE_FIELDS["children"] = NODE_FIELDS
+
+_WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+
+
+class _Reader:
+    """
+    JSON text read from a stream chunk by chunk
+    """
+
+    def __init__(self, stream, chunk_size):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def read(self):
+        chunk = self.stream.read(self.chunk_size)
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+        self.eof = not chunk
+        return not self.eof
+
+    def at_end(self):
+        while True:
+            self.pos = _WHITESPACE_RE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return False
+            if self.eof or not self.read():
+                return True
+
+    def peek(self):
+        if self.at_end():
+            raise ValueError("Truncated lshw output")
+        return self.buf[self.pos]
+
+    def take(self):
+        char = self.peek()
+        self.pos += 1
+        return char
+
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof or not self.read():
+                    raise
+                continue
+            # a number may go on in the next chunk
+            if end == len(self.buf) and not self.eof and self.read():
+                continue
+            self.pos = end
+            return value
+
+
+def _load_value(reader, fields):
+    char = reader.peek()
+    if fields is None or char not in "{[":
+        return reader.decode()
+
+    reader.take()
+    if char == "[":
+        array = []
+        while True:
+            char = reader.peek()
+            if char == "]":
+                reader.take()
+                return array
+            if char == ",":
+                reader.take()
+                continue
+            array.append(_load_value(reader, fields))
+
+    obj = {}
+    while True:
+        char = reader.peek()
+        if char == "}":
+            reader.take()
+            return obj
+        if char == ",":
+            reader.take()
+            continue
+        key = reader.decode()
+        if reader.take() != ":":
+            raise ValueError("Invalid lshw output")
+        if key in fields:
+            obj[sys.intern(key)] = _load_value(reader, fields[key])
+        else:
+            reader.decode()
+
+
+def load(stream, chunk_size=2**16, fields=NODE_FIELDS):
+    """
+    Parse the `lshw -json` output read from `stream` chunk by chunk,
+    keeping only the `fields` of its nodes
+
+    The whole output and its full object tree are never held in memory,
+    the other fields being decoded and dropped one at a time.
+
+    Some lshw releases print the nodes of `-class` one after another
+    rather than in a list, they are returned as a list.
+    """
+    reader = _Reader(stream, chunk_size)
+    nodes = [_load_value(reader, fields)]
+    while not reader.at_end():
+        if reader.peek() == ",":
+            reader.take()
+            continue
+        nodes.append(_load_value(reader, fields))
+    return nodes[0] if len(nodes) == 1 else nodes
+
+
+def load_all(stream):
+    """
+    `json.load`, also reading the nodes lshw prints one after another
+    """
+    output = stream.read()
+    try:
+        return json.loads(output)
+    except json.JSONDecodeError:
+        return load(io.StringIO(output), fields=None)
+
+
+def get_command(classes=None):
+    """
+    Return the lshw command line, limited to `classes` hardware classes
+    (ie: cpu, storage) when given
+    """
+    command = ["lshw", "-quiet", "-json"]
+    # the full output is kept when lshw collects everything, with `-class`
+    # lshw flattens the tree and its output differs between releases
+    if classes is None or set(LSHW_CLASSES) <= set(classes):
+        return command
+    for hwclass in classes:
+        for lshw_class in LSHW_CLASSES[hwclass]:
+            command += ["-class", lshw_class]
+    for probe, needed_by in LSHW_PROBES.items():
+        if not set(needed_by) & set(classes):
+            command += ["-disable", probe]
+    return command
+
+
 class LSHW:
-    def __init__(self):
-        if not is_tool("lshw"):
-            logging.error("lshw does not seem to be installed")
-            sys.exit(1)
+    """
+    Parse the `lshw -json` output
 
-        data = subprocess.getoutput("lshw -quiet -json")
-        json_data = json.loads(data)
-        # Starting from version 02.18, `lshw -json` wraps its result in a list
-        # rather than returning directly a dictionary
-        if isinstance(json_data, list):
-            self.hw_info = json_data[0]
+    With `classes` missing some hardware classes, lshw only reports the
+    nodes of these classes and its slow probes useless for them are
+    disabled. `output` may be
+    given as a string or a file object instead.
+
+    With `streaming`, the output is parsed as it is read, only keeping the
+    fields used here (see `load`): slower, but it lowers the peak memory on
+    servers with a big lshw output.
+
+    The tree is walked once, whatever its depth (ie: devices behind PCIe
+    switches), each node being handed to the method of its class.
+    """
+
+    # lshw class of a node -> method handling it
+    HANDLERS = {
+        "system": "find_system",
+        "bus": "find_motherboard",
+        "power": "find_power",
+        "processor": "find_cpus",
+        "memory": "find_memories",
+        "storage": "find_storage",
+        "disk": "find_disk",
+        "network": "find_network",
+        "display": "find_gpus",
+    }
+    # the children of these nodes are the DIMMs and disks their method handles
+    LEAF_CLASSES = ("memory", "storage", "disk")
+
+    def __init__(self, classes=None, output=None, streaming=False):
+        parse = load_all
+        if streaming:
+            parse = load
+        if output is None:
+            if not is_tool("lshw"):
+                logging.error("lshw does not seem to be installed")
+                sys.exit(1)
+            command = get_command(classes)
+            try:
+                with commands.popen(command) as process:
+                    json_data = parse(process.stdout)
+            # ie: lshw killed after commands.timeout
+            except ValueError as e:
+                logging.error("Unable to parse the lshw output: {}".format(e))
+                sys.exit(1)
+        elif isinstance(output, str):
+            json_data = parse(io.StringIO(output))
         else:
-            self.hw_info = json_data
+            json_data = parse(output)
+
         self.info = {}
         self.memories = []
         self.interfaces = []
@@ -26,33 +250,42 @@ class LSHW:
         self.power = []
         self.disks = []
         self.gpus = []
-        self.vendor = self.hw_info["vendor"]
-        self.product = self.hw_info["product"]
-        self.chassis_serial = self.hw_info["serial"]
-        self.motherboard_serial = self.hw_info["children"][0].get("serial", "No S/N")
-        self.motherboard = self.hw_info["children"][0].get("product", "Motherboard")
+        self.vendor = self.product = self.chassis_serial = None
+        self.motherboard_serial = "No S/N"
+        self.motherboard = "Motherboard"
+        self.unknown_interfaces = 0
 
-        for k in self.hw_info["children"]:
-            if k["class"] == "power":
-                # self.power[k["id"]] = k
-                self.power.append(k)
-
-            if "children" in k:
-                for j in k["children"]:
-                    if j["class"] == "generic":
-                        continue
+        # Starting from version 02.18, `lshw -json` wraps its result in a list
+        # rather than returning directly a dictionary
+        if isinstance(json_data, list):
+            self.walk(json_data)
+        else:
+            self.walk([json_data])
 
-                    if j["class"] == "storage":
-                        self.find_storage(j)
+    def walk(self, nodes):
+        stack = list(reversed(nodes))
+        while stack:
+            node = stack.pop()
+            hwclass = node.get("class")
+            handler = self.HANDLERS.get(hwclass)
+            if handler is not None:
+                getattr(self, handler)(node)
+            if hwclass not in self.LEAF_CLASSES and "children" in node:
+                stack.extend(reversed(node["children"]))
 
-                    if j["class"] == "memory":
-                        self.find_memories(j)
+    def find_system(self, obj):
+        if self.product is None:
+            self.vendor = obj.get("vendor")
+            self.product = obj.get("product")
+            self.chassis_serial = obj.get("serial")
 
-                    if j["class"] == "processor":
-                        self.find_cpus(j)
+    def find_motherboard(self, obj):
+        if obj.get("id") == "core":
+            self.motherboard_serial = obj.get("serial", "No S/N")
+            self.motherboard = obj.get("product", "Motherboard")
 
-                    if j["class"] == "bridge":
-                        self.walk_bridge(j)
+    def find_power(self, obj):
+        self.power.append(obj)
 
     def get_hw_linux(self, hwclass):
         if hwclass == "cpu":
@@ -67,24 +300,20 @@ class LSHW:
             return self.memories
 
     def find_network(self, obj):
+        # virtual interfaces (bridges, veth...) aren't hardware
+        if "businfo" not in obj:
+            return
+
         # Some interfaces do not have device (logical) name (eth0, for
         # instance), such as not connected network mezzanine cards in blade
         # servers. In such situations, the card will be named `unknown[0-9]`.
-        unkn_intfs = []
-        for i in self.interfaces:
-            # newer versions of lshw can return a list of names, see issue #227
-            if not isinstance(i["name"], list):
-                if i["name"].startswith("unknown"):
-                    unkn_intfs.append(i)
-            else:
-                for j in i["name"]:
-                    if j.startswith("unknown"):
-                        unkn_intfs.append(j)
-
-        unkn_name = "unknown{}".format(len(unkn_intfs))
+        name = obj.get("logicalname")
+        if name is None:
+            name = "unknown{}".format(self.unknown_interfaces)
+            self.unknown_interfaces += 1
         self.interfaces.append(
             {
-                "name": obj.get("logicalname", unkn_name),
+                "name": name,
                 "macaddress": obj.get("serial", ""),
                 "serial": obj.get("serial", ""),
                 "product": obj.get("product", "Unknown NIC"),
@@ -107,13 +336,13 @@ class LSHW:
                         "type": device.get("description"),
                     }
                 )
-        elif "driver" in obj["configuration"] and "nvme" in obj["configuration"]["driver"]:
+        elif "nvme" in obj.get("configuration", {}).get("driver", ""):
             if not is_tool("nvme"):
                 logging.error("nvme-cli >= 1.0 does not seem to be installed")
                 return
             try:
                 nvme = json.loads(
-                    subprocess.check_output(["nvme", "-list", "-o", "json"], encoding="utf8")
+                    commands.getoutput(["nvme", "-list", "-o", "json"], stderr=False)
                 )
                 for device in nvme["Devices"]:
                     d = {
@@ -132,8 +361,12 @@ class LSHW:
             except Exception:
                 pass
 
+    def find_disk(self, obj):
+        self.find_storage({"children": [obj]})
+
     def find_cpus(self, obj):
-        if "product" in obj:
+        # PCI co-processors (ie: crypto accelerators) aren't CPUs
+        if "product" in obj and not obj.get("businfo", "").startswith("pci@"):
             self.cpus.append(
                 {
                     "product": obj.get("product", "Unknown CPU"),
@@ -173,25 +406,6 @@ class LSHW:
             }
             self.gpus.append(infos)
 
-    def walk_bridge(self, obj):
-        if "children" not in obj:
-            return
-
-        for bus in obj["children"]:
-            if bus["class"] == "storage":
-                self.find_storage(bus)
-            if bus["class"] == "display":
-                self.find_gpus(bus)
-
-            if "children" in bus:
-                for b in bus["children"]:
-                    if b["class"] == "storage":
-                        self.find_storage(b)
-                    if b["class"] == "network":
-                        self.find_network(b)
-                    if b["class"] == "display":
-                        self.find_gpus(b)
-
 
 if __name__ == "__main__":
     pass
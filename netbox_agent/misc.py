@@ -1,27 +1,23 @@
 from contextlib import suppress
+from netbox_agent.cache import cache
+from netbox_agent.commands import commands, is_tool  # NOQA
 from netbox_agent.config import netbox_instance as nb
+from netbox_agent.plan import plan
 from slugify import slugify
-from shutil import which
 import distro
-import subprocess
 import socket
 import re
 
 
-def is_tool(name):
-    """Check whether `name` is on PATH and marked as executable."""
-    return which(name) is not None
-
-
 def get_device_role(role):
-    device_role = nb.dcim.device_roles.get(name=role)
+    device_role = cache.get(nb.dcim.device_roles, name=role)
     if device_role is None:
         raise Exception('DeviceRole "{}" does not exist, please create it'.format(role))
     return device_role
 
 
 def get_device_type(type):
-    device_type = nb.dcim.device_types.get(model=type)
+    device_type = cache.get(nb.dcim.device_types, model=type)
     if device_type is None:
         raise Exception('DeviceType "{}" does not exist, please create it'.format(type))
     return device_type
@@ -43,12 +39,13 @@ def get_device_platform(device_platform):
     else:
         linux_distribution = device_platform
 
-    device_platform = nb.dcim.platforms.get(name=linux_distribution)
-    if device_platform is None:
-        device_platform = nb.dcim.platforms.create(
-            name=linux_distribution, slug=slugify(linux_distribution)
-        )
-    return device_platform
+    return cache.get_or_create(
+        nb.dcim.platforms,
+        lambda: plan.create(
+            nb.dcim.platforms, name=linux_distribution, slug=slugify(linux_distribution)
+        ),
+        name=linux_distribution,
+    )
 
 
 def get_vendor(name):
@@ -79,25 +76,25 @@ def get_vendor(name):
 def get_hostname(config):
     if config.hostname_cmd is None:
         return "{}".format(socket.gethostname())
-    return subprocess.getoutput(config.hostname_cmd)
+    return commands.getoutput(config.hostname_cmd, cache=True)
 
 
 def create_netbox_tags(tags):
     ret = []
     for tag in tags:
-        nb_tag = nb.extras.tags.get(name=tag)
-        if not nb_tag:
-            nb_tag = nb.extras.tags.create(
-                name=tag,
-                slug=slugify(tag),
-            )
-        ret.append(nb_tag)
+        nb_tag = cache.get_or_create(
+            nb.extras.tags,
+            lambda: plan.create(nb.extras.tags, name=tag, slug=slugify(tag)),
+            name=tag,
+        )
+        if nb_tag is not None:
+            ret.append(nb_tag)
     return ret
 
 
 def get_mount_points():
     mount_points = {}
-    output = subprocess.getoutput("mount")
+    output = commands.getoutput("mount", cache=True)
     for r in output.split("\n"):
         if not r.startswith("/dev/"):
             continue
@@ -0,0 +1,176 @@
+import os
+import socket
+import struct
+
+NETLINK_ROUTE = 0
+NLM_F_REQUEST = 0x01
+NLM_F_DUMP = 0x300
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+RTM_NEWLINK = 16
+RTM_GETLINK = 18
+RTM_NEWADDR = 20
+RTM_GETADDR = 22
+
+IFLA_ADDRESS = 1
+IFLA_IFNAME = 3
+IFLA_MTU = 4
+IFLA_MASTER = 10
+IFLA_LINKINFO = 18
+IFLA_INFO_KIND = 1
+IFLA_INFO_SLAVE_KIND = 4
+
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+IFA_LABEL = 3
+
+LINK_ATTRIBUTES = {IFLA_ADDRESS, IFLA_IFNAME, IFLA_MTU, IFLA_MASTER, IFLA_LINKINFO}
+ADDRESS_ATTRIBUTES = {IFA_ADDRESS, IFA_LOCAL, IFA_LABEL}
+
+# struct nlmsghdr, struct ifinfomsg, struct ifaddrmsg, struct rtattr
+NLMSGHDR = struct.Struct("=IHHII")
+IFINFOMSG = struct.Struct("=BxHiII")
+IFADDRMSG = struct.Struct("=BBBBI")
+RTATTR = struct.Struct("=HH")
+
+
+def _align(length):
+    return (length + 3) & ~3
+
+
+def parse_messages(data):
+    """
+    Yield the type and payload of the netlink messages of `data`
+    """
+    offset = 0
+    while offset + NLMSGHDR.size <= len(data):
+        length, msg_type, _, _, _ = NLMSGHDR.unpack_from(data, offset)
+        if length < NLMSGHDR.size:
+            break
+        yield msg_type, data[offset + NLMSGHDR.size : offset + length]
+        offset += _align(length)
+
+
+def parse_attributes(data, offset=0, types=None):
+    """
+    Return the rtattr attributes of `data` as a dict, only the ones of
+    `types` when given
+    """
+    attributes = {}
+    end = len(data)
+    while offset + 4 <= end:
+        length, attr_type = RTATTR.unpack_from(data, offset)
+        if length < RTATTR.size:
+            break
+        # the high bits are the nested and byte order flags
+        attr_type &= 0x3FFF
+        if types is None or attr_type in types:
+            attributes[attr_type] = data[offset + RTATTR.size : offset + length]
+        offset += (length + 3) & ~3
+    return attributes
+
+
+def _string(value):
+    return value.split(b"\0", 1)[0].decode(errors="replace")
+
+
+def parse_link(payload):
+    family, link_type, index, flags, _ = IFINFOMSG.unpack_from(payload)
+    attributes = parse_attributes(payload, IFINFOMSG.size, LINK_ATTRIBUTES)
+    linkinfo = parse_attributes(attributes.get(IFLA_LINKINFO, b""))
+    address = attributes.get(IFLA_ADDRESS, b"")
+    return {
+        "index": index,
+        "type": link_type,
+        "flags": flags,
+        "name": _string(attributes.get(IFLA_IFNAME, b"")),
+        "address": ":".join("{:02x}".format(b) for b in address) or None,
+        "mtu": struct.unpack("=I", attributes[IFLA_MTU])[0] if IFLA_MTU in attributes else None,
+        "master": struct.unpack("=I", attributes[IFLA_MASTER])[0]
+        if IFLA_MASTER in attributes
+        else None,
+        "kind": _string(linkinfo[IFLA_INFO_KIND]) if IFLA_INFO_KIND in linkinfo else None,
+        "slave_kind": _string(linkinfo[IFLA_INFO_SLAVE_KIND])
+        if IFLA_INFO_SLAVE_KIND in linkinfo
+        else None,
+    }
+
+
+def parse_address(payload):
+    family, prefixlen, _, scope, index = IFADDRMSG.unpack_from(payload)
+    attributes = parse_attributes(payload, IFADDRMSG.size, ADDRESS_ATTRIBUTES)
+    # IFA_ADDRESS is the peer of point to point interfaces
+    address = attributes.get(IFA_LOCAL, attributes.get(IFA_ADDRESS))
+    if address is None or family not in (socket.AF_INET, socket.AF_INET6):
+        return None
+    return {
+        "index": index,
+        "family": family,
+        "address": socket.inet_ntop(family, address),
+        "prefixlen": prefixlen,
+        "label": _string(attributes[IFA_LABEL]) if IFA_LABEL in attributes else None,
+    }
+
+
+def parse_links(data):
+    return [
+        parse_link(payload)
+        for msg_type, payload in parse_messages(data)
+        if msg_type == RTM_NEWLINK
+    ]
+
+
+def parse_addresses(data):
+    addresses = (
+        parse_address(payload)
+        for msg_type, payload in parse_messages(data)
+        if msg_type == RTM_NEWADDR
+    )
+    return [a for a in addresses if a is not None]
+
+
+class Netlink:
+    """
+    rtnetlink socket dumping the links and addresses of the host in a few
+    reads, rather than reading them interface by interface
+    """
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+        self.sock.bind((0, 0))
+        self.seq = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.sock.close()
+
+    def dump(self, msg_type, payload):
+        """
+        Return the raw answer of a dump request, up to its NLMSG_DONE
+        """
+        self.seq += 1
+        header = NLMSGHDR.pack(
+            NLMSGHDR.size + len(payload), msg_type, NLM_F_REQUEST | NLM_F_DUMP, self.seq, 0
+        )
+        self.sock.sendto(header + payload, (0, 0))
+
+        chunks = []
+        while True:
+            data = self.sock.recv(1 << 16)
+            chunks.append(data)
+            for msg_type, message in parse_messages(data):
+                if msg_type == NLMSG_DONE:
+                    return b"".join(chunks)
+                if msg_type == NLMSG_ERROR:
+                    error = -struct.unpack_from("=i", message)[0]
+                    raise OSError(error, os.strerror(error))
+
+    def get_links(self):
+        return parse_links(self.dump(RTM_GETLINK, IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)))
+
+    def get_addresses(self):
+        return parse_addresses(
+            self.dump(RTM_GETADDR, IFADDRMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0))
+        )
@@ -1,34 +1,95 @@
 import logging
 import os
 import re
-from itertools import chain, islice
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
 
 import netifaces
 from netaddr import IPAddress
-from packaging import version
 
+from netbox_agent.cache import cache, get_choices
+from netbox_agent.capabilities import get_capabilities
+from netbox_agent.collectors import collectors
 from netbox_agent.config import config
 from netbox_agent.config import netbox_instance as nb
-from netbox_agent.ethtool import Ethtool
-from netbox_agent.ipmi import IPMI
-from netbox_agent.lldp import LLDP
+from netbox_agent.ethtool import PROBES, Ethtool
+from netbox_agent.netlink import Netlink
+from netbox_agent.phases import current_phase, set_phase
+from netbox_agent.plan import plan
 
 VIRTUAL_NET_FOLDER = Path("/sys/devices/virtual/net")
+ARPHRD_LOOPBACK = 772
+
+
+def get_interface_class(interface, sysfs="/sys/class/net", link=None):
+    """
+    Return the class of `interface` choosing the infos collected on it:
+    physical, bond, vlan, virtual or loopback
+
+    Interfaces without a device are the ones of `VIRTUAL_NET_FOLDER`, they
+    have no transceiver nor permanent MAC address. The type and kind of the
+    interface are taken from its netlink `link` when given.
+    """
+    path = os.path.join(sysfs, interface)
+    if link is not None:
+        link_type = link["type"]
+    else:
+        try:
+            with open(os.path.join(path, "type")) as f:
+                link_type = int(f.read())
+        except (OSError, ValueError):
+            link_type = None
+    if link_type == ARPHRD_LOOPBACK:
+        return "loopback"
+    if os.path.exists(os.path.join(path, "device")):
+        return "physical"
+    if link is not None:
+        kind = link.get("kind")
+    elif os.path.isdir(os.path.join(path, "bonding")):
+        kind = "bond"
+    elif os.path.exists(os.path.join("/proc/net/vlan", interface)):
+        kind = "vlan"
+    else:
+        kind = None
+    if kind == "bond":
+        return "bond"
+    if "." in interface or kind == "vlan":
+        return "vlan"
+    return "virtual"
+
+
+def batched(it, n):
+    it = iter(it)
+    while batch := tuple(islice(it, n)):
+        yield batch
 
 
 class Network(object):
     def __init__(self, server, *args, **kwargs):
         self.nics = []
+        # Netbox interfaces of the device, fetched once and indexed by
+        # id, name and MAC address (see `_prefetch_netbox_network_cards`)
+        self.nb_nics = None
+        self.nb_nics_by_name = {}
+        self.nb_nics_by_mac = {}
+        self.created_nics = set()
+        # Netbox IP addresses snapshot (see `_prefetch_netbox_ips`), None
+        # until it is taken
+        self.netbox_ips = None
+        self.netbox_ips_by_address = {}
 
         self.server = server
         self.tenant = self.server.get_netbox_tenant()
 
-        self.lldp = LLDP() if config.network.lldp else None
-        self.nics = self.scan()
+        self.lldp = collectors.get("lldp") if config.network.lldp else None
+        # the scan is shared with the fingerprint, ipmi is appended to a copy
+        self.nics = list(collectors.get("nics"))
         self.ipmi = None
         self.dcim_choices = {}
-        dcim_c = nb.dcim.interfaces.choices()
+        dcim_c = get_choices(nb.dcim.interfaces)
         for _choice_type in dcim_c:
             key = "interface:{}".format(_choice_type)
             self.dcim_choices[key] = {}
@@ -36,7 +97,7 @@ class Network(object):
                 self.dcim_choices[key][choice["display_name"]] = choice["value"]
 
         self.ipam_choices = {}
-        ipam_c = nb.ipam.ip_addresses.choices()
+        ipam_c = get_choices(nb.ipam.ip_addresses)
         for _choice_type in ipam_c:
             key = "ip-address:{}".format(_choice_type)
             self.ipam_choices[key] = {}
@@ -46,8 +107,15 @@ class Network(object):
     def get_network_type():
         return NotImplementedError
 
-    def scan(self):
+    @staticmethod
+    def scan():
+        if config.network.scan == "netlink":
+            with Netlink() as netlink:
+                return Network.scan_links(netlink.get_links(), netlink.get_addresses())
+
         nics = []
+        # time spent and interfaces scanned per class
+        timings = {}
         for interface in os.listdir("/sys/class/net/"):
             # ignore if it's not a link (ie: bonding_masters etc)
             if not os.path.islink("/sys/class/net/{}".format(interface)):
@@ -59,93 +127,228 @@ class Network(object):
                 logging.debug("Ignore interface {interface}".format(interface=interface))
                 continue
 
-            ip_addr = netifaces.ifaddresses(interface).get(netifaces.AF_INET, [])
-            ip6_addr = netifaces.ifaddresses(interface).get(netifaces.AF_INET6, [])
-            if config.network.ignore_ips:
-                for i, ip in enumerate(ip_addr):
-                    if re.match(config.network.ignore_ips, ip["addr"]):
-                        ip_addr.pop(i)
-                for i, ip in enumerate(ip6_addr):
-                    if re.match(config.network.ignore_ips, ip["addr"]):
-                        ip6_addr.pop(i)
-
-            # netifaces returns a ipv6 netmask that netaddr does not understand.
-            # this strips the netmask down to the correct format for netaddr,
-            # and remove the interface.
-            # ie, this:
-            #   {
-            #      'addr': 'fe80::ec4:7aff:fe59:ec4a%eno1.50',
-            #      'netmask': 'ffff:ffff:ffff:ffff::/64'
-            #   }
-            #
-            # becomes:
-            #   {
-            #      'addr': 'fe80::ec4:7aff:fe59:ec4a',
-            #      'netmask': 'ffff:ffff:ffff:ffff::'
-            #   }
-            #
-            for addr in ip6_addr:
-                addr["addr"] = addr["addr"].replace("%{}".format(interface), "")
-                addr["mask"] = addr["mask"].split("/")[0]
-                ip_addr.append(addr)
-
-            ethtool = Ethtool(interface).parse()
-            if (
-                config.network.primary_mac == "permanent"
-                and ethtool
-                and ethtool.get("mac_address")
-            ):
+            start = time.monotonic()
+            nic_class = get_interface_class(interface)
+            nics.append((Network.scan_interface(interface, nic_class), nic_class))
+            elapsed, count = timings.get(nic_class, (0, 0))
+            timings[nic_class] = (elapsed + time.monotonic() - start, count + 1)
+
+        return Network.probe_interfaces(nics, timings)
+
+    @staticmethod
+    def probe_interfaces(nics, timings):
+        """
+        Return the scanned `nics`, given with their class, with their ethtool
+        infos and their chosen MAC address
+
+        The probes of `network.probe_workers` interfaces run at once, the
+        NICs keeping their order. `timings` has the time spent and the count
+        of interfaces per class, the probes time is added to it.
+
+        `network.probe_timeout` is given to the ethtool commands only, the
+        ioctl and sysfs reads of a probe can't be interrupted.
+        """
+        policies = {}
+        for _, nic_class in nics:
+            if nic_class not in policies:
+                policies[nic_class] = getattr(config.network.collectors, nic_class)
+        primary_mac = config.network.primary_mac
+        timeout = config.network.probe_timeout
+
+        def probe(nic, nic_class):
+            start = time.monotonic()
+            ethtool = None
+            probes = [p for p in PROBES if p in policies[nic_class]]
+            if probes:
+                ethtool = Ethtool(nic["name"], timeout=timeout).parse(probes)
+            return ethtool, time.monotonic() - start
+
+        workers = config.network.probe_workers
+        if workers > 1 and len(nics) > 1:
+            # the logs of the probes go with the sync phase running them
+            with ThreadPoolExecutor(
+                max_workers=workers, initializer=set_phase, initargs=(current_phase(),)
+            ) as pool:
+                results = list(pool.map(lambda n: probe(*n), nics))
+        else:
+            results = [probe(*n) for n in nics]
+
+        for (nic, nic_class), (ethtool, elapsed) in zip(nics, results):
+            nic["ethtool"] = ethtool
+            mac = nic["mac"]
+            if primary_mac == "permanent" and ethtool and ethtool.get("mac_address"):
                 mac = ethtool["mac_address"]
-            else:
-                mac = open("/sys/class/net/{}/address".format(interface), "r").read().strip()
-                if mac == "00:00:00:00:00:00":
-                    mac = None
+            elif mac == "00:00:00:00:00:00":
+                mac = None
             if mac:
                 mac = mac.upper()
+            nic["mac"] = mac
+            total, count = timings[nic_class]
+            timings[nic_class] = (total + elapsed, count)
 
-            mtu = int(open("/sys/class/net/{}/mtu".format(interface), "r").read().strip())
-            vlan = None
-            if len(interface.split(".")) > 1:
-                vlan = int(interface.split(".")[1])
+        for nic_class, (elapsed, count) in sorted(timings.items()):
+            logging.debug("Scanned {} {} interfaces in {:.3f}s".format(count, nic_class, elapsed))
+        return [nic for nic, _ in nics]
 
-            bonding = False
-            bonding_slaves = []
-            if os.path.isdir("/sys/class/net/{}/bonding".format(interface)):
-                bonding = True
-                bonding_slaves = (
-                    open("/sys/class/net/{}/bonding/slaves".format(interface)).read().split()
+    @staticmethod
+    def scan_links(links, addresses):
+        """
+        Return the NICs of the netlink `links` and `addresses` dumps, as
+        `scan` does from sysfs and netifaces
+        """
+        # the config is read once, as there may be thousands of links
+        ignore_ips = config.network.ignore_ips and re.compile(config.network.ignore_ips)
+        ignore_interfaces = config.network.ignore_interfaces and re.compile(
+            config.network.ignore_interfaces
+        )
+        policies = {}
+
+        links_by_index = {link["index"]: link for link in links}
+        bonding_slaves = {}
+        for link in links:
+            if link["slave_kind"] == "bond":
+                bonding_slaves.setdefault(link["master"], []).append(link["name"])
+
+        ips = {}
+        for family in (socket.AF_INET, socket.AF_INET6):
+            for address in addresses:
+                link = links_by_index.get(address["index"])
+                if address["family"] != family or link is None:
+                    continue
+                # netifaces reports the aliases (ie: eth0:1) as interfaces
+                if address["label"] not in (None, link["name"]):
+                    continue
+                if ignore_ips and ignore_ips.match(address["address"]):
+                    continue
+                ips.setdefault(link["index"], []).append(
+                    "{}/{}".format(address["address"], address["prefixlen"])
                 )
 
-            virtual = Path(f"/sys/class/net/{interface}").resolve().parent == VIRTUAL_NET_FOLDER
+        nics = []
+        timings = {}
+        for link in links:
+            interface = link["name"]
+            if ignore_interfaces and ignore_interfaces.match(interface):
+                logging.debug("Ignore interface {interface}".format(interface=interface))
+                continue
 
+            start = time.monotonic()
+            nic_class = get_interface_class(interface, link=link)
+            if nic_class not in policies:
+                policies[nic_class] = getattr(config.network.collectors, nic_class)
+            nic_collectors = policies[nic_class]
+            vlan = None
+            if len(interface.split(".")) > 1:
+                vlan = int(interface.split(".")[1])
+            bonding = "bonding" in nic_collectors and link["kind"] == "bond"
             nic = {
                 "name": interface,
-                "mac": mac,
-                "ip": [
-                    "{}/{}".format(x["addr"], IPAddress(x["mask"]).netmask_bits()) for x in ip_addr
-                ]
-                if ip_addr
-                else None,  # FIXME: handle IPv6 addresses
-                "ethtool": ethtool,
-                "virtual": virtual,
+                "mac": link["address"] or "",
+                "ip": ips.get(link["index"]) if "addresses" in nic_collectors else None,
+                "ethtool": None,
+                "virtual": nic_class != "physical",
                 "vlan": vlan,
-                "mtu": mtu,
+                "mtu": link["mtu"],
                 "bonding": bonding,
-                "bonding_slaves": bonding_slaves,
+                "bonding_slaves": bonding_slaves.get(link["index"], []) if bonding else [],
             }
-            nics.append(nic)
-        return nics
+            nics.append((nic, nic_class))
+            elapsed, count = timings.get(nic_class, (0, 0))
+            timings[nic_class] = (elapsed + time.monotonic() - start, count + 1)
+
+        return Network.probe_interfaces(nics, timings)
+
+    @staticmethod
+    def scan_interface(interface, nic_class):
+        """
+        Return the infos of `interface`, only running the collectors of its
+        class (see `network.collectors`)
+
+        Its ethtool infos are added by `probe_interfaces`.
+        """
+        nic_collectors = getattr(config.network.collectors, nic_class)
+
+        ip_addr = []
+        ip6_addr = []
+        if "addresses" in nic_collectors:
+            addresses = netifaces.ifaddresses(interface)
+            ip_addr = addresses.get(netifaces.AF_INET, [])
+            ip6_addr = addresses.get(netifaces.AF_INET6, [])
+        if config.network.ignore_ips:
+            for i, ip in enumerate(ip_addr):
+                if re.match(config.network.ignore_ips, ip["addr"]):
+                    ip_addr.pop(i)
+            for i, ip in enumerate(ip6_addr):
+                if re.match(config.network.ignore_ips, ip["addr"]):
+                    ip6_addr.pop(i)
+
+        # netifaces returns a ipv6 netmask that netaddr does not understand.
+        # this strips the netmask down to the correct format for netaddr,
+        # and remove the interface.
+        # ie, this:
+        #   {
+        #      'addr': 'fe80::ec4:7aff:fe59:ec4a%eno1.50',
+        #      'netmask': 'ffff:ffff:ffff:ffff::/64'
+        #   }
+        #
+        # becomes:
+        #   {
+        #      'addr': 'fe80::ec4:7aff:fe59:ec4a',
+        #      'netmask': 'ffff:ffff:ffff:ffff::'
+        #   }
+        #
+        for addr in ip6_addr:
+            addr["addr"] = addr["addr"].replace("%{}".format(interface), "")
+            addr["mask"] = addr["mask"].split("/")[0]
+            ip_addr.append(addr)
+
+        mac = open("/sys/class/net/{}/address".format(interface), "r").read().strip()
+        mtu = int(open("/sys/class/net/{}/mtu".format(interface), "r").read().strip())
+        vlan = None
+        if len(interface.split(".")) > 1:
+            vlan = int(interface.split(".")[1])
+
+        bonding = False
+        bonding_slaves = []
+        if "bonding" in nic_collectors and os.path.isdir(
+            "/sys/class/net/{}/bonding".format(interface)
+        ):
+            bonding = True
+            bonding_slaves = (
+                open("/sys/class/net/{}/bonding/slaves".format(interface)).read().split()
+            )
+
+        virtual = Path(f"/sys/class/net/{interface}").resolve().parent == VIRTUAL_NET_FOLDER
+
+        return {
+            "name": interface,
+            "mac": mac,
+            "ip": ["{}/{}".format(x["addr"], IPAddress(x["mask"]).netmask_bits()) for x in ip_addr]
+            if ip_addr
+            else None,  # FIXME: handle IPv6 addresses
+            "ethtool": None,
+            "virtual": virtual,
+            "vlan": vlan,
+            "mtu": mtu,
+            "bonding": bonding,
+            "bonding_slaves": bonding_slaves,
+        }
 
     def _set_bonding_interfaces(self):
         bonding_nics = (x for x in self.nics if x["bonding"])
         for nic in bonding_nics:
             bond_int = self.get_netbox_network_card(nic)
+            if bond_int is None:
+                # interface creation only planned
+                continue
             logging.debug("Setting slave interface for {name}".format(name=bond_int.name))
             for slave_int in (
                 self.get_netbox_network_card(slave_nic)
                 for slave_nic in self.nics
                 if slave_nic["name"] in nic["bonding_slaves"]
             ):
+                if slave_int is None:
+                    continue
                 if slave_int.lag is None or slave_int.lag.id != bond_int.id:
                     logging.debug(
                         "Settting interface {name} as slave of {master}".format(
@@ -153,7 +356,7 @@ class Network(object):
                         )
                     )
                     slave_int.lag = bond_int
-                    slave_int.save()
+                    plan.save(slave_int)
         else:
             return False
         return True
@@ -161,15 +364,47 @@ class Network(object):
     def get_network_cards(self):
         return self.nics
 
+    def _index_netbox_network_card(self, interface):
+        self.nb_nics[interface.id] = interface
+        self.nb_nics_by_name[interface.name] = interface
+        if interface.mac_address:
+            self.nb_nics_by_mac[interface.mac_address.upper()] = interface
+
+    def _forget_netbox_network_card(self, interface):
+        self.nb_nics.pop(interface.id, None)
+        if self.nb_nics_by_name.get(interface.name) is interface:
+            del self.nb_nics_by_name[interface.name]
+        if interface.mac_address:
+            if self.nb_nics_by_mac.get(interface.mac_address.upper()) is interface:
+                del self.nb_nics_by_mac[interface.mac_address.upper()]
+
+    def _rename_netbox_network_card(self, interface, name):
+        self._forget_netbox_network_card(interface)
+        interface.name = name
+        self._index_netbox_network_card(interface)
+
+    def _prefetch_netbox_network_cards(self):
+        """
+        Fetch all the device interfaces in a single paginated query so that
+        per NIC lookups are resolved from memory
+        """
+        self.nb_nics = {}
+        self.nb_nics_by_name = {}
+        self.nb_nics_by_mac = {}
+        for interface in self.nb_net.interfaces.filter(**self.custom_arg_id):
+            self._index_netbox_network_card(interface)
+
     def get_netbox_network_card(self, nic):
+        if self.nb_nics is None:
+            self._prefetch_netbox_network_cards()
         if config.network.nic_id == "mac" and nic["mac"]:
-            interface = self.nb_net.interfaces.get(mac_address=nic["mac"], **self.custom_arg_id)
-        else:
-            interface = self.nb_net.interfaces.get(name=nic["name"], **self.custom_arg_id)
-        return interface
+            return self.nb_nics_by_mac.get(nic["mac"].upper())
+        return self.nb_nics_by_name.get(nic["name"])
 
     def get_netbox_network_cards(self):
-        return self.nb_net.interfaces.filter(**self.custom_arg_id)
+        if self.nb_nics is None:
+            self._prefetch_netbox_network_cards()
+        return list(self.nb_nics.values())
 
     def get_netbox_type_for_nic(self, nic):
         if self.get_network_type() == "virtual":
@@ -213,15 +448,11 @@ class Network(object):
     def get_or_create_vlan(self, vlan_id):
         # FIXME: we may need to specify the datacenter
         # since users may have same vlan id in multiple dc
-        vlan = nb.ipam.vlans.get(
+        return cache.get_or_create(
+            nb.ipam.vlans,
+            lambda: plan.create(nb.ipam.vlans, name="VLAN {}".format(vlan_id), vid=vlan_id),
             vid=vlan_id,
         )
-        if vlan is None:
-            vlan = nb.ipam.vlans.create(
-                name="VLAN {}".format(vlan_id),
-                vid=vlan_id,
-            )
-        return vlan
 
     def reset_vlan_on_interface(self, nic, interface):
         update = False
@@ -232,8 +463,11 @@ class Network(object):
             else None
         )
         # For strange reason, we need to get the object from scratch
-        # The object returned by pynetbox's save isn't always working (since pynetbox 6)
-        interface = self.nb_net.interfaces.get(id=interface.id)
+        # The object returned by pynetbox's create isn't always working (since pynetbox 6)
+        # Prefetched interfaces are already complete
+        if interface.id in self.created_nics:
+            interface = self.nb_net.interfaces.get(id=interface.id)
+            self._index_netbox_network_card(interface)
 
         # Handle the case were the local interface isn't an interface vlan as reported by Netbox
         # and that LLDP doesn't report a vlan-id
@@ -287,7 +521,7 @@ class Network(object):
                 update = True
                 nb_vlan = self.get_or_create_vlan(pvid_vlan[0])
                 interface.mode = self.dcim_choices["interface:mode"]["Access"]
-                interface.untagged_vlan = nb_vlan.id
+                interface.untagged_vlan = nb_vlan.id if nb_vlan else None
         return update, interface
 
     def update_interface_macs(self, nic, macs):
@@ -296,17 +530,16 @@ class Network(object):
         for nb_mac in nb_macs:
             if nb_mac.mac_address not in macs:
                 logging.debug("Deleting extra MAC {mac} from {nic}".format(mac=nb_mac, nic=nic))
-                nb_mac.delete()
+                plan.delete(nb_mac)
         # Add missing
         for mac in macs:
             if mac not in {nb_mac.mac_address for nb_mac in nb_macs}:
                 logging.debug("Adding MAC {mac} to {nic}".format(mac=mac, nic=nic))
-                self.nb_net.mac_addresses.create(
-                    {
-                        "mac_address": mac,
-                        "assigned_object_type": "dcim.interface",
-                        "assigned_object_id": nic.id,
-                    }
+                plan.create(
+                    self.nb_net.mac_addresses,
+                    mac_address=mac,
+                    assigned_object_type="dcim.interface",
+                    assigned_object_id=nic.id,
                 )
 
     def create_netbox_nic(self, nic, mgmt=False):
@@ -337,13 +570,18 @@ class Network(object):
         if nic.get("ethtool") and nic["ethtool"].get("link") == "no":
             params["enabled"] = False
 
-        interface = self.nb_net.interfaces.create(**params)
+        interface = plan.create(self.nb_net.interfaces, **params)
+        if interface is None:
+            return None
+        self.created_nics.add(interface.id)
+        if self.nb_nics is not None:
+            self._index_netbox_network_card(interface)
 
         if nic["vlan"]:
             nb_vlan = self.get_or_create_vlan(nic["vlan"])
             interface.mode = self.dcim_choices["interface:mode"]["Tagged"]
             interface.tagged_vlans = [nb_vlan.id]
-            interface.save()
+            plan.save(interface)
         elif config.network.lldp and self.lldp.get_switch_vlan(nic["name"]) is not None:
             # if lldp reports a vlan on an interface, tag the interface in access and set the vlan
             # report only the interface which has `pvid=yes` (ie: lldp.eth3.vlan.pvid=yes)
@@ -354,7 +592,7 @@ class Network(object):
                 if vlan_infos.get("vid"):
                     interface.mode = self.dcim_choices["interface:mode"]["Access"]
                     interface.untagged_vlan = nb_vlan.id
-            interface.save()
+            plan.save(interface)
 
         # cable the interface
         if config.network.lldp and isinstance(self, ServerNetwork):
@@ -366,7 +604,7 @@ class Network(object):
                     switch_ip, switch_interface, interface
                 )
                 if nic_update:
-                    interface.save()
+                    plan.save(interface)
         return interface
 
     def create_or_update_netbox_ip_on_interface(self, ip, interface):
@@ -382,9 +620,7 @@ class Network(object):
         * If IP exists and isn't assigned, take it
         * If IP exists and interface is wrong, change interface
         """
-        netbox_ips = nb.ipam.ip_addresses.filter(
-            address=ip,
-        )
+        netbox_ips = self.netbox_ips_by_address.get(ip, [])
         if not netbox_ips:
             logging.info("Create new IP {ip} on {interface}".format(ip=ip, interface=interface))
             query_params = {
@@ -394,7 +630,9 @@ class Network(object):
                 "assigned_object_id": interface.id,
             }
 
-            netbox_ip = nb.ipam.ip_addresses.create(**query_params)
+            netbox_ip = plan.create(nb.ipam.ip_addresses, **query_params)
+            if netbox_ip is not None:
+                self._add_netbox_ip(netbox_ip)
             return netbox_ip
 
         netbox_ip = list(netbox_ips)[0]
@@ -410,7 +648,7 @@ class Network(object):
                 logging.info("Assigning existing Anycast IP {} to interface".format(ip))
                 netbox_ip = unassigned_anycast_ip[0]
                 netbox_ip.interface = interface
-                netbox_ip.save()
+                plan.save(netbox_ip)
             # or if everything is assigned to other servers
             elif not len(assigned_anycast_ip):
                 logging.info("Creating Anycast IP {} and assigning it to interface".format(ip))
@@ -422,7 +660,9 @@ class Network(object):
                     "assigned_object_type": self.assigned_object_type,
                     "assigned_object_id": interface.id,
                 }
-                netbox_ip = nb.ipam.ip_addresses.create(**query_params)
+                netbox_ip = plan.create(nb.ipam.ip_addresses, **query_params)
+                if netbox_ip is not None:
+                    self._add_netbox_ip(netbox_ip)
             return netbox_ip
         else:
             assigned_object = getattr(netbox_ip, "assigned_object", None)
@@ -448,7 +688,79 @@ class Network(object):
 
             netbox_ip.assigned_object_type = self.assigned_object_type
             netbox_ip.assigned_object_id = interface.id
-            netbox_ip.save()
+            plan.save(netbox_ip)
+
+    def _add_netbox_ip(self, netbox_ip):
+        if netbox_ip.id in self.netbox_ips:
+            return
+        self.netbox_ips[netbox_ip.id] = netbox_ip
+        self.netbox_ips_by_address.setdefault(netbox_ip.address, []).append(netbox_ip)
+
+    def _prefetch_netbox_ips(self, addresses):
+        """
+        Take a single snapshot of the IP addresses assigned to the device
+        interfaces and of the ones matching the local `addresses`, using
+        multi-value queries
+        """
+        self.netbox_ips = {}
+        self.netbox_ips_by_address = {}
+        queries = [
+            {self.intf_type: ids}
+            for ids in batched((x.id for x in self.get_netbox_network_cards()), 25)
+        ]
+        queries += [{"address": list(addrs)} for addrs in batched(sorted(addresses), 25)]
+        for query in queries:
+            for netbox_ip in nb.ipam.ip_addresses.filter(**query):
+                self._add_netbox_ip(netbox_ip)
+
+    def get_netbox_ips(self):
+        """
+        Return the IP addresses of the snapshot currently assigned to the
+        device interfaces
+        """
+        nb_nics = self.nb_nics or {}
+        return [
+            x
+            for x in (self.netbox_ips or {}).values()
+            if x.assigned_object_type == self.assigned_object_type
+            and x.assigned_object_id in nb_nics
+        ]
+
+    def get_netbox_ipmi_ip(self):
+        for netbox_ip in self.get_netbox_ips():
+            if self.nb_nics[netbox_ip.assigned_object_id].name == "IPMI":
+                return netbox_ip
+        return None
+
+    def reconcile_netbox_ips(self, wanted_ips):
+        """
+        Reconcile the IP addresses assignments in Netbox with the local ones
+
+        `wanted_ips` is a list of (address, Netbox interface) tuples. Only the
+        differences between the wanted and the actual assignments lead to a
+        write: IPs not known locally are unassigned, missing ones are created
+        or reassigned following `create_or_update_netbox_ip_on_interface` rules.
+        """
+        local_ips = {ip for nic in self.nics for ip in nic["ip"] or []}
+        self._prefetch_netbox_ips(local_ips)
+
+        # unassign IP on netbox that are not known on this server
+        for netbox_ip in self.get_netbox_ips():
+            if netbox_ip.address not in local_ips:
+                logging.info(
+                    "Unassigning IP {ip} from {interface}".format(
+                        ip=netbox_ip.address, interface=netbox_ip.assigned_object
+                    )
+                )
+                netbox_ip.assigned_object_type = None
+                netbox_ip.assigned_object_id = None
+                plan.save(netbox_ip)
+
+        assigned = {(x.address, x.assigned_object_id) for x in self.get_netbox_ips()}
+        for ip, interface in wanted_ips:
+            if (ip, interface.id) in assigned:
+                continue
+            self.create_or_update_netbox_ip_on_interface(ip, interface)
 
     def _nic_identifier(self, nic):
         if isinstance(nic, dict):
@@ -486,34 +798,11 @@ class Network(object):
                     )
                 )
                 nb_nics.remove(nic)
-                nic.delete()
-
-        # delete IP on netbox that are not known on this server
-        if len(nb_nics):
-
-            def batched(it, n):
-                while batch := tuple(islice(it, n)):
-                    yield batch
-
-            netbox_ips = []
-            for ids in batched((x.id for x in nb_nics), 25):
-                netbox_ips += list(nb.ipam.ip_addresses.filter(**{self.intf_type: ids}))
-
-            all_local_ips = list(
-                chain.from_iterable([x["ip"] for x in self.nics if x["ip"] is not None])
-            )
-            for netbox_ip in netbox_ips:
-                if netbox_ip.address not in all_local_ips:
-                    logging.info(
-                        "Unassigning IP {ip} from {interface}".format(
-                            ip=netbox_ip.address, interface=netbox_ip.assigned_object
-                        )
-                    )
-                    netbox_ip.assigned_object_type = None
-                    netbox_ip.assigned_object_id = None
-                    netbox_ip.save()
+                self._forget_netbox_network_card(nic)
+                plan.delete(nic)
 
         # update each nic
+        wanted_ips = []
         for nic in self.nics:
             interface = self.get_netbox_network_card(nic)
 
@@ -522,6 +811,9 @@ class Network(object):
                     "Interface {nic} not found, creating..".format(nic=self._nic_identifier(nic))
                 )
                 interface = self.create_netbox_nic(nic)
+                if interface is None:
+                    # only planned, the interface settings will be synced on the next run
+                    continue
 
             nic_update = 0
 
@@ -534,10 +826,10 @@ class Network(object):
                         interface=interface, name=nic["name"]
                     )
                 )
-                interface.name = nic["name"]
+                self._rename_netbox_network_card(interface, nic["name"])
                 nic_update += 1
 
-            if version.parse(nb.version) >= version.parse("4.2"):
+            if get_capabilities().has_mac_address_objects:
                 # Create MAC objects
                 if nic["mac"]:
                     self.update_interface_macs(interface, [nic["mac"]])
@@ -548,7 +840,7 @@ class Network(object):
                         interface=interface, mac=nic["mac"]
                     )
                 )
-                if version.parse(nb.version) < version.parse("4.2"):
+                if not get_capabilities().has_mac_address_objects:
                     interface.mac_address = nic["mac"]
                 else:
                     interface.primary_mac_address = {"mac_address": nic["mac"]}
@@ -605,12 +897,12 @@ class Network(object):
                     nic_update += ret
 
             if nic["ip"]:
-                # sync local IPs
-                for ip in nic["ip"]:
-                    self.create_or_update_netbox_ip_on_interface(ip, interface)
+                wanted_ips.extend((ip, interface) for ip in nic["ip"])
             if nic_update > 0:
-                interface.save()
+                plan.save(interface)
 
+        # sync local IPs
+        self.reconcile_netbox_ips(wanted_ips)
         self._set_bonding_interfaces()
         logging.debug("Finished updating NIC!")
 
@@ -636,7 +928,7 @@ class ServerNetwork(Network):
         return "server"
 
     def get_ipmi(self):
-        ipmi = IPMI().parse()
+        ipmi = collectors.get("ipmi").parse()
         return ipmi
 
     def connect_interface_to_switch(self, switch_ip, switch_interface, nb_server_interface):
@@ -682,7 +974,8 @@ class ServerNetwork(Network):
                 switch_ip,
             )
         )
-        cable = nb.dcim.cables.create(
+        cable = plan.create(
+            nb.dcim.cables,
             a_terminations=[
                 {"object_type": "dcim.interface", "object_id": nb_server_interface.id},
             ],
@@ -734,7 +1027,7 @@ class ServerNetwork(Network):
                     )
                 )
                 cable = nb.dcim.cables.get(nb_server_interface.cable.id)
-                cable.delete()
+                plan.delete(cable)
                 update = True
                 nb_server_interface = self.connect_interface_to_switch(
                     switch_ip, switch_interface, nb_server_interface
@@ -753,7 +1046,7 @@ class VirtualNetwork(Network):
         self.intf_type = "vminterface_id"
         self.assigned_object_type = "virtualization.vminterface"
 
-        dcim_c = nb.virtualization.interfaces.choices()
+        dcim_c = get_choices(nb.virtualization.interfaces)
         for _choice_type in dcim_c:
             key = "interface:{}".format(_choice_type)
             self.dcim_choices[key] = {}
@@ -762,3 +1055,6 @@ class VirtualNetwork(Network):
 
     def get_network_type(self):
         return "virtual"
+
+
+collectors.register("nics", Network.scan)
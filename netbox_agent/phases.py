@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_local = threading.local()
+
+
+def current_phase():
+    return getattr(_local, "phase", None)
+
+
+def set_phase(name):
+    """
+    Tag the current thread with the phase `name`, ie: in the initializer of
+    the thread pools started by a phase so that their logs go with it
+    """
+    _local.phase = name
+
+
+def _record_phase(record):
+    if not hasattr(record, "phase"):
+        record.phase = current_phase()
+    return record.phase
+
+
+class PhaseLogFilter(logging.Filter):
+    """
+    Filter of the root handlers holding back the records of the phases
+    """
+
+    def filter(self, record):
+        return _record_phase(record) is None
+
+
+class PhaseLogHandler(logging.Handler):
+    """
+    Log handler keeping the records of each phase apart, to emit them
+    through `handlers` in the order of `names` once the phase and the ones
+    before it are done
+    """
+
+    def __init__(self, handlers, names):
+        super().__init__()
+        self.handlers = handlers
+        self.records = {}
+        self.pending = list(names)
+        self.done = set()
+        self.addFilter(lambda record: _record_phase(record) is not None)
+
+    def emit(self, record):
+        self.records.setdefault(record.phase, []).append(record)
+
+    def _flush(self, name):
+        for record in self.records.pop(name, []):
+            record.phase = None
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+    def phase_done(self, name):
+        with self.lock:
+            self.done.add(name)
+            while self.pending and self.pending[0] in self.done:
+                self._flush(self.pending.pop(0))
+
+    def flush_all(self):
+        with self.lock:
+            for name in list(self.records):
+                self._flush(name)
+
+
+class Phases:
+    """
+    Independent sync phases of a device
+
+    Once the device exists, the network, inventory, PSU and hypervisor phases
+    write disjoint Netbox objects. With more than one worker they run in a
+    thread pool, sharing the Netbox HTTP session (whose connection pool is
+    sized by `netbox.pool_size`) and the lookup cache.
+
+    Logs of concurrent phases are buffered and emitted phase after phase,
+    in the order the phases were added, so that they aren't interleaved and
+    don't depend on which phase ends first.
+    The threads started by a phase are tagged with it (see `set_phase`),
+    the other logs are emitted right away.
+    """
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self.phases = []
+        self.timings = {}
+        self.buffer = None
+
+    def add(self, name, func):
+        self.phases.append((name, func))
+
+    def _run_phase(self, name, func):
+        set_phase(name)
+        start = time.monotonic()
+        try:
+            func()
+        finally:
+            self.timings[name] = time.monotonic() - start
+            set_phase(None)
+            if self.buffer is not None:
+                self.buffer.phase_done(name)
+
+    def _run_concurrently(self):
+        root = logging.getLogger()
+        if not root.handlers:
+            logging.basicConfig()
+        handlers, log_filter = list(root.handlers), PhaseLogFilter()
+        self.buffer = PhaseLogHandler(handlers, [name for name, _ in self.phases])
+        for handler in handlers:
+            handler.addFilter(log_filter)
+        root.addHandler(self.buffer)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [
+                    executor.submit(self._run_phase, name, func) for name, func in self.phases
+                ]
+        finally:
+            root.removeHandler(self.buffer)
+            for handler in handlers:
+                handler.removeFilter(log_filter)
+            self.buffer.flush_all()
+            self.buffer = None
+
+        # raise the error of the first failed phase
+        for future in futures:
+            future.result()
+
+    def run(self):
+        start = time.monotonic()
+        if self.workers > 1 and len(self.phases) > 1:
+            self._run_concurrently()
+        else:
+            for name, func in self.phases:
+                self._run_phase(name, func)
+
+        if self.phases:
+            logging.info(
+                "Phases wall time: {} (total {:.2f}s)".format(
+                    ", ".join(
+                        "{} {:.2f}s".format(name, self.timings[name]) for name, _ in self.phases
+                    ),
+                    time.monotonic() - start,
+                )
+            )
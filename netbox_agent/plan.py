@@ -0,0 +1,200 @@
+import json
+import logging
+import threading
+
+from netbox_agent.config import config
+from netbox_agent.config import netbox_instance as nb
+
+ACTIONS = ("create", "update", "delete")
+
+
+def endpoint_name(endpoint):
+    """
+    Return the `app.endpoint` name of a pynetbox endpoint, ie: `dcim.inventory_items`
+    """
+    app, name = endpoint.url.rstrip("/").split("/")[-2:]
+    return "{}.{}".format(app, name.replace("-", "_"))
+
+
+def get_endpoint(name):
+    app, name = name.split(".")
+    return getattr(getattr(nb, app), name)
+
+
+class Change:
+    """
+    A single write on a Netbox object
+    """
+
+    def __init__(self, action, endpoint, id=None, data=None, description=None):
+        if action not in ACTIONS:
+            raise ValueError("Unknown plan action {}".format(action))
+        self.action = action
+        self.endpoint = endpoint
+        self.id = id
+        self.data = data or {}
+        self.description = description
+
+    def __repr__(self):
+        return "<Change {} {} {}>".format(self.action, self.endpoint, self.id or "")
+
+    def to_dict(self):
+        return {
+            "action": self.action,
+            "endpoint": self.endpoint,
+            "id": self.id,
+            "data": self.data,
+            "description": self.description,
+        }
+
+    @classmethod
+    def from_dict(cls, change):
+        return cls(
+            change["action"],
+            change["endpoint"],
+            id=change.get("id"),
+            data=change.get("data"),
+            description=change.get("description"),
+        )
+
+
+class Plan:
+    """
+    Change plan of the writes to Netbox objects
+
+    The sync methods don't write to Netbox directly but go through the plan.
+    When it is enabled (`--plan`), the creations, updates and deletions are
+    recorded instead of being sent, so that they can be reviewed as JSON and
+    applied later (`--apply`) as a minimal set of bulk requests. Otherwise
+    every change is sent right away.
+
+    While planning, `create()` returns `None` as the object doesn't exist yet:
+    the changes depending on it are left to the next run, so a plan with
+    creations is partial.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.changes = []
+        self._creates = set()
+        self._updates = {}
+        # changes are recorded by the concurrent sync phases
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.changes)
+
+    def _record(self, change):
+        with self.lock:
+            self.changes.append(change)
+        if change.description:
+            logging.debug("Planning {}: {}".format(change.action, change.description))
+
+    def create(self, endpoint, description=None, **data):
+        if not self.enabled:
+            return endpoint.create(**data)
+        # a missing object is looked up again until it exists, only plan it once
+        key = (endpoint_name(endpoint), json.dumps(data, sort_keys=True))
+        with self.lock:
+            if key not in self._creates:
+                self._creates.add(key)
+                self._record(Change("create", key[0], data=data, description=description))
+        return None
+
+    def bulk_create(self, endpoint, items):
+        if not self.enabled:
+            size = config.netbox.bulk_size
+            for i in range(0, len(items), size):
+                endpoint.create(items[i : i + size])
+            return
+        for item in items:
+            self._record(Change("create", endpoint_name(endpoint), data=item))
+
+    def save(self, record, description=None):
+        if not self.enabled:
+            return record.save()
+        updates = record.updates()
+        if not updates:
+            return False
+        key = (endpoint_name(record.endpoint), record.id)
+        with self.lock:
+            if key in self._updates:
+                self._updates[key].data.update(updates)
+            else:
+                self._updates[key] = Change(
+                    "update", key[0], id=record.id, data=updates, description=description
+                )
+                self._record(self._updates[key])
+        return True
+
+    def delete(self, record, description=None):
+        if not self.enabled:
+            return record.delete()
+        self._record(
+            Change("delete", endpoint_name(record.endpoint), id=record.id, description=description)
+        )
+        return True
+
+    def bulk_delete(self, endpoint, records):
+        if not self.enabled:
+            size = config.netbox.bulk_size
+            for i in range(0, len(records), size):
+                endpoint.delete(records[i : i + size])
+            return
+        for record in records:
+            self.delete(record)
+
+    def summary(self):
+        counts = {action: 0 for action in ACTIONS}
+        for change in self.changes:
+            counts[change.action] += 1
+        return counts
+
+    def to_json(self):
+        return json.dumps(
+            {"changes": [change.to_dict() for change in self.changes]},
+            indent=4,
+            sort_keys=True,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            data = json.load(f)
+        plan = cls()
+        for change in data["changes"]:
+            plan._record(Change.from_dict(change))
+        return plan
+
+    def apply(self):
+        """
+        Send the recorded changes to Netbox
+
+        Changes are grouped by endpoint and action, each group being sent at
+        the position of its first change in bulk requests of at most
+        `netbox.bulk_size` objects. Object creations therefore happen before
+        the creation of the objects referencing them (ie: manufacturers
+        before inventory items).
+        """
+        groups = {}
+        for change in self.changes:
+            groups.setdefault((change.endpoint, change.action), []).append(change)
+
+        size = config.netbox.bulk_size
+        requests = 0
+        for (name, action), changes in groups.items():
+            endpoint = get_endpoint(name)
+            for i in range(0, len(changes), size):
+                chunk = changes[i : i + size]
+                if action == "create":
+                    endpoint.create([c.data for c in chunk])
+                elif action == "delete":
+                    endpoint.delete([c.id for c in chunk])
+                else:
+                    endpoint.update([dict(c.data, id=c.id) for c in chunk])
+                requests += 1
+        logging.info("Applied {} changes in {} requests".format(len(self.changes), requests))
+        return requests
+
+
+plan = Plan(enabled=config.plan)
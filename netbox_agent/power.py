@@ -1,7 +1,7 @@
 import logging
 
-import netbox_agent.dmidecode as dmidecode
 from netbox_agent.config import netbox_instance as nb
+from netbox_agent.plan import plan
 
 PSU_DMI_TYPE = 39
 
@@ -17,7 +17,7 @@ class PowerSupply:
 
     def get_power_supply(self):
         power_supply = []
-        for psu in dmidecode.get_by_type(self.server.dmi, PSU_DMI_TYPE):
+        for psu in self.server.dmi.get_by_type(PSU_DMI_TYPE):
             if "Present" not in psu["Status"] or psu["Status"] == "Not Present":
                 continue
 
@@ -55,15 +55,12 @@ class PowerSupply:
         psus = self.get_power_supply()
 
         # Delete unknown PSU
-        delete = False
+        names = [x["name"] for x in psus]
         for nb_psu in nb_psus:
-            if nb_psu.name not in [x["name"] for x in psus]:
+            if nb_psu.name not in names:
                 logging.info("Deleting unknown locally PSU {name}".format(name=nb_psu.name))
-                nb_psu.delete()
-                delete = True
-
-        if delete:
-            nb_psus = self.get_netbox_power_supply()
+                plan.delete(nb_psu)
+        nb_psus = [x for x in nb_psus if x.name in names]
 
         # sync existing Netbox PSU with local infos
         for nb_psu in nb_psus:
@@ -76,12 +73,12 @@ class PowerSupply:
                 update = True
                 nb_psu.maximum_draw = local_psu["maximum_draw"]
             if update:
-                nb_psu.save()
+                plan.save(nb_psu)
 
         for psu in psus:
             if psu["name"] not in [x.name for x in nb_psus]:
                 logging.info("Creating PSU {name} ({description}), {maximum_draw}W".format(**psu))
-                nb_psu = nb.dcim.power_ports.create(**psu)
+                plan.create(nb.dcim.power_ports, **psu)
 
         return True
 
@@ -112,7 +109,7 @@ class PowerSupply:
             if nb_psu.allocated_draw < 1:
                 logging.info("PSU is not connected or in standby mode")
                 continue
-            nb_psu.save()
+            plan.save(nb_psu)
             logging.info(
                 "Updated power consumption for PSU {}: {}W".format(
                     nb_psu.name,
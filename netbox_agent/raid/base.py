@@ -1,3 +1,9 @@
+class RaidError(Exception):
+    """
+    Failure of a RAID controller tool (ie: omreport timing out)
+    """
+
+
 class RaidController:
     def get_product_name(self):
         raise NotImplementedError
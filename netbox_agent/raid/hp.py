@@ -1,24 +1,22 @@
-from netbox_agent.raid.base import Raid, RaidController
+from netbox_agent.raid.base import Raid, RaidController, RaidError
 from netbox_agent.misc import get_vendor
+from netbox_agent.commands import TIMED_OUT, commands
 from netbox_agent.config import config
-import subprocess
 import logging
 import re
 
 REGEXP_CONTROLLER_HP = re.compile(r"Smart Array ([a-zA-Z0-9- ]+) in Slot ([0-9]+)")
 
 
-class HPRaidControllerError(Exception):
+class HPRaidControllerError(RaidError):
     pass
 
 
 def ssacli(sub_command):
     command = ["ssacli"]
     command.extend(sub_command.split())
-    p = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-    stdout, stderr = p.communicate()
-    stdout = stdout.decode("utf-8")
-    if p.returncode != 0:
+    returncode, stdout = commands.run(command, cache=True)
+    if returncode != 0:
         mesg = "Failed to execute command '{}':\n{}".format(" ".join(command), stdout)
         raise HPRaidControllerError(mesg)
 
@@ -213,7 +211,11 @@ class HPRaidController(RaidController):
 
 class HPRaid(Raid):
     def __init__(self):
-        self.output = subprocess.getoutput("ssacli ctrl all show detail")
+        command = ["ssacli", "ctrl", "all", "show", "detail"]
+        returncode, self.output = commands.getstatusoutput(command, cache=True)
+        # no controller would remove the RAID cards from Netbox
+        if returncode == TIMED_OUT:
+            raise HPRaidControllerError("Command '{}' timed out".format(" ".join(command)))
         self.controllers = []
         self.convert_to_dict()
 
@@ -1,22 +1,20 @@
-from netbox_agent.raid.base import Raid, RaidController
+from netbox_agent.raid.base import Raid, RaidController, RaidError
 from netbox_agent.misc import get_vendor, get_mount_points
+from netbox_agent.commands import commands
 from netbox_agent.config import config
-import subprocess
 import logging
 import re
 
 
-class OmreportControllerError(Exception):
+class OmreportControllerError(RaidError):
     pass
 
 
 def omreport(sub_command):
     command = ["omreport"]
     command.extend(sub_command.split())
-    p = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-    p.wait()
-    stdout = p.stdout.read().decode("utf-8")
-    if p.returncode != 0:
+    returncode, stdout = commands.run(command, cache=True)
+    if returncode != 0:
         mesg = "Failed to execute command '{}':\n{}".format(" ".join(command), stdout)
         raise OmreportControllerError(mesg)
 
@@ -1,14 +1,14 @@
-from netbox_agent.raid.base import Raid, RaidController
+from netbox_agent.raid.base import Raid, RaidController, RaidError
 from netbox_agent.misc import get_vendor, get_mount_points
+from netbox_agent.commands import commands
 from netbox_agent.config import config
-import subprocess
 import logging
 import json
 import re
 import os
 
 
-class StorcliControllerError(Exception):
+class StorcliControllerError(RaidError):
     pass
 
 
@@ -16,16 +16,14 @@ def storecli(sub_command):
     command = ["storcli"]
     command.extend(sub_command.split())
     command.append("J")
-    p = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-
-    stdout, stderr = p.communicate()
-    if stderr:
+    returncode, stdout = commands.run(command, cache=True)
+    try:
+        data = json.loads(stdout)
+    # ie: storcli timed out
+    except ValueError:
         mesg = "Failed to execute command '{}':\n{}".format(" ".join(command), stdout)
         raise StorcliControllerError(mesg)
 
-    stdout = stdout.decode("utf-8")
-    data = json.loads(stdout)
-
     controllers = dict(
         [
             (c["Command Status"]["Controller"], c["Response Data"])
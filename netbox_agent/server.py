@@ -1,6 +1,10 @@
 import netbox_agent.dmidecode as dmidecode
+from netbox_agent.cache import cache
+from netbox_agent.collectors import collectors
+from netbox_agent.commands import commands
 from netbox_agent.config import config
 from netbox_agent.config import netbox_instance as nb
+from netbox_agent.fingerprint import Fingerprint
 from netbox_agent.hypervisor import Hypervisor
 from netbox_agent.inventory import Inventory
 from netbox_agent.location import Datacenter, Rack, Tenant
@@ -11,9 +15,10 @@ from netbox_agent.misc import (
     get_device_platform,
 )
 from netbox_agent.network import ServerNetwork
+from netbox_agent.phases import Phases
+from netbox_agent.plan import plan
 from netbox_agent.power import PowerSupply
 from pprint import pprint
-import subprocess
 import logging
 import socket
 import sys
@@ -21,10 +26,12 @@ import sys
 
 class ServerBase:
     def __init__(self, dmi=None):
-        if dmi:
+        if isinstance(dmi, dmidecode.DMI):
             self.dmi = dmi
+        elif dmi:
+            self.dmi = dmidecode.DMI(dmi)
         else:
-            self.dmi = dmidecode.parse()
+            self.dmi = collectors.get("dmidecode")
 
         self.baseboard = dmidecode.get_by_type(self.dmi, "Baseboard")
         self.bios = dmidecode.get_by_type(self.dmi, "BIOS")
@@ -54,7 +61,7 @@ class ServerBase:
         tenant = self.get_tenant()
         if tenant is None:
             return None
-        nb_tenant = nb.tenancy.tenants.get(slug=self.get_tenant())
+        nb_tenant = cache.get(nb.tenancy.tenants, slug=tenant)
         return nb_tenant
 
     def get_datacenter(self):
@@ -67,7 +74,8 @@ class ServerBase:
             logging.error("Specifying a datacenter (Site) is mandatory in Netbox")
             sys.exit(1)
 
-        nb_dc = nb.dcim.sites.get(
+        nb_dc = cache.get(
+            nb.dcim.sites,
             slug=dc,
         )
         if nb_dc is None:
@@ -132,7 +140,8 @@ class ServerBase:
             logging.error("Can't get rack if no datacenter is configured or found")
             sys.exit(1)
 
-        return nb.dcim.racks.get(
+        return cache.get(
+            nb.dcim.racks,
             name=rack,
             site_id=datacenter.id,
         )
@@ -141,25 +150,25 @@ class ServerBase:
         """
         Return the Chassis Name from dmidecode info
         """
-        return self.system[0]["Product Name"].strip()
+        return self.dmi.system["Product Name"]
 
     def get_service_tag(self):
         """
         Return the Service Tag from dmidecode info
         """
-        return self.system[0]["Serial Number"].strip()
+        return self.dmi.system["Serial Number"]
 
     def get_expansion_service_tag(self):
         """
         Return the virtual Service Tag from dmidecode info host
         with 'expansion'
         """
-        return self.system[0]["Serial Number"].strip() + " expansion"
+        return self.dmi.system["Serial Number"] + " expansion"
 
     def get_hostname(self):
         if config.hostname_cmd is None:
             return "{}".format(socket.gethostname())
-        return subprocess.getoutput(config.hostname_cmd)
+        return commands.getoutput(config.hostname_cmd, cache=True)
 
     def is_blade(self):
         raise NotImplementedError
@@ -196,7 +205,8 @@ class ServerBase:
         device_role = get_device_role(config.device.chassis_role)
         serial = self.get_chassis_service_tag()
         logging.info("Creating chassis blade (serial: {serial})".format(serial=serial))
-        new_chassis = nb.dcim.devices.create(
+        new_chassis = plan.create(
+            nb.dcim.devices,
             name=self.get_chassis_name(),
             device_type=device_type.id,
             serial=serial,
@@ -219,7 +229,8 @@ class ServerBase:
                 serial=serial, hostname=hostname, chassis_serial=chassis.serial
             )
         )
-        new_blade = nb.dcim.devices.create(
+        new_blade = plan.create(
+            nb.dcim.devices,
             name=hostname,
             serial=serial,
             role=device_role.id,
@@ -243,7 +254,8 @@ class ServerBase:
                 serial=serial, hostname=hostname, chassis_serial=chassis.serial
             )
         )
-        new_blade = nb.dcim.devices.create(
+        new_blade = plan.create(
+            nb.dcim.devices,
             name=hostname,
             serial=serial,
             role=device_role.id,
@@ -262,10 +274,10 @@ class ServerBase:
         server = nb.dcim.devices.get(name=hostname)
         if server and server.serial != serial:
             if purge:
-                server.delete()
+                plan.delete(server)
             else:
                 server.serial = serial
-                server.save()
+                plan.save(server)
 
     def _netbox_create_server(self, datacenter, tenant, rack):
         device_role = get_device_role(config.device.server_role)
@@ -279,12 +291,13 @@ class ServerBase:
                 serial=serial, hostname=hostname
             )
         )
-        new_server = nb.dcim.devices.create(
+        new_server = plan.create(
+            nb.dcim.devices,
             name=hostname,
             serial=serial,
             role=device_role.id,
             device_type=device_type.id,
-            platform=self.device_platform.id,
+            platform=self.device_platform.id if self.device_platform else None,
             site=datacenter.id if datacenter else None,
             tenant=tenant.id if tenant else None,
             rack=rack.id if rack else None,
@@ -292,6 +305,16 @@ class ServerBase:
         )
         return new_server
 
+    def get_netbox_ipmi_ip(self, server):
+        """
+        Return the Netbox IP address of the IPMI interface of `server`
+        """
+        # reuse the IP addresses snapshot taken while syncing the network
+        if self.network is not None and self.network.netbox_ips is not None:
+            return self.network.get_netbox_ipmi_ip()
+        myips = nb.ipam.ip_addresses.filter(device_id=server.id)
+        return next((ip for ip in myips if ip.assigned_object.display == "IPMI"), None)
+
     def get_netbox_server(self, expansion=False):
         if expansion is False:
             return nb.dcim.devices.get(serial=self.get_service_tag())
@@ -331,11 +354,11 @@ class ServerBase:
                 # that prevents the value change detection
                 actual_device_bay.installed_device
                 actual_device_bay.installed_device = None
-                actual_device_bay.save()
+                plan.save(actual_device_bay)
             # setup new device bay
             real_device_bay = next(real_device_bays)
             real_device_bay.installed_device = server
-            real_device_bay.save()
+            plan.save(real_device_bay)
         else:
             logging.error("Could not find slot {slot} for chassis".format(slot=slot))
 
@@ -371,11 +394,31 @@ class ServerBase:
             # that prevents the value change detection
             actual_device_bay.installed_device
             actual_device_bay.installed_device = None
-            actual_device_bay.save()
+            plan.save(actual_device_bay)
         # setup new device bay
         real_device_bay = next(real_device_bays)
         real_device_bay.installed_device = expansion
-        real_device_bay.save()
+        plan.save(real_device_bay)
+
+    def _netbox_update_network(self):
+        self.network = ServerNetwork(server=self)
+        self.network.create_or_update_netbox_network_cards()
+
+    def _netbox_update_inventory(self, update_inventory):
+        self.inventory = Inventory(server=self)
+        if update_inventory:
+            self.inventory.create_or_update()
+
+    def _netbox_update_power_supply(self):
+        self.power = PowerSupply(server=self)
+        self.power.create_or_update_power_supply()
+        self.power.report_power_consumption()
+
+    def _netbox_update_hypervisor(self):
+        self.hypervisor = Hypervisor(server=self)
+        self.hypervisor.create_or_update_device_cluster()
+        if config.virtual.list_guests_cmd:
+            self.hypervisor.create_or_update_device_virtual_machines()
 
     def netbox_create_or_update(self, config):
         """
@@ -389,7 +432,15 @@ class ServerBase:
         * Inventory management
         * PSU management
         * virtualization cluster device
+
+        Nothing is done if the local facts fingerprint is unchanged since the
+        last sync.
         """
+        fingerprint = Fingerprint(self)
+        if fingerprint.is_up_to_date():
+            logging.info("Local facts are unchanged since the last sync, nothing to update")
+            return
+
         datacenter = self.get_netbox_datacenter()
         rack = self.get_netbox_rack()
         tenant = self.get_netbox_tenant()
@@ -405,6 +456,9 @@ class ServerBase:
             # Chassis does not exist
             if not chassis:
                 chassis = self._netbox_create_chassis(datacenter, tenant, rack)
+                if chassis is None:
+                    logging.info("Chassis creation planned, the blade will be synced next run")
+                    return
 
             server = nb.dcim.devices.get(serial=self.get_service_tag())
             if not server:
@@ -417,31 +471,29 @@ class ServerBase:
             if not server:
                 server = self._netbox_create_server(datacenter, tenant, rack)
 
+        if server is None:
+            logging.info("Device creation planned, it will be synced on the next run")
+            return
+
         logging.debug("Updating Server...")
-        # check network cards
-        if config.register or config.update_all or config.update_network:
-            self.network = ServerNetwork(server=self)
-            self.network.create_or_update_netbox_network_cards()
         update_inventory = config.inventory and (
             config.register or config.update_all or config.update_inventory
         )
+        phases = Phases(workers=config.phase_workers)
+        # check network cards
+        if config.register or config.update_all or config.update_network:
+            phases.add("network", self._netbox_update_network)
         # update inventory if feature is enabled
-        self.inventory = Inventory(server=self)
-        if update_inventory:
-            self.inventory.create_or_update()
+        phases.add("inventory", lambda: self._netbox_update_inventory(update_inventory))
         # update psu
         if config.register or config.update_all or config.update_psu:
-            self.power = PowerSupply(server=self)
-            self.power.create_or_update_power_supply()
-            self.power.report_power_consumption()
+            phases.add("psu", self._netbox_update_power_supply)
         # update virtualization cluster and virtual machines
         if config.virtual.hypervisor and (
             config.register or config.update_all or config.update_hypervisor
         ):
-            self.hypervisor = Hypervisor(server=self)
-            self.hypervisor.create_or_update_device_cluster()
-            if config.virtual.list_guests_cmd:
-                self.hypervisor.create_or_update_device_virtual_machines()
+            phases.add("hypervisor", self._netbox_update_hypervisor)
+        phases.run()
 
         expansion = nb.dcim.devices.get(serial=self.get_expansion_service_tag())
         if self.own_expansion_slot() and config.expansion_as_device:
@@ -450,13 +502,14 @@ class ServerBase:
                 expansion = self._netbox_create_blade_expansion(chassis, datacenter, tenant, rack)
 
             # set slot for blade expansion
-            self._netbox_set_or_update_blade_expansion_slot(expansion, chassis, datacenter)
-            if update_inventory:
+            if expansion is not None:
+                self._netbox_set_or_update_blade_expansion_slot(expansion, chassis, datacenter)
+            if expansion is not None and update_inventory:
                 # Updates expansion inventory
                 inventory = Inventory(server=self, update_expansion=True)
                 inventory.create_or_update()
         elif self.own_expansion_slot() and expansion:
-            expansion.delete()
+            plan.delete(expansion)
             expansion = None
 
         update = 0
@@ -485,12 +538,12 @@ class ServerBase:
             ret, server = self.update_netbox_location(server)
             update += ret
 
-        if server.platform != self.device_platform:
+        if self.device_platform is not None and server.platform != self.device_platform:
             server.platform = self.device_platform
             update += 1
 
         if update:
-            server.save()
+            plan.save(server)
 
         if expansion:
             update = 0
@@ -501,20 +554,18 @@ class ServerBase:
             if self.update_netbox_expansion_location(server, expansion):
                 update += 1
             if update:
-                expansion.save()
+                plan.save(expansion)
 
-        myips = nb.ipam.ip_addresses.filter(device_id=server.id)
         update = 0
-
-        for ip in myips:
-            if ip.assigned_object.display == "IPMI" and ip != server.oob_ip:
-                server.oob_ip = ip.id
-                update += 1
-                break
+        ipmi_ip = self.get_netbox_ipmi_ip(server)
+        if ipmi_ip and ipmi_ip != server.oob_ip:
+            server.oob_ip = ipmi_ip.id
+            update += 1
 
         if update:
-            server.save()
+            plan.save(server)
 
+        fingerprint.save(server)
         logging.debug("Finished updating Server!")
 
     def print_debug(self):
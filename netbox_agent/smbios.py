@@ -0,0 +1,701 @@
+"""
+Native reader of the SMBIOS tables exported by the kernel
+
+The structures the agent relies on are decoded into the very same
+dictionaries `dmidecode.parse()` builds from the `dmidecode` output,
+without forking it.
+"""
+
+import os
+import struct
+
+SMBIOS_TABLES_PATH = "/sys/firmware/dmi/tables"
+
+END_OF_TABLE = 127
+
+_wake_up_types = {
+    0: "Reserved",
+    1: "Other",
+    2: "Unknown",
+    3: "APM Timer",
+    4: "Modem Ring",
+    5: "LAN Remote",
+    6: "Power Switch",
+    7: "PCI PME#",
+    8: "AC Power Restored",
+}
+
+_board_features = (
+    "Board is a hosting board",
+    "Board requires at least one daughter board",
+    "Board is removable",
+    "Board is replaceable",
+    "Board is hot swappable",
+)
+
+_board_types = {
+    1: "Unknown",
+    2: "Other",
+    3: "Server Blade",
+    4: "Connectivity Switch",
+    5: "System Management Module",
+    6: "Processor Module",
+    7: "I/O Module",
+    8: "Memory Module",
+    9: "Daughter Board",
+    10: "Motherboard",
+    11: "Processor+Memory Module",
+    12: "Processor+I/O Module",
+    13: "Interconnect Board",
+}
+
+_chassis_types = {
+    1: "Other",
+    2: "Unknown",
+    3: "Desktop",
+    4: "Low Profile Desktop",
+    5: "Pizza Box",
+    6: "Mini Tower",
+    7: "Tower",
+    8: "Portable",
+    9: "Laptop",
+    10: "Notebook",
+    11: "Hand Held",
+    12: "Docking Station",
+    13: "All In One",
+    14: "Sub Notebook",
+    15: "Space-saving",
+    16: "Lunch Box",
+    17: "Main Server Chassis",
+    18: "Expansion Chassis",
+    19: "Sub Chassis",
+    20: "Bus Expansion Chassis",
+    21: "Peripheral Chassis",
+    22: "RAID Chassis",
+    23: "Rack Mount Chassis",
+    24: "Sealed-case PC",
+    25: "Multi-system",
+    26: "CompactPCI",
+    27: "AdvancedTCA",
+    28: "Blade",
+    29: "Blade Enclosure",
+    30: "Tablet",
+    31: "Convertible",
+    32: "Detachable",
+    33: "IoT Gateway",
+    34: "Embedded PC",
+    35: "Mini PC",
+    36: "Stick PC",
+}
+
+_chassis_states = {
+    1: "Other",
+    2: "Unknown",
+    3: "Safe",
+    4: "Warning",
+    5: "Critical",
+    6: "Non-recoverable",
+}
+
+_chassis_security_status = {
+    1: "Other",
+    2: "Unknown",
+    3: "None",
+    4: "External Interface Locked Out",
+    5: "External Interface Enabled",
+}
+
+_processor_types = {
+    1: "Other",
+    2: "Unknown",
+    3: "Central Processor",
+    4: "Math Processor",
+    5: "DSP Processor",
+    6: "Video Processor",
+}
+
+# only the families found on servers, the others are reported as out of spec
+_processor_families = {
+    0x01: "Other",
+    0x02: "Unknown",
+    0x6B: "Zen",
+    0xA1: "Quad-Core Xeon 3200",
+    0xA2: "Dual-Core Xeon 3000",
+    0xA3: "Quad-Core Xeon 5300",
+    0xA4: "Dual-Core Xeon 5100",
+    0xA5: "Dual-Core Xeon 5000",
+    0xA8: "Multi-Core Xeon 7100",
+    0xAB: "Quad-Core Xeon 5400",
+    0xAC: "Quad-Core Xeon 7300",
+    0xAD: "Quad-Core Xeon 7200",
+    0xB3: "Xeon",
+    0xB5: "Xeon MP",
+    0xC6: "Core i7",
+    0xCD: "Core i5",
+    0xCE: "Core i3",
+    0xE6: "Embedded Opteron Quad-Core",
+    0xEE: "Opteron 6100",
+    0xEF: "Opteron 4100",
+    0xF0: "Opteron 6200",
+    0xF1: "Opteron 4200",
+    0x100: "ARMv7",
+    0x101: "ARMv8",
+    0x118: "ARM",
+}
+
+_processor_status = {
+    0: "Unknown",
+    1: "Enabled",
+    2: "Disabled By User",
+    3: "Disabled By BIOS",
+    4: "Idle",
+    7: "Other",
+}
+
+_memory_form_factors = {
+    1: "Other",
+    2: "Unknown",
+    3: "SIMM",
+    4: "SIP",
+    5: "Chip",
+    6: "DIP",
+    7: "ZIP",
+    8: "Proprietary Card",
+    9: "DIMM",
+    10: "TSOP",
+    11: "Row Of Chips",
+    12: "RIMM",
+    13: "SODIMM",
+    14: "SRIMM",
+    15: "FB-DIMM",
+    16: "Die",
+}
+
+_memory_types = {
+    1: "Other",
+    2: "Unknown",
+    3: "DRAM",
+    4: "EDRAM",
+    5: "VRAM",
+    6: "SRAM",
+    7: "RAM",
+    8: "ROM",
+    9: "Flash",
+    10: "EEPROM",
+    11: "FEPROM",
+    12: "EPROM",
+    13: "CDRAM",
+    14: "3DRAM",
+    15: "SDRAM",
+    16: "SGRAM",
+    17: "RDRAM",
+    18: "DDR",
+    19: "DDR2",
+    20: "DDR2 FB-DIMM",
+    24: "DDR3",
+    25: "FBD2",
+    26: "DDR4",
+    27: "LPDDR",
+    28: "LPDDR2",
+    29: "LPDDR3",
+    30: "LPDDR4",
+    31: "Logical non-volatile device",
+    32: "HBM",
+    33: "HBM2",
+    34: "DDR5",
+    35: "LPDDR5",
+    36: "HBM3",
+}
+
+_memory_type_details = (
+    None,
+    "Other",
+    "Unknown",
+    "Fast-paged",
+    "Static Column",
+    "Pseudo-static",
+    "RAMBus",
+    "Synchronous",
+    "CMOS",
+    "EDO",
+    "Window DRAM",
+    "Cache DRAM",
+    "Non-Volatile",
+    "Registered (Buffered)",
+    "Unbuffered (Unregistered)",
+    "LRDIMM",
+)
+
+_power_supply_status = {
+    1: "Other",
+    2: "Unknown",
+    3: "OK",
+    4: "Non-critical",
+    5: "Critical",
+}
+
+_power_supply_types = {
+    1: "Other",
+    2: "Unknown",
+    3: "Linear",
+    4: "Switching",
+    5: "Battery",
+    6: "UPS",
+    7: "Converter",
+    8: "Regulator",
+}
+
+_power_supply_ranges = {
+    1: "Other",
+    2: "Unknown",
+    3: "Manual",
+    4: "Auto-switch",
+    5: "Wide Range",
+    6: "N/A",
+}
+
+
+class ParseError(Exception):
+    pass
+
+
+class Structure:
+    """
+    A raw SMBIOS structure: its formatted area and its strings
+    """
+
+    def __init__(self, type_id, handle, data, strings):
+        self.type_id = type_id
+        self.handle = handle
+        self.data = data
+        self.strings = strings
+
+    def __len__(self):
+        return len(self.data)
+
+    def byte(self, offset):
+        return self.data[offset]
+
+    def word(self, offset):
+        return struct.unpack_from("<H", self.data, offset)[0]
+
+    def dword(self, offset):
+        return struct.unpack_from("<I", self.data, offset)[0]
+
+    def string(self, offset):
+        index = self.data[offset]
+        if index == 0:
+            return "Not Specified"
+        if index > len(self.strings):
+            return "<BAD INDEX>"
+        return _printable(self.strings[index - 1])
+
+    def handle_ref(self, offset):
+        handle = self.word(offset)
+        return "Not Provided" if handle == 0xFFFF else "0x{:04X}".format(handle)
+
+
+def _printable(value):
+    # dmidecode replaces the non printable characters by dots
+    return "".join(c if 32 <= ord(c) < 127 else "." for c in value.decode("latin-1"))
+
+
+def _enum(table, value):
+    return table.get(value, "<OUT OF SPEC>")
+
+
+def _size(value, unit="MB"):
+    """
+    Format a memory size as dmidecode does, using the largest unit
+    """
+    units = ["bytes", "kB", "MB", "GB", "TB"]
+    i = units.index(unit)
+    while value and value % 1024 == 0 and i < len(units) - 1:
+        value //= 1024
+        i += 1
+    return "{} {}".format(value, units[i])
+
+
+def _speed(value, unit="MHz"):
+    return "Unknown" if value == 0 else "{} {}".format(value, unit)
+
+
+def _decode_bios(s, version):
+    fields = {
+        "Vendor": s.string(0x04),
+        "Version": s.string(0x05),
+        "Release Date": s.string(0x08),
+    }
+    if s.word(0x06):
+        fields["Address"] = "0x{:04X}0".format(s.word(0x06))
+        fields["Runtime Size"] = _size((0x10000 - s.word(0x06)) << 4, "bytes")
+    if s.byte(0x09) == 0xFF and len(s) >= 0x1A:
+        # extended size, in MB or GB
+        size = s.word(0x18)
+        fields["ROM Size"] = _size(size & 0x3FFF, "GB" if size & 0x4000 else "MB")
+    else:
+        fields["ROM Size"] = _size((s.byte(0x09) + 1) << 6, "kB")
+    if len(s) >= 0x18:
+        if s.byte(0x14) != 0xFF and s.byte(0x15) != 0xFF:
+            fields["BIOS Revision"] = "{}.{}".format(s.byte(0x14), s.byte(0x15))
+        if s.byte(0x16) != 0xFF and s.byte(0x17) != 0xFF:
+            fields["Firmware Revision"] = "{}.{}".format(s.byte(0x16), s.byte(0x17))
+    return "BIOS Information", fields
+
+
+def _uuid(s, version):
+    raw = s.data[0x08:0x18]
+    if raw == b"\xff" * 16:
+        return "Not Present"
+    if raw == b"\x00" * 16:
+        return "Not Settable"
+    if version >= (2, 6):
+        # the first three fields are little-endian since SMBIOS 2.6
+        raw = raw[3::-1] + raw[5:3:-1] + raw[7:5:-1] + raw[8:]
+    h = raw.hex().upper()
+    return "{}-{}-{}-{}-{}".format(h[:8], h[8:12], h[12:16], h[16:20], h[20:])
+
+
+def _decode_system(s, version):
+    fields = {
+        "Manufacturer": s.string(0x04),
+        "Product Name": s.string(0x05),
+        "Version": s.string(0x06),
+        "Serial Number": s.string(0x07),
+    }
+    if len(s) >= 0x19:
+        fields["UUID"] = _uuid(s, version)
+        fields["Wake-up Type"] = _enum(_wake_up_types, s.byte(0x18))
+    if len(s) >= 0x1B:
+        fields["SKU Number"] = s.string(0x19)
+        fields["Family"] = s.string(0x1A)
+    return "System Information", fields
+
+
+def _decode_baseboard(s, version):
+    fields = {
+        "Manufacturer": s.string(0x04),
+        "Product Name": s.string(0x05),
+        "Version": s.string(0x06),
+        "Serial Number": s.string(0x07),
+    }
+    if len(s) >= 0x09:
+        fields["Asset Tag"] = s.string(0x08)
+    if len(s) >= 0x0A:
+        features = [f for i, f in enumerate(_board_features) if s.byte(0x09) & (1 << i)]
+        fields["Features"] = features or "None"
+    if len(s) >= 0x0E:
+        fields["Location In Chassis"] = s.string(0x0A)
+        fields["Chassis Handle"] = "0x{:04X}".format(s.word(0x0B))
+        fields["Type"] = _enum(_board_types, s.byte(0x0D))
+    return "Base Board Information", fields
+
+
+def _decode_chassis(s, version):
+    fields = {
+        "Manufacturer": s.string(0x04),
+        "Type": _enum(_chassis_types, s.byte(0x05) & 0x7F),
+        "Lock": "Present" if s.byte(0x05) & 0x80 else "Not Present",
+        "Version": s.string(0x06),
+        "Serial Number": s.string(0x07),
+        "Asset Tag": s.string(0x08),
+    }
+    if len(s) >= 0x0D:
+        fields["Boot-up State"] = _enum(_chassis_states, s.byte(0x09))
+        fields["Power Supply State"] = _enum(_chassis_states, s.byte(0x0A))
+        fields["Thermal State"] = _enum(_chassis_states, s.byte(0x0B))
+        fields["Security Status"] = _enum(_chassis_security_status, s.byte(0x0C))
+    if len(s) >= 0x11:
+        fields["OEM Information"] = "0x{:08X}".format(s.dword(0x0D))
+    if len(s) >= 0x13:
+        height = s.byte(0x11)
+        fields["Height"] = "{} U".format(height) if height else "Unspecified"
+        cords = s.byte(0x12)
+        fields["Number Of Power Cords"] = str(cords) if cords else "Unspecified"
+    return "Chassis Information", fields
+
+
+def _processor_voltage(value):
+    if value & 0x80:
+        return "{:.1f} V".format((value & 0x7F) / 10)
+    voltages = [v for i, v in enumerate(("5.0 V", "3.3 V", "2.9 V")) if value & (1 << i)]
+    return " ".join(voltages) or "Unknown"
+
+
+def _decode_processor(s, version):
+    family = s.byte(0x06)
+    if family == 0xFE and len(s) >= 0x2A:
+        family = s.word(0x28)
+    # only part of the families are known here, dmidecode knows them all
+    if family not in _processor_families:
+        raise ParseError("Unknown processor family 0x{:X}".format(family))
+    status = s.byte(0x18)
+    fields = {
+        "Socket Designation": s.string(0x04),
+        "Type": _enum(_processor_types, s.byte(0x05)),
+        "Family": _enum(_processor_families, family),
+        "Manufacturer": s.string(0x07),
+        "ID": " ".join("{:02X}".format(b) for b in s.data[0x08:0x10]),
+        "Version": s.string(0x10),
+        "Voltage": _processor_voltage(s.byte(0x11)),
+        "External Clock": _speed(s.word(0x12)),
+        "Max Speed": _speed(s.word(0x14)),
+        "Current Speed": _speed(s.word(0x16)),
+        "Status": "Populated, {}".format(_enum(_processor_status, status & 0x07))
+        if status & 0x40
+        else "Unpopulated",
+    }
+    if len(s) >= 0x20:
+        fields["L1 Cache Handle"] = s.handle_ref(0x1A)
+        fields["L2 Cache Handle"] = s.handle_ref(0x1C)
+        fields["L3 Cache Handle"] = s.handle_ref(0x1E)
+    if len(s) >= 0x23:
+        fields["Serial Number"] = s.string(0x20)
+        fields["Asset Tag"] = s.string(0x21)
+        fields["Part Number"] = s.string(0x22)
+    if len(s) >= 0x28:
+        counts = (s.byte(0x23), s.byte(0x24), s.byte(0x25))
+        if len(s) >= 0x30:
+            # counts above 255 are stored in the extended fields
+            counts = tuple(
+                s.word(offset) if count == 0xFF else count
+                for count, offset in zip(counts, (0x2A, 0x2C, 0x2E))
+            )
+        for name, count in zip(("Core Count", "Core Enabled", "Thread Count"), counts):
+            if count:
+                fields[name] = str(count)
+    return "Processor Information", fields
+
+
+def _memory_size(s):
+    size = s.word(0x0C)
+    if size == 0:
+        return "No Module Installed"
+    if size == 0xFFFF:
+        return "Unknown"
+    if size == 0x7FFF and len(s) >= 0x20:
+        return _size(s.dword(0x1C) & 0x7FFFFFFF, "MB")
+    if size & 0x8000:
+        return _size(size & 0x7FFF, "kB")
+    return _size(size, "MB")
+
+
+def _memory_width(value):
+    return "Unknown" if value == 0xFFFF else "{} bits".format(value)
+
+
+def _decode_memory_device(s, version):
+    details = s.word(0x13)
+    fields = {
+        "Array Handle": "0x{:04X}".format(s.word(0x04)),
+        "Error Information Handle": {0xFFFE: "Not Provided", 0xFFFF: "No Error"}.get(
+            s.word(0x06), "0x{:04X}".format(s.word(0x06))
+        ),
+        "Total Width": _memory_width(s.word(0x08)),
+        "Data Width": _memory_width(s.word(0x0A)),
+        "Size": _memory_size(s),
+        "Form Factor": _enum(_memory_form_factors, s.byte(0x0E)),
+        "Set": {0: "None", 0xFF: "Unknown"}.get(s.byte(0x0F), str(s.byte(0x0F))),
+        "Locator": s.string(0x10),
+        "Bank Locator": s.string(0x11),
+        "Type": _enum(_memory_types, s.byte(0x12)),
+        "Type Detail": " ".join(
+            d for i, d in enumerate(_memory_type_details) if d and details & (1 << i)
+        )
+        or "None",
+    }
+    if len(s) >= 0x17:
+        speed = s.word(0x15)
+        if speed == 0xFFFF and len(s) >= 0x5C:
+            speed = s.dword(0x54)
+        fields["Speed"] = _speed(speed, "MT/s")
+    if len(s) >= 0x1B:
+        fields["Manufacturer"] = s.string(0x17)
+        fields["Serial Number"] = s.string(0x18)
+        fields["Asset Tag"] = s.string(0x19)
+        fields["Part Number"] = s.string(0x1A)
+    if len(s) >= 0x1C:
+        rank = s.byte(0x1B) & 0x0F
+        fields["Rank"] = str(rank) if rank else "Unknown"
+    if len(s) >= 0x22:
+        speed = s.word(0x20)
+        if speed == 0xFFFF and len(s) >= 0x5C:
+            speed = s.dword(0x58)
+        fields["Configured Memory Speed"] = _speed(speed, "MT/s")
+    return "Memory Device", fields
+
+
+def _decode_power_supply(s, version):
+    fields = {}
+    if s.byte(0x04):
+        fields["Power Unit Group"] = str(s.byte(0x04))
+    fields.update(
+        {
+            "Location": s.string(0x05),
+            "Name": s.string(0x06),
+            "Manufacturer": s.string(0x07),
+            "Serial Number": s.string(0x08),
+            "Asset Tag": s.string(0x09),
+            "Model Part Number": s.string(0x0A),
+            "Revision": s.string(0x0B),
+        }
+    )
+    capacity = s.word(0x0C)
+    fields["Max Power Capacity"] = "Unknown" if capacity == 0x8000 else "{} W".format(capacity)
+
+    characteristics = s.word(0x0E)
+    if characteristics & 0x0001:
+        fields["Status"] = "Present, {}".format(
+            _enum(_power_supply_status, (characteristics >> 7) & 0x07)
+        )
+    else:
+        fields["Status"] = "Not Present"
+    fields["Type"] = _enum(_power_supply_types, (characteristics >> 10) & 0x0F)
+    fields["Input Voltage Range Switching"] = _enum(
+        _power_supply_ranges, (characteristics >> 3) & 0x0F
+    )
+    fields["Plugged"] = "No" if characteristics & 0x0004 else "Yes"
+    fields["Hot Replaceable"] = "Yes" if characteristics & 0x0002 else "No"
+    if len(s) >= 0x16:
+        for name, offset in (
+            ("Input Voltage Probe Handle", 0x10),
+            ("Cooling Device Handle", 0x12),
+            ("Input Current Probe Handle", 0x14),
+        ):
+            if s.word(offset) != 0xFFFF:
+                fields[name] = "0x{:04X}".format(s.word(offset))
+    return "System Power Supply", fields
+
+
+def _decode_oem(s, version):
+    """
+    OEM structure of another vendor, dumped as dmidecode does
+    """
+    fields = {
+        "Header and Data": [
+            " ".join("{:02X}".format(b) for b in s.data[i : i + 16])
+            for i in range(0, len(s.data), 16)
+        ],
+    }
+    if s.strings:
+        fields["Strings"] = [_printable(x) for x in s.strings]
+    return "OEM-specific Type", fields
+
+
+def _decode_hp_rack_locator(s, version):
+    """
+    HP(E) OEM type 204, decoded as dmidecode does for HP servers. The raw
+    data and strings are kept as well, like the output of the dmidecode
+    versions not recognizing the vendor
+    """
+    _, fields = _decode_oem(s, version)
+    if len(s) >= 0x0B:
+        fields.update(
+            {
+                "Rack Name": s.string(0x04),
+                "Enclosure Name": s.string(0x05),
+                "Enclosure Model": s.string(0x06),
+                "Enclosure Serial": s.string(0x0A),
+                "Enclosure Bays": str(s.byte(0x08)),
+                "Server Bay": s.string(0x07),
+                "Bays Filled": str(s.byte(0x09)),
+            }
+        )
+    return "HP ProLiant System/Rack Locator", fields
+
+
+DECODERS = {
+    0: _decode_bios,
+    1: _decode_system,
+    2: _decode_baseboard,
+    3: _decode_chassis,
+    4: _decode_processor,
+    17: _decode_memory_device,
+    39: _decode_power_supply,
+}
+
+# OEM structures, decoded for the manufacturers defining them only
+OEM_DECODERS = {
+    204: (("HP", "HPE", "Hewlett-Packard", "Hewlett Packard Enterprise"), _decode_hp_rack_locator),
+}
+
+
+def get_version(entry_point):
+    """
+    Return the SMBIOS (major, minor) version announced by the entry point
+    """
+    if entry_point[:5] == b"_SM3_" and len(entry_point) >= 0x18:
+        return entry_point[0x07], entry_point[0x08]
+    if entry_point[:4] == b"_SM_" and len(entry_point) >= 0x1F:
+        return entry_point[0x06], entry_point[0x07]
+    raise ParseError("Unknown SMBIOS entry point")
+
+
+def iter_structures(table):
+    offset = 0
+    while offset + 4 <= len(table):
+        type_id, length, handle = struct.unpack_from("<BBH", table, offset)
+        if length < 4:
+            raise ParseError("Invalid length of the SMBIOS structure at {}".format(offset))
+        # the strings set ends with a double NUL, even when empty
+        end = table.find(b"\0\0", offset + length)
+        if end < 0:
+            raise ParseError("Truncated SMBIOS structure at {}".format(offset))
+        strings = table[offset + length : end].split(b"\0") if end > offset + length else []
+        yield Structure(type_id, handle, table[offset : offset + length], strings)
+        if type_id == END_OF_TABLE:
+            return
+        offset = end + 2
+
+
+def get_manufacturer(structures):
+    """
+    Return the system manufacturer, or the BIOS vendor when it is missing
+    """
+    for type_id in (1, 0):
+        for s in structures:
+            if s.type_id == type_id and len(s) > 0x04 and s.byte(0x04):
+                return s.string(0x04)
+    return None
+
+
+def parse(entry_point, table):
+    """
+    Decode the raw SMBIOS tables into the `dmidecode.parse()` dictionary,
+    restricted to the `DECODERS` and `OEM_DECODERS` structure types
+    """
+    version = get_version(entry_point)
+    data = {}
+    try:
+        structures = list(iter_structures(table))
+        manufacturer = get_manufacturer(structures)
+        for structure in structures:
+            decoder = DECODERS.get(structure.type_id)
+            if structure.type_id in OEM_DECODERS:
+                vendors, decoder = OEM_DECODERS[structure.type_id]
+                if manufacturer not in vendors:
+                    decoder = _decode_oem
+            if decoder is None:
+                continue
+            name, fields = decoder(structure, version)
+            entry = {
+                "DMIType": structure.type_id,
+                "DMISize": len(structure),
+                "DMIName": name,
+            }
+            entry.update(fields)
+            data["0x{:04X}".format(structure.handle)] = entry
+    except (struct.error, IndexError) as e:
+        raise ParseError("Truncated SMBIOS structure: {}".format(e))
+
+    if not data:
+        raise ParseError("No SMBIOS structure found")
+    return data
+
+
+def read_tables(path=SMBIOS_TABLES_PATH):
+    with open(os.path.join(path, "smbios_entry_point"), "rb") as f:
+        entry_point = f.read()
+    with open(os.path.join(path, "DMI"), "rb") as f:
+        table = f.read()
+    return entry_point, table
@@ -0,0 +1,38 @@
+import json
+import logging
+import os
+import time
+
+from netbox_agent.config import config
+
+
+def _state_path(name):
+    return os.path.join(config.cache.directory, "{}.json".format(name))
+
+
+def load_state(name, key, ttl):
+    """
+    Return the value stored in the `name` state file if it has been
+    stored with the same `key` less than `ttl` seconds ago, None otherwise
+    """
+    if not ttl or ttl <= 0:
+        return None
+    try:
+        with open(_state_path(name), "r") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get("key") != key or time.time() - state.get("timestamp", 0) > ttl:
+        return None
+    return state.get("value")
+
+
+def save_state(name, key, value):
+    path = _state_path(name)
+    try:
+        os.makedirs(config.cache.directory, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"key": key, "timestamp": time.time(), "value": value}, f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        logging.debug("Unable to write state file {}: {}".format(path, e))
@@ -0,0 +1,294 @@
+import logging
+import os
+import re
+
+PCI_IDS_PATHS = (
+    "/usr/share/hwdata/pci.ids",
+    "/usr/share/misc/pci.ids",
+    "/usr/share/pci.ids",
+)
+
+CPU_VENDORS = {
+    "GenuineIntel": "Intel Corp.",
+    "AuthenticAMD": "Advanced Micro Devices [AMD]",
+}
+
+# lshw descriptions of the PCI network and display subclasses
+NETWORK_DESCRIPTIONS = {
+    0x00: "Ethernet interface",
+}
+DISPLAY_DESCRIPTIONS = {
+    0x00: "VGA compatible controller",
+    0x02: "3D controller",
+}
+
+DISK_DESCRIPTIONS = {
+    "ata": "ATA Disk",
+    "scsi": "SCSI Disk",
+    "nvme": "NVME",
+    "usb": "SCSI Disk",
+}
+
+
+def _read(path, default=None):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return default
+
+
+def _udev_decode(value):
+    return re.sub(r"\\x([0-9a-fA-F]{2})", lambda m: chr(int(m.group(1), 16)), value).strip()
+
+
+class Sysfs:
+    """
+    Hardware inventory read from sysfs, procfs and the udev database,
+    without running `lshw`
+
+    It exposes the records of `LSHW` for the classes `Inventory` uses:
+    NICs and GPUs come from the PCI devices, disks from the block devices
+    and their udev properties, CPUs from `/proc/cpuinfo` and DIMMs and the
+    motherboard from the already parsed DMI.
+
+    `root` allows reading a copy of these filesystems.
+    """
+
+    def __init__(self, dmi, root="/"):
+        self.dmi = dmi
+        self.root = root
+        self._pci_names = None
+
+        self.vendor = dmi.system.get("Manufacturer")
+        self.product = dmi.system.get("Product Name")
+        self.chassis_serial = dmi.system.get("Serial Number")
+        self.motherboard = dmi.baseboard.get("Product Name", "Motherboard")
+        self.motherboard_serial = dmi.baseboard.get("Serial Number", "No S/N")
+
+        self.cpus = self.find_cpus()
+        self.memories = self.find_memories()
+        self.disks = self.find_disks()
+        self.interfaces = []
+        self.unknown_interfaces = 0
+        self.gpus = []
+        self.walk_pci()
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def get_hw_linux(self, hwclass):
+        if hwclass == "cpu":
+            return self.cpus
+        if hwclass == "gpu":
+            return self.gpus
+        if hwclass == "network":
+            return self.interfaces
+        if hwclass == "storage":
+            return self.disks
+        if hwclass == "memory":
+            return self.memories
+
+    def find_cpus(self):
+        sockets = {}
+        processor = {}
+        cpuinfo = _read(self.path("proc/cpuinfo"), "")
+        for line in cpuinfo.splitlines() + [""]:
+            if not line.strip():
+                if processor:
+                    sockets.setdefault(processor.get("physical id", "0"), processor)
+                processor = {}
+                continue
+            key, _, value = line.partition(":")
+            processor[key.strip()] = value.strip()
+
+        locations = [
+            p.get("Socket Designation", "")
+            for p in self.dmi.get_by_type(4)
+            if p.get("Status", "").startswith("Populated")
+        ]
+        cpus = []
+        for i, physical_id in enumerate(sorted(sockets, key=int)):
+            cpu = sockets[physical_id]
+            vendor_id = cpu.get("vendor_id", "")
+            cpus.append(
+                {
+                    "product": cpu.get("model name", "Unknown CPU"),
+                    "vendor": CPU_VENDORS.get(vendor_id, vendor_id or "Unknown vendor"),
+                    "description": "CPU",
+                    "location": locations[i].strip() if i < len(locations) else "",
+                }
+            )
+        return cpus
+
+    def find_memories(self):
+        memories = []
+        for bank, dimm in enumerate(self.dmi.get_by_type(17)):
+            size = dimm.get("Size", "")
+            match = re.match(r"(\d+)\s*([KMGT]B)", size)
+            if match is None:
+                continue
+            size = (
+                int(match.group(1))
+                * {"KB": 2**-20, "MB": 2**-10, "GB": 1, "TB": 2**10}[match.group(2)]
+            )
+
+            description = [dimm.get("Form Factor"), dimm.get("Type"), dimm.get("Type Detail")]
+            speed = re.match(r"(\d+)", dimm.get("Speed", ""))
+            if speed and int(speed.group(1)):
+                speed = int(speed.group(1))
+                description.append("{} MHz ({:.1f} ns)".format(speed, 1000 / speed))
+            memories.append(
+                {
+                    "slot": dimm.get("Locator", "").strip(),
+                    "description": " ".join(d.strip() for d in description if d),
+                    "id": "bank:{}".format(bank),
+                    "serial": dimm.get("Serial Number", "N/A").strip(),
+                    "vendor": dimm.get("Manufacturer", "N/A").strip(),
+                    "product": dimm.get("Part Number", "N/A").strip(),
+                    "size": float(size),
+                }
+            )
+        return memories
+
+    def get_udev_properties(self, device_id):
+        properties = {}
+        data = _read(self.path("run/udev/data", device_id), "")
+        for line in data.splitlines():
+            if line.startswith("E:"):
+                key, _, value = line[2:].partition("=")
+                properties[key] = value
+        return properties
+
+    def find_disks(self):
+        disks = []
+        block = self.path("sys/block")
+        if not os.path.isdir(block):
+            return disks
+        for name in sorted(os.listdir(block)):
+            # virtual block devices (loop, dm, md...) have no backing device
+            if not os.path.exists(os.path.join(block, name, "device")):
+                continue
+            properties = self.get_udev_properties(
+                "b{}".format(_read(os.path.join(block, name, "dev")))
+            )
+            if properties.get("ID_CDROM") or properties.get("ID_TYPE") == "cd":
+                continue
+
+            model = properties.get("ID_MODEL_ENC")
+            model = (
+                _udev_decode(model) if model else _read(os.path.join(block, name, "device/model"))
+            )
+            serial = properties.get("ID_SERIAL_SHORT") or _read(
+                os.path.join(block, name, "device/serial")
+            )
+            version = properties.get("ID_REVISION") or _read(
+                os.path.join(block, name, "device/firmware_rev")
+            )
+            bus = properties.get("ID_BUS", "nvme" if name.startswith("nvme") else "scsi")
+            description = DISK_DESCRIPTIONS.get(bus, "Disk")
+            sectors = _read(os.path.join(block, name, "size"), "0")
+            disks.append(
+                {
+                    "logicalname": "/dev/{}".format(name),
+                    "product": model,
+                    "serial": serial,
+                    "version": version,
+                    "size": int(sectors) * 512,
+                    "description": description,
+                    "type": description,
+                }
+            )
+        return disks
+
+    def get_pci_name(self, address, vendor_id, device_id):
+        """
+        Return the vendor and product names of a PCI device from the udev
+        hardware database, or from `pci.ids`
+        """
+        properties = self.get_udev_properties("+pci:{}".format(address))
+        vendor = properties.get("ID_VENDOR_FROM_DATABASE")
+        product = properties.get("ID_MODEL_FROM_DATABASE")
+        if vendor and product:
+            return vendor, product
+
+        if self._pci_names is None:
+            self._pci_names = self.load_pci_ids()
+        return (
+            vendor or self._pci_names.get(vendor_id),
+            product or self._pci_names.get((vendor_id, device_id)),
+        )
+
+    def load_pci_ids(self):
+        names = {}
+        for path in PCI_IDS_PATHS:
+            try:
+                f = open(self.path(path.lstrip("/")), encoding="utf-8", errors="replace")
+            except OSError:
+                continue
+            with f:
+                vendor_id = None
+                for line in f:
+                    if line.startswith("#") or not line.strip():
+                        continue
+                    # device classes are listed after the vendors
+                    if line.startswith("C "):
+                        break
+                    if line[0] != "\t":
+                        vendor_id, _, name = line.strip().partition("  ")
+                        names[vendor_id] = name
+                    elif line[1] != "\t" and vendor_id:
+                        device_id, _, name = line.strip().partition("  ")
+                        names[(vendor_id, device_id)] = name
+            return names
+        logging.debug("pci.ids not found, PCI devices names are unknown")
+        return names
+
+    def walk_pci(self):
+        devices = self.path("sys/bus/pci/devices")
+        if not os.path.isdir(devices):
+            return
+        for address in sorted(os.listdir(devices)):
+            device = os.path.join(devices, address)
+            pci_class = int(_read(os.path.join(device, "class"), "0"), 16)
+            base_class, subclass = pci_class >> 16, (pci_class >> 8) & 0xFF
+            if base_class == 0x02:
+                self.find_network(address, device, subclass)
+            elif base_class == 0x03:
+                self.find_gpus(address, device, subclass)
+
+    def _get_names(self, address, device):
+        vendor_id = _read(os.path.join(device, "vendor"), "")[2:]
+        device_id = _read(os.path.join(device, "device"), "")[2:]
+        return self.get_pci_name(address, vendor_id, device_id)
+
+    def find_network(self, address, device, subclass):
+        vendor, product = self._get_names(address, device)
+        net = os.path.join(device, "net")
+        names = sorted(os.listdir(net)) if os.path.isdir(net) else []
+        if names:
+            name = names[0]
+            mac = _read(self.path("sys/class/net", name, "address"), "")
+        else:
+            name, mac = "unknown{}".format(self.unknown_interfaces), ""
+            self.unknown_interfaces += 1
+        self.interfaces.append(
+            {
+                "name": name,
+                "macaddress": mac,
+                "serial": mac,
+                "product": product or "Unknown NIC",
+                "vendor": vendor or "Unknown",
+                "description": NETWORK_DESCRIPTIONS.get(subclass, "Network controller"),
+            }
+        )
+
+    def find_gpus(self, address, device, subclass):
+        vendor, product = self._get_names(address, device)
+        self.gpus.append(
+            {
+                "product": product or "Unknown GPU",
+                "vendor": vendor or "Unknown",
+                "description": DISPLAY_DESCRIPTIONS.get(subclass, "Display controller"),
+            }
+        )
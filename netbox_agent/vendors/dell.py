@@ -1,7 +1,6 @@
 import logging
-import subprocess
 
-from netbox_agent.misc import is_tool
+from netbox_agent.commands import commands, is_tool
 from netbox_agent.server import ServerBase
 
 
@@ -20,7 +19,7 @@ class DellHost(ServerBase):
         `        Location In Chassis: Slot 03`
         """
         if self.is_blade():
-            return self.baseboard[0].get("Location In Chassis").strip()
+            return self.dmi.baseboard.get("Location In Chassis")
         return None
 
     def get_chassis_name(self):
@@ -30,12 +29,12 @@ class DellHost(ServerBase):
 
     def get_chassis(self):
         if self.is_blade():
-            return self.chassis[0]["Version"].strip()
+            return self.dmi.chassis["Version"]
         return self.get_product_name()
 
     def get_chassis_service_tag(self):
         if self.is_blade():
-            return self.chassis[0]["Serial Number"].strip()
+            return self.dmi.chassis["Serial Number"]
         return self.get_service_tag()
 
     def get_power_consumption(self):
@@ -52,7 +51,7 @@ class DellHost(ServerBase):
             logging.error("omreport does not seem to be installed, please debug")
             return value
 
-        data = subprocess.getoutput("omreport chassis pwrmonitoring")
+        data = commands.getoutput("omreport chassis pwrmonitoring")
         amperage = False
         for line in data.splitlines():
             if line.startswith("Amperage"):
@@ -1,11 +1,10 @@
-import netbox_agent.dmidecode as dmidecode
 from netbox_agent.server import ServerBase
 
 
 class GenericHost(ServerBase):
     def __init__(self, *args, **kwargs):
         super(GenericHost, self).__init__(*args, **kwargs)
-        self.manufacturer = dmidecode.get_by_type(self.dmi, "Baseboard")[0].get("Manufacturer")
+        self.manufacturer = self.dmi.baseboard.get("Manufacturer")
 
     def is_blade(self):
         return False
@@ -1,6 +1,5 @@
-import netbox_agent.dmidecode as dmidecode
+from netbox_agent.collectors import collectors
 from netbox_agent.server import ServerBase
-from netbox_agent.inventory import Inventory
 
 
 class HPHost(ServerBase):
@@ -24,9 +23,8 @@ class HPHost(ServerBase):
         can change.
         So we need to find it every time
         """
-        # FIXME: make a dmidecode function get_by_dminame() ?
         if self.is_blade():
-            locator = dmidecode.get_by_type(self.dmi, 204)
+            locator = self.dmi.get_by_type(204)
             if self.product.startswith("ProLiant BL460c Gen10"):
                 locator = locator[0]["Strings"]
                 return {
@@ -38,13 +36,11 @@ class HPHost(ServerBase):
 
             # HP ProLiant m750, m710x, m510 Server Cartridge
             if self.product.startswith("ProLiant m") and self.product.endswith("Server Cartridge"):
-                locator = dmidecode.get_by_type(self.dmi, 2)
-                chassis = dmidecode.get_by_type(self.dmi, 3)
                 return {
                     "Enclosure Model": "Moonshot 1500 Chassis",
                     "Enclosure Name": "Unknown",
-                    "Server Bay": locator[0]["Location In Chassis"].strip(),
-                    "Enclosure Serial": chassis[0]["Serial Number"].strip(),
+                    "Server Bay": self.dmi.baseboard["Location In Chassis"],
+                    "Enclosure Serial": self.dmi.chassis["Serial Number"],
                 }
 
             return locator[0]
@@ -112,12 +108,10 @@ class HPHost(ServerBase):
         Indicates if the device hosts a drive expansion card based
         on raid card attributes.
         """
-        # Uses already parsed inventory if available
-        # parses it otherwise
-        inventory = getattr(self, "inventory", None)
-        if inventory is None:
-            inventory = Inventory(self)
-        for raid_card in inventory.get_raid_cards():
+        raid = collectors.get("raid", self.manufacturer)
+        if raid is None:
+            return False
+        for raid_card in raid.get_controllers():
             if self.is_blade() and raid_card.is_external():
                 return True
         return False
@@ -7,11 +7,11 @@ class QCTHost(ServerBase):
         self.manufacturer = "QCT"
 
     def is_blade(self):
-        return "Location In Chassis" in self.baseboard[0].keys()
+        return "Location In Chassis" in self.dmi.baseboard
 
     def get_blade_slot(self):
         if self.is_blade():
-            return "Slot {}".format(self.baseboard[0].get("Location In Chassis").strip())
+            return "Slot {}".format(self.dmi.baseboard.get("Location In Chassis"))
         return None
 
     def get_chassis_name(self):
@@ -21,10 +21,10 @@ class QCTHost(ServerBase):
 
     def get_chassis(self):
         if self.is_blade():
-            return self.chassis[0]["Version"].strip()
+            return self.dmi.chassis["Version"]
         return self.get_product_name()
 
     def get_chassis_service_tag(self):
         if self.is_blade():
-            return self.chassis[0]["Serial Number"].strip()
+            return self.dmi.chassis["Serial Number"]
         return self.get_service_tag()
@@ -21,7 +21,7 @@ class SupermicroHost(ServerBase):
         self.manufacturer = "Supermicro"
 
     def is_blade(self):
-        product_name = self.system[0]["Product Name"].strip()
+        product_name = self.dmi.system["Product Name"]
         # Blades
         blade = product_name.startswith("SBI")
         blade |= product_name.startswith("SBA")
@@ -47,8 +47,8 @@ class SupermicroHost(ServerBase):
 
     def get_service_tag(self):
         default_serial = "0123456789"
-        baseboard_serial = self.baseboard[0]["Serial Number"].strip()
-        system_serial = str(self.system[0]["Serial Number"]).strip()
+        baseboard_serial = self.dmi.baseboard["Serial Number"]
+        system_serial = self.dmi.system["Serial Number"]
 
         if self.is_blade() or system_serial == default_serial:
             return baseboard_serial
@@ -56,17 +56,17 @@ class SupermicroHost(ServerBase):
 
     def get_product_name(self):
         if self.is_blade():
-            return self.baseboard[0]["Product Name"].strip()
-        return self.system[0]["Product Name"].strip()
+            return self.dmi.baseboard["Product Name"]
+        return self.dmi.system["Product Name"]
 
     def get_chassis(self):
         if self.is_blade():
-            return self.system[0]["Product Name"].strip()
+            return self.dmi.system["Product Name"]
         return self.get_product_name()
 
     def get_chassis_service_tag(self):
         if self.is_blade():
-            return self.system[0]["Serial Number"].strip()
+            return self.dmi.system["Serial Number"]
         return self.get_service_tag()
 
     def get_chassis_name(self):
@@ -1,20 +1,25 @@
 import json
 import os
-import subprocess
 
 import netbox_agent.dmidecode as dmidecode
+from netbox_agent.cache import cache
+from netbox_agent.collectors import collectors
+from netbox_agent.commands import commands
 from netbox_agent.config import config
 from netbox_agent.config import netbox_instance as nb
 from netbox_agent.location import Tenant
 from netbox_agent.logging import logging  # NOQA
 from netbox_agent.misc import create_netbox_tags, get_hostname, get_device_platform
 from netbox_agent.network import VirtualNetwork
+from netbox_agent.plan import plan
 from pprint import pprint
 
 
 def is_vm(dmi):
-    bios = dmidecode.get_by_type(dmi, "BIOS")[0]
-    system = dmidecode.get_by_type(dmi, "System")[0]
+    if not isinstance(dmi, dmidecode.DMI):
+        dmi = dmidecode.DMI(dmi)
+    bios = dmi.bios
+    system = dmi.system
 
     return (
         "Hyper-V" in bios["Version"]
@@ -31,10 +36,12 @@ def is_vm(dmi):
 
 class VirtualMachine(object):
     def __init__(self, dmi=None):
-        if dmi:
+        if isinstance(dmi, dmidecode.DMI):
             self.dmi = dmi
+        elif dmi:
+            self.dmi = dmidecode.DMI(dmi)
         else:
-            self.dmi = dmidecode.parse()
+            self.dmi = collectors.get("dmidecode")
         self.network = None
         self.device_platform = get_device_platform(config.device.platform)
 
@@ -51,7 +58,7 @@ class VirtualMachine(object):
 
     def get_disk(self):
         disk_space = 0
-        disk_data = subprocess.getoutput("lshw -json -c disk")
+        disk_data = commands.getoutput(["lshw", "-json", "-c", "disk"], stderr=False)
         for disk in json.loads(disk_data):
             size = int(disk.get("size", 0)) / 1073741824
             disk_space += size
@@ -63,7 +70,8 @@ class VirtualMachine(object):
         return vm
 
     def get_netbox_cluster(self, name):
-        cluster = nb.virtualization.clusters.get(
+        cluster = cache.get(
+            nb.virtualization.clusters,
             name=name,
         )
         return cluster
@@ -82,7 +90,7 @@ class VirtualMachine(object):
         tenant = self.get_tenant()
         if tenant is None:
             return None
-        nb_tenant = nb.tenancy.tenants.get(slug=self.get_tenant())
+        nb_tenant = cache.get(nb.tenancy.tenants, slug=tenant)
         return nb_tenant
 
     def netbox_create_or_update(self, config):
@@ -102,10 +110,11 @@ class VirtualMachine(object):
         if not vm:
             logging.debug("Creating Virtual machine..")
 
-            vm = nb.virtualization.virtual_machines.create(
+            vm = plan.create(
+                nb.virtualization.virtual_machines,
                 name=hostname,
                 cluster=cluster.id,
-                platform=self.device_platform.id,
+                platform=self.device_platform.id if self.device_platform else None,
                 vcpus=vcpus,
                 memory=memory,
                 disk=disk,
@@ -113,6 +122,9 @@ class VirtualMachine(object):
                 tags=[{"name": x} for x in self.tags],
             )
             created = True
+            if vm is None:
+                logging.info("Virtual machine creation planned, it will be synced on the next run")
+                return
 
         self.network = VirtualNetwork(server=self)
         self.network.create_or_update_netbox_network_cards()
@@ -139,7 +151,7 @@ class VirtualMachine(object):
                     vm.tags = sorted(set(new_tags_ids + vm_tags_ids))
                 updated += 1
 
-            if vm.platform != self.device_platform:
+            if self.device_platform is not None and vm.platform != self.device_platform:
                 vm.platform = self.device_platform
                 updated += 1
 
@@ -148,7 +160,7 @@ class VirtualMachine(object):
                 updated += 1
 
         if updated:
-            vm.save()
+            plan.save(vm)
 
     def print_debug(self):
         self.network = VirtualNetwork(server=self)
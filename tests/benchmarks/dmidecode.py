@@ -0,0 +1,153 @@
+"""
+Parse time and peak memory of the dmidecode text parser
+
+Run with `python -m tests.benchmarks.dmidecode`, the parser before the
+streaming rewrite is kept here as the reference. The dumps are read from
+files: before, the whole output is read then parsed, after, it is parsed
+line by line as from the dmidecode pipe.
+"""
+
+import os
+import re
+import tempfile
+import time
+import tracemalloc
+
+from netbox_agent import dmidecode
+
+FIXTURES = "tests/fixtures/dmidecode"
+
+_in_block_re = re.compile("^\\t\\t(.+)$")
+_record_re = re.compile("\\t(.+):\\s+(.+)$")
+_record2_re = re.compile("\\t(.+):$")
+
+
+def legacy_parse(buffer):
+    output_data = {}
+    for record in buffer.split("\n\n"):
+        record_element = record.splitlines()
+        if len(record_element) < 3:
+            continue
+        handle_data = dmidecode._handle_re.findall(record_element[0])
+        if not handle_data:
+            continue
+        handle_data = handle_data[0]
+        dmi_handle = handle_data[0]
+        output_data[dmi_handle] = {}
+        output_data[dmi_handle]["DMIType"] = int(handle_data[1])
+        output_data[dmi_handle]["DMISize"] = int(handle_data[2])
+        output_data[dmi_handle]["DMIName"] = record_element[1]
+
+        in_block_elemet = ""
+        in_block_list = ""
+        for i in range(2, len(record_element), 1):
+            if in_block_elemet != "":
+                in_block_data = _in_block_re.findall(record_element[i])
+                if in_block_data:
+                    if not in_block_list:
+                        in_block_list = [in_block_data[0]]
+                    else:
+                        in_block_list.append(in_block_data[0])
+                    output_data[dmi_handle][in_block_elemet] = in_block_list
+                    continue
+                else:
+                    in_block_elemet = ""
+            record_data = _record_re.findall(record_element[i])
+            if record_data:
+                output_data[dmi_handle][record_data[0][0]] = record_data[0][1]
+                continue
+            record_data2 = _record2_re.findall(record_element[i])
+            if record_data2:
+                in_block_elemet = record_data2[0]
+                in_block_list = ""
+                continue
+    return output_data
+
+
+def synthetic_dump(sockets=4, dimms=96, template="HP_DL380p_Gen8"):
+    """
+    Build the dmidecode output of a `sockets` processors and `dimms` memory
+    modules server out of a fixture
+    """
+    with open(os.path.join(FIXTURES, template)) as f:
+        records = f.read().split("\n\n")
+
+    def first(type_id):
+        return next(r for r in records if ", DMI type {},".format(type_id) in r.split("\n", 1)[0])
+
+    processor, memory = first(4), first(17)
+    output = [r for r in records if r not in (processor, memory)]
+    handle = 0x8000
+    for count, record in ((sockets, processor), (dimms, memory)):
+        for i in range(count):
+            lines = record.split("\n")
+            lines[0] = re.sub("0x[0-9A-F]{4}", "0x{:04X}".format(handle), lines[0], count=1)
+            record_copy = "\n".join(lines)
+            record_copy = re.sub(
+                r"(Locator|Designation): (.*)", r"\1: \2 #{}".format(i), record_copy
+            )
+            output.insert(-1, record_copy)
+            handle += 1
+    return "\n\n".join(output)
+
+
+def measure(func, path, rounds=20):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(path)
+    elapsed = (time.perf_counter() - start) / rounds
+
+    tracemalloc.start()
+    func(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def parse_before(path):
+    with open(path) as f:
+        return legacy_parse(f.read())
+
+
+def parse_after(path):
+    with open(path) as f:
+        return dmidecode._parse(f)
+
+
+def get_dumps():
+    dumps = {}
+    for name in sorted(os.listdir(FIXTURES)):
+        with open(os.path.join(FIXTURES, name)) as f:
+            dumps[name] = f.read()
+    dumps["synthetic 4 sockets 96 DIMMs"] = synthetic_dump()
+    return dumps
+
+
+def test_same_output():
+    for name, dump in get_dumps().items():
+        assert dmidecode._parse(dump) == legacy_parse(dump), name
+        assert dmidecode._parse(iter(dump.splitlines(True))) == legacy_parse(dump), name
+
+
+def main():
+    print(
+        "{:<40} {:>12} {:>12} {:>12} {:>12}".format(
+            "dump", "before (ms)", "after (ms)", "before (kB)", "after (kB)"
+        )
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for name, dump in get_dumps().items():
+            path = os.path.join(directory, "dump")
+            with open(path, "w") as f:
+                f.write(dump)
+            before = measure(parse_before, path)
+            after = measure(parse_after, path)
+            print(
+                "{:<40} {:>12.3f} {:>12.3f} {:>12.1f} {:>12.1f}".format(
+                    name, before[0] * 1000, after[0] * 1000, before[1] / 1024, after[1] / 1024
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Parse time of the LLDP neighbors
+
+Run with `python -m tests.benchmarks.lldp`. The keyvalue fixtures of
+tests/fixtures/lldp and the json0 one are scaled to a 256 ports host, then
+parsed and queried for the switch IP, port and VLANs of every port like
+`Network` does, with the former nested dicts parser and with `LLDP`.
+"""
+
+import json
+import re
+import time
+
+from netbox_agent.lldp import LLDP
+
+FIXTURES = "tests/fixtures/lldp"
+KEYVALUE_FIXTURES = ("223.txt", "cumulus.txt", "dedibox1.txt", "dedibox2.txt", "qfx.txt")
+
+
+class LegacyLLDP(LLDP):
+    """
+    The keyvalue output parsed into nested dicts, walked by every getter
+    """
+
+    def parse(self):
+        output_dict = {}
+        vlans = {}
+        vid = None
+        for entry in self.output.splitlines():
+            if "=" not in entry:
+                continue
+            path, value = entry.strip().split("=", 1)
+            split_path = path.split(".")
+            interface = split_path[1]
+            path_components, final = split_path[:-1], split_path[-1]
+            current_dict = output_dict
+
+            if vlans.get(interface) is None:
+                vlans[interface] = {}
+
+            for path_component in path_components:
+                if not isinstance(current_dict.get(path_component), dict):
+                    current_dict[path_component] = {}
+                current_dict = current_dict.get(path_component)
+                if "vlan-id" in path:
+                    vid = value
+                    vlans[interface][value] = vlans[interface].get(vid, {})
+                elif path.endswith("vlan"):
+                    vid = value.replace("vlan-", "").replace("VLAN", "")
+                    vlans[interface][vid] = vlans[interface].get(vid, {})
+                elif "pvid" in path:
+                    vlans[interface][vid]["pvid"] = True
+            if "vlan" not in path:
+                current_dict[final] = value
+        for interface, vlan in vlans.items():
+            output_dict["lldp"][interface]["vlan"] = vlan
+        self.data = output_dict
+        return output_dict
+
+    def get_switch_ip(self, interface):
+        if self.data.get("lldp", {}).get(interface) is None:
+            return None
+        return self.data["lldp"][interface]["chassis"].get("mgmt-ip")
+
+    def get_switch_port(self, interface):
+        if self.data.get("lldp", {}).get(interface) is None:
+            return None
+        if self.data["lldp"][interface]["port"].get("ifname"):
+            return self.data["lldp"][interface]["port"]["ifname"]
+        return self.data["lldp"][interface]["port"]["descr"]
+
+    def get_switch_vlan(self, interface):
+        if self.data.get("lldp", {}).get(interface) is None:
+            return None
+        return self.data["lldp"][interface]["vlan"]
+
+
+def scaled_keyvalue(ports=256):
+    """
+    Return the keyvalue fixtures with their interfaces renamed, repeated up
+    to `ports` interfaces
+    """
+    interfaces = []
+    for filename in KEYVALUE_FIXTURES:
+        with open("{}/{}".format(FIXTURES, filename)) as f:
+            lines = f.read().splitlines()
+        for name in dict.fromkeys(re.findall(r"^lldp\.([^.=]+)\.", "\n".join(lines), re.M)):
+            prefix = "lldp.{}.".format(name)
+            interface = [line[len(prefix) :] for line in lines if line.startswith(prefix)]
+            # the nested dicts getters fail on the neighbors without chassis or port
+            if any(line.startswith("chassis.") for line in interface) and any(
+                line.startswith("port.") for line in interface
+            ):
+                interfaces.append(interface)
+
+    output = []
+    for port in range(ports):
+        for line in interfaces[port % len(interfaces)]:
+            output.append("lldp.eth{}.{}".format(port, line))
+    return "\n".join(output)
+
+
+def scaled_json(ports=256):
+    """
+    Return the json0 fixture with its interfaces repeated up to `ports`
+    interfaces
+    """
+    with open("{}/qfx.json".format(FIXTURES)) as f:
+        data = json.load(f)
+    interfaces = data["lldp"][0]["interface"]
+    data["lldp"][0]["interface"] = [
+        dict(interfaces[port % len(interfaces)], name="eth{}".format(port))
+        for port in range(ports)
+    ]
+    return json.dumps(data, indent=2)
+
+
+def query(lldp_class, output, ports=256):
+    lldp = lldp_class(output)
+    return [
+        (
+            lldp.get_switch_ip("eth{}".format(port)),
+            lldp.get_switch_port("eth{}".format(port)),
+            lldp.get_switch_vlan("eth{}".format(port)),
+        )
+        for port in range(ports)
+    ]
+
+
+def test_same_neighbors():
+    output = scaled_keyvalue(64)
+    for legacy, neighbor in zip(query(LegacyLLDP, output, 64), query(LLDP, output, 64)):
+        # the legacy parser keeps the last management address
+        assert legacy[1:] == neighbor[1:]
+
+
+def test_scaled_json():
+    neighbors = query(LLDP, scaled_json(4), 4)
+    assert neighbors[0] == neighbors[2] == ("10.192.192.116", "xe-0/0/1", {"296": {"pvid": True}})
+
+
+def main(ports=256, rounds=20):
+    for name, lldp_class, output in (
+        ("nested dicts, keyvalue", LegacyLLDP, scaled_keyvalue(ports)),
+        ("flat index, keyvalue", LLDP, scaled_keyvalue(ports)),
+        ("flat index, json0", LLDP, scaled_json(ports)),
+    ):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            query(lldp_class, output, ports)
+        print(
+            "{} ports, {}: {:.2f} ms".format(
+                ports, name, (time.perf_counter() - start) * 1000 / rounds
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
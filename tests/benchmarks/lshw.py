@@ -0,0 +1,310 @@
+"""
+Walk time of the lshw output
+
+Run with `python -m tests.benchmarks.lshw`. The fixed depth walk the
+recursive one replaced is kept here as the reference, and the streaming
+parsing is measured as well, with its peak memory. It is run on
+synthetic dumps of a big server (4 sockets, 96 DIMMs, 8 GPUs, 32 NICs, a
+90 disks JBOD), with the PCI devices right behind the root ports or
+behind PCIe switches.
+"""
+
+import json
+import tempfile
+import time
+import tracemalloc
+
+from netbox_agent.lshw import LSHW
+
+
+class LegacyLSHW(LSHW):
+    def __init__(self, output):
+        if not isinstance(output, str):
+            output = output.read()
+        json_data = json.loads(output)
+        if isinstance(json_data, list):
+            self.hw_info = json_data[0]
+        else:
+            self.hw_info = json_data
+        self.info = {}
+        self.memories = []
+        self.interfaces = []
+        self.cpus = []
+        self.power = []
+        self.disks = []
+        self.gpus = []
+        self.vendor = self.hw_info["vendor"]
+        self.product = self.hw_info["product"]
+        self.chassis_serial = self.hw_info["serial"]
+        self.motherboard_serial = self.hw_info["children"][0].get("serial", "No S/N")
+        self.motherboard = self.hw_info["children"][0].get("product", "Motherboard")
+
+        for k in self.hw_info["children"]:
+            if k["class"] == "power":
+                self.power.append(k)
+            if "children" in k:
+                for j in k["children"]:
+                    if j["class"] == "generic":
+                        continue
+                    if j["class"] == "storage":
+                        self.find_storage(j)
+                    if j["class"] == "memory":
+                        self.find_memories(j)
+                    if j["class"] == "processor":
+                        self.find_cpus(j)
+                    if j["class"] == "bridge":
+                        self.walk_bridge(j)
+
+    def find_network(self, obj):
+        unkn_intfs = []
+        for i in self.interfaces:
+            if not isinstance(i["name"], list):
+                if i["name"].startswith("unknown"):
+                    unkn_intfs.append(i)
+            else:
+                for j in i["name"]:
+                    if j.startswith("unknown"):
+                        unkn_intfs.append(j)
+
+        unkn_name = "unknown{}".format(len(unkn_intfs))
+        self.interfaces.append(
+            {
+                "name": obj.get("logicalname", unkn_name),
+                "macaddress": obj.get("serial", ""),
+                "serial": obj.get("serial", ""),
+                "product": obj.get("product", "Unknown NIC"),
+                "vendor": obj.get("vendor", "Unknown"),
+                "description": obj.get("description", ""),
+            }
+        )
+
+    def walk_bridge(self, obj):
+        if "children" not in obj:
+            return
+        for bus in obj["children"]:
+            if bus["class"] == "storage":
+                self.find_storage(bus)
+            if bus["class"] == "display":
+                self.find_gpus(bus)
+            if "children" in bus:
+                for b in bus["children"]:
+                    if b["class"] == "storage":
+                        self.find_storage(b)
+                    if b["class"] == "network":
+                        self.find_network(b)
+                    if b["class"] == "display":
+                        self.find_gpus(b)
+
+
+def _node(id, hwclass, **attrs):
+    # the nodes of a real dump have that many capabilities and settings
+    node = {
+        "id": id,
+        "class": hwclass,
+        "claimed": True,
+        "handle": "PCI:0000:00:00.0",
+        "physid": id,
+        "width": 64,
+        "clock": 33000000,
+        "configuration": {
+            "driver": attrs.pop("driver", "none"),
+            "latency": "0",
+            "firmware": "22.31.1014 (MT_0000000436)",
+            "link": "yes",
+            "multicast": "yes",
+        },
+        "capabilities": {
+            "pm": "Power Management",
+            "msi": "Message Signalled Interrupts",
+            "msix": "MSI-X",
+            "pciexpress": "PCI Express",
+            "vpd": "Vital Product Data",
+            "bus_master": "bus mastering",
+            "cap_list": "PCI capabilities listing",
+            "rom": "extension ROM",
+            "ethernet": True,
+            "physical": "Physical interface",
+            "autonegotiation": "Auto-negotiation",
+        },
+    }
+    node.update(attrs)
+    return node
+
+
+def synthetic_dump(switch_depth=0, sockets=4, dimms=96, gpus=8, nics=32, disks=90):
+    """
+    Return the `lshw -json` output of a big server, its PCI devices being
+    behind `switch_depth` levels of PCIe switches
+    """
+    cpus = [
+        _node(
+            "cpu:{}".format(i),
+            "processor",
+            businfo="cpu@{}".format(i),
+            product="Intel(R) Xeon(R) Platinum 8380 CPU @ 2.30GHz",
+            vendor="Intel Corp.",
+            slot="CPU{}".format(i),
+            children=[_node("cache:{}".format(c), "memory", size=1310720) for c in range(3)],
+        )
+        for i in range(sockets)
+    ]
+    banks = [
+        _node(
+            "bank:{}".format(i),
+            "memory",
+            description="DIMM DDR4 Synchronous Registered (Buffered) 3200 MHz (0.3 ns)",
+            product="M393A4K40DB3-CWE",
+            vendor="Samsung",
+            serial="{:08X}".format(i),
+            slot="CPU{}_DIMM{}".format(i // 24, i % 24),
+            size=34359738368,
+        )
+        for i in range(dimms)
+    ]
+    devices = [
+        _node(
+            "display:{}".format(i),
+            "display",
+            businfo="pci@0000:{:02x}:00.0".format(i),
+            description="3D controller",
+            product="GA100 [A100 SXM4 80GB]",
+            vendor="NVIDIA Corporation",
+        )
+        for i in range(gpus)
+    ]
+    devices += [
+        _node(
+            "network:{}".format(i),
+            "network",
+            businfo="pci@0000:{:02x}:00.{}".format(0x40 + i // 2, i % 2),
+            description="Ethernet interface",
+            product="MT2892 Family [ConnectX-6 Dx]",
+            vendor="Mellanox Technologies",
+            **(
+                {
+                    "logicalname": "ens{}f{}".format(i // 2, i % 2),
+                    "serial": "0c:42:a1:00:00:{:02x}".format(i),
+                }
+                if i % 4
+                else {}
+            ),
+        )
+        for i in range(nics)
+    ]
+    devices.append(
+        _node(
+            "sas",
+            "storage",
+            businfo="pci@0000:80:00.0",
+            description="Serial Attached SCSI controller",
+            product="SAS3008 PCI-Express Fusion-MPT SAS-3",
+            driver="mpt3sas",
+            children=[
+                _node(
+                    "disk:{}".format(i),
+                    "disk",
+                    businfo="scsi@0:0.{}.0".format(i),
+                    description="SCSI Disk",
+                    product="ST16000NM002G",
+                    vendor="Seagate",
+                    serial="ZL2{:05d}".format(i),
+                    logicalname="/dev/sd{}".format(i),
+                    size=16000900661248,
+                    children=[_node("volume", "volume", description="EXT4 volume")],
+                )
+                for i in range(disks)
+            ],
+        )
+    )
+
+    ports = []
+    for i, device in enumerate(devices):
+        for depth in range(switch_depth):
+            device = _node("pci:{}".format(depth), "bridge", children=[device])
+        ports.append(
+            _node("pci:{}".format(i), "bridge", description="PCI bridge", children=[device])
+        )
+
+    core = _node(
+        "core",
+        "bus",
+        description="Motherboard",
+        product="X12DPG-OA6",
+        serial="OM00000001",
+        children=cpus
+        + [_node("memory", "memory", description="System Memory", children=banks)]
+        + [_node("pci", "bridge", description="Host bridge", children=ports)],
+    )
+    return json.dumps(
+        [
+            {
+                "id": "server",
+                "class": "system",
+                "product": "SYS-420GP-TNAR",
+                "vendor": "Supermicro",
+                "serial": "S000001",
+                "children": [core, _node("power", "power", product="PWS-2K20A-1R")],
+            }
+        ],
+        indent=2,
+    )
+
+
+def found(lshw):
+    return {
+        "cpus": len(lshw.cpus),
+        "memories": len(lshw.memories),
+        "gpus": len(lshw.gpus),
+        "interfaces": len(lshw.interfaces),
+        "disks": len(lshw.disks),
+    }
+
+
+def test_same_records():
+    dump = synthetic_dump()
+    legacy, lshw = LegacyLSHW(dump), LSHW(output=dump)
+    for attr in ("cpus", "memories", "gpus", "interfaces", "disks", "motherboard", "vendor"):
+        assert getattr(lshw, attr) == getattr(legacy, attr), attr
+
+
+def test_nested_devices():
+    lshw = LSHW(output=synthetic_dump(switch_depth=3))
+    assert found(lshw) == found(LSHW(output=synthetic_dump()))
+
+
+def measure(cls, dump, rounds=20, **kwargs):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        lshw = cls(output=dump, **kwargs)
+    elapsed = (time.perf_counter() - start) / rounds
+
+    # as read from the lshw pipe
+    with tempfile.TemporaryFile("w+") as f:
+        f.write(dump)
+        f.seek(0)
+        tracemalloc.start()
+        cls(output=f, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak, found(lshw)
+
+
+def main():
+    for switch_depth in (0, 3):
+        dump = synthetic_dump(switch_depth=switch_depth)
+        print("{} PCIe switch levels, {:.1f} MB dump".format(switch_depth, len(dump) / 2**20))
+        for name, cls, kwargs in (
+            ("before", LegacyLSHW, {}),
+            ("after", LSHW, {}),
+            ("stream", LSHW, {"streaming": True}),
+        ):
+            elapsed, peak, records = measure(cls, dump, **kwargs)
+            print(
+                "  {:<8} {:8.2f} ms {:8.0f} kB peak  {}".format(
+                    name, elapsed * 1000, peak / 1024, records
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
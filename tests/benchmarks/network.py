@@ -0,0 +1,139 @@
+"""
+Scan time of the network interfaces
+
+Run with `python -m tests.benchmarks.network`. The netlink dump recorded
+in tests/fixtures/netlink (a veth pair, one end in a bridge) is scaled to
+thousands of veths and turned into NICs, as `Network.scan` does with
+`network.scan` set to netlink. Both backends are also run on the host,
+and the ethtool probes of a 64 ports host with more or less workers.
+"""
+
+import struct
+import time
+
+from netbox_agent.config import config
+from netbox_agent.netlink import (
+    IFA_LABEL,
+    IFADDRMSG,
+    IFINFOMSG,
+    IFLA_IFNAME,
+    NLMSGHDR,
+    RTATTR,
+    RTM_NEWADDR,
+    RTM_NEWLINK,
+    parse_addresses,
+    parse_attributes,
+    parse_links,
+    parse_messages,
+)
+from netbox_agent import network
+from netbox_agent.network import Network
+
+FIXTURES = "tests/fixtures/netlink"
+
+
+def _message(msg_type, header, attributes):
+    payload = header
+    for attr_type, value in attributes.items():
+        payload += RTATTR.pack(RTATTR.size + len(value), attr_type) + value
+        payload += bytes(-len(payload) % 4)
+    return NLMSGHDR.pack(NLMSGHDR.size + len(payload), msg_type, 2, 0, 0) + payload
+
+
+def scaled_dump(count):
+    """
+    Return the recorded links and addresses dumps with `count` more copies
+    of the veth0 interface and its addresses
+    """
+    with open("{}/links".format(FIXTURES), "rb") as f:
+        links = f.read()
+    with open("{}/addresses".format(FIXTURES), "rb") as f:
+        addresses = f.read()
+
+    veth = next(p for t, p in parse_messages(links) if t == RTM_NEWLINK and b"veth0\0" in p)
+    index = struct.unpack_from("=i", veth, 4)[0]
+    veth_addresses = [
+        p
+        for t, p in parse_messages(addresses)
+        if t == RTM_NEWADDR and IFADDRMSG.unpack_from(p)[4] == index
+    ]
+
+    for i in range(count):
+        new_index = 1000 + i
+        name = "veth{}\0".format(new_index).encode()
+        header = bytearray(veth[: IFINFOMSG.size])
+        struct.pack_into("=i", header, 4, new_index)
+        attributes = parse_attributes(veth, IFINFOMSG.size)
+        attributes[IFLA_IFNAME] = name
+        links += _message(RTM_NEWLINK, bytes(header), attributes)
+        for address in veth_addresses:
+            header = bytearray(address[: IFADDRMSG.size])
+            struct.pack_into("=I", header, 4, new_index)
+            attributes = parse_attributes(address, IFADDRMSG.size)
+            if IFA_LABEL in attributes:
+                # keep the aliases (ie: veth0:1)
+                attributes[IFA_LABEL] = attributes[IFA_LABEL].replace(b"veth0", name[:-1])
+            addresses += _message(RTM_NEWADDR, bytes(header), attributes)
+    return links, addresses
+
+
+def scan(links, addresses):
+    return Network.scan_links(parse_links(links), parse_addresses(addresses))
+
+
+def test_scaled_dump():
+    nics = scan(*scaled_dump(10))
+    assert len(nics) == 7 + 10
+    assert nics[-1]["name"] == "veth1009"
+    assert nics[-1]["ip"] == nics[5]["ip"]
+
+
+def main():
+    for count in (1000, 4000):
+        links, addresses = scaled_dump(count)
+        for nic_collectors in (["addresses", "link"], ["addresses"]):
+            config.network.collectors.virtual = nic_collectors
+            start = time.perf_counter()
+            nics = scan(links, addresses)
+            print(
+                "netlink dump of {} interfaces, collecting {}: {:.1f} ms".format(
+                    len(nics), "+".join(nic_collectors), (time.perf_counter() - start) * 1000
+                )
+            )
+
+    # probes of a 64 ports host, taking the time of the ethtool commands
+    class SlowEthtool:
+        def __init__(self, interface, timeout=None):
+            pass
+
+        def parse(self, probes):
+            time.sleep(0.01)
+            return {}
+
+    Ethtool, network.Ethtool = network.Ethtool, SlowEthtool
+    for workers in (1, 4, 16):
+        config.network.probe_workers = workers
+        nics = [({"name": "eth{}".format(i), "mac": ""}, "physical") for i in range(64)]
+        start = time.perf_counter()
+        Network.probe_interfaces(nics, {"physical": (0, 64)})
+        print(
+            "probes of 64 interfaces with {} workers: {:.1f} ms".format(
+                workers, (time.perf_counter() - start) * 1000
+            )
+        )
+    network.Ethtool = Ethtool
+    config.network.probe_workers = 1
+
+    for backend in ("netifaces", "netlink"):
+        config.network.scan = backend
+        start = time.perf_counter()
+        nics = Network.scan()
+        print(
+            "{} scan of the {} host interfaces: {:.1f} ms".format(
+                backend, len(nics), (time.perf_counter() - start) * 1000
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import netbox_agent.cache as cache_module
+from netbox_agent.cache import NetboxCache, get_choices
+from netbox_agent.capabilities import Capabilities
+from netbox_agent.config import config
+
+
+class FakeEndpoint:
+    """
+    pynetbox endpoint storing the objects in a list
+    """
+
+    url = "http://netbox/api/dcim/manufacturers"
+
+    def __init__(self, objects=()):
+        self.objects = list(objects)
+        self.gets = 0
+
+    def get(self, **filters):
+        self.gets += 1
+        for obj in self.objects:
+            if all(obj.get(key) == value for key, value in filters.items()):
+                return obj
+        return None
+
+    def create(self, **data):
+        # slow enough for the concurrent creations to overlap
+        time.sleep(0.05)
+        obj = dict(data, id=len(self.objects) + 1)
+        self.objects.append(obj)
+        return obj
+
+
+def test_cache_get():
+    cache = NetboxCache()
+    endpoint = FakeEndpoint([{"id": 1, "name": "HP", "slug": "hp"}])
+    record = cache.get(endpoint, name="HP", slug="hp")
+    assert record == endpoint.objects[0]
+    # the filters are the same whatever their order
+    assert cache.get(endpoint, slug="hp", name="HP") is record
+    assert endpoint.gets == 1
+    assert cache.get(endpoint, name="Dell") is None
+    assert cache.get(endpoint, name="Dell") is None
+    assert endpoint.gets == 3
+    assert cache.stats() == {"hits": 1, "misses": 3, "records": 1}
+
+
+def test_cache_invalidation():
+    cache = NetboxCache()
+    endpoint = FakeEndpoint()
+    # a missing object isn't cached, the lookup following its creation finds it
+    assert cache.get(endpoint, name="HP") is None
+    record = cache.store(endpoint, endpoint.create(name="HP"), name="HP")
+    assert cache.get(endpoint, name="HP") is record
+    assert endpoint.gets == 1
+
+    # objects deleted from Netbox are looked up again once the cache is cleared
+    endpoint.objects.clear()
+    cache.clear()
+    assert cache.get(endpoint, name="HP") is None
+    assert endpoint.gets == 2
+
+
+def test_get_or_create_concurrently():
+    cache, endpoint = NetboxCache(), FakeEndpoint()
+    results = []
+
+    def get_or_create():
+        results.append(
+            cache.get_or_create(endpoint, lambda: endpoint.create(name="HP"), name="HP")
+        )
+
+    threads = [threading.Thread(target=get_or_create) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(endpoint.objects) == 1
+    assert results == [endpoint.objects[0]] * 4
+
+
+class ChoicesEndpoint:
+    url = "http://netbox/api/dcim/interfaces/"
+
+    def __init__(self):
+        self.calls = 0
+
+    def choices(self):
+        self.calls += 1
+        return {"type": [{"value": "1000base-t", "display_name": "1000BASE-T"}]}
+
+
+def test_get_choices(monkeypatch, tmp_path):
+    monkeypatch.setattr(config.cache, "directory", str(tmp_path))
+    monkeypatch.setattr(config.cache, "choices_ttl", 3600)
+    monkeypatch.setattr(cache_module, "get_capabilities", lambda: Capabilities("4.2.3"))
+    endpoint = ChoicesEndpoint()
+
+    choices = get_choices(endpoint)
+    # the choices are read back from the disk by the next runs
+    assert get_choices(endpoint) == choices
+    assert endpoint.calls == 1
+    assert (tmp_path / "choices-dcim-interfaces.json").exists()
+
+    # they are fetched again once Netbox is upgraded
+    monkeypatch.setattr(cache_module, "get_capabilities", lambda: Capabilities("4.3.0"))
+    assert get_choices(endpoint) == choices
+    assert endpoint.calls == 2
+    assert get_choices(endpoint) == choices
+    assert endpoint.calls == 2
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+import pynetbox
+import pytest
+
+import netbox_agent.capabilities as capabilities_module
+from netbox_agent.capabilities import Capabilities, probe_netbox_version
+
+
+def test_capabilities_at_least():
+    capabilities = Capabilities("4.2.3")
+    assert capabilities.at_least("4.2")
+    assert capabilities.at_least("3.7")
+    assert not capabilities.at_least("4.10")
+    assert capabilities.has_mac_address_objects
+    assert not Capabilities("4.1").has_mac_address_objects
+
+
+class StubNetbox:
+    def __init__(self, status, version="3.7"):
+        self._status = status
+        self.version = version
+
+    def status(self):
+        if isinstance(self._status, Exception):
+            raise self._status
+        return self._status
+
+
+def request_error(status_code):
+    req = SimpleNamespace(
+        status_code=status_code,
+        url="http://netbox/api/status/",
+        request=SimpleNamespace(body=None),
+        text="",
+    )
+    return pynetbox.RequestError(req)
+
+
+@pytest.mark.parametrize(
+    "status,version",
+    [
+        ({"netbox-version": "4.2.3-Docker-3.2.0"}, "4.2.3"),
+        ({"netbox-version": "v4.0.1"}, "4.0.1"),
+        # without the status endpoint, the version header is used
+        (request_error(404), "3.7"),
+        ({}, "3.7"),
+    ],
+)
+def test_probe_netbox_version(monkeypatch, status, version):
+    monkeypatch.setattr(capabilities_module, "nb", StubNetbox(status))
+    assert probe_netbox_version() == version
+
+
+def test_probe_netbox_version_unknown(monkeypatch):
+    monkeypatch.setattr(capabilities_module, "nb", StubNetbox({}, version=None))
+    with pytest.raises(Exception, match="Unable to find Netbox version"):
+        probe_netbox_version()
@@ -0,0 +1,40 @@
+import netbox_agent.collectors as collectors_module
+from netbox_agent.collectors import Collectors, get_inventory_classes, get_inventory_steps
+from netbox_agent.config import config
+
+
+def test_collector_created_once():
+    calls = []
+    registry = Collectors()
+    registry.register("hw", lambda *args: calls.append(args) or object())
+
+    assert registry.get("hw") is registry.get("hw")
+    assert registry.get("hw", "HP") is registry.get("hw", "HP")
+    assert registry.get("hw") is not registry.get("hw", "HP")
+    assert calls == [(), ("HP",)]
+
+    registry.clear()
+    registry.get("hw")
+    assert len(calls) == 3
+
+
+def test_inventory_classes(monkeypatch):
+    monkeypatch.setattr(config, "inventory", True)
+    for flag in ("register", "update_all", "update_inventory"):
+        monkeypatch.setattr(config, flag, False)
+    # the inventory isn't updated, lshw isn't needed
+    assert get_inventory_steps() == ()
+    assert get_inventory_classes() == []
+
+    monkeypatch.setattr(config, "update_inventory", True)
+    assert get_inventory_steps(update_expansion=True) == ("gpus", "disks", "raid_cards")
+    assert get_inventory_classes() == list(collectors_module.HARDWARE_CLASSES)
+
+
+def test_lshw_classes(monkeypatch):
+    monkeypatch.setattr(collectors_module, "LSHW", lambda **kwargs: kwargs)
+    monkeypatch.setattr(config, "inventory", True)
+    monkeypatch.setattr(config, "update_inventory", True)
+    monkeypatch.setattr(config.collectors, "cpu", "sysfs")
+    monkeypatch.setattr(config.collectors, "memory", "sysfs")
+    assert collectors_module.get_lshw()["classes"] == ["network", "storage", "gpu", "motherboard"]
@@ -0,0 +1,40 @@
+import threading
+import time
+
+from netbox_agent.commands import Commands
+from netbox_agent.config import config
+
+
+def test_run_cached():
+    commands = Commands()
+    assert commands.getstatusoutput(["echo", "foo"], cache=True) == (0, "foo")
+    assert commands.getstatusoutput("echo bar >&2; exit 3") == (3, "bar")
+    assert commands.getoutput(["echo", "foo"], cache=True) == "foo"
+    # the commands are only cached when asked to
+    assert commands.getoutput("echo bar >&2; exit 3") == "bar"
+    assert commands.getstatusoutput(["netbox-agent-missing-tool"])[0] == 127
+    assert commands.stats()["commands"] == 4
+    assert commands.stats()["hits"] == 1
+    assert commands.stats()["failed"] == 3
+
+
+def test_run_timeout():
+    commands = Commands()
+    start = time.monotonic()
+    assert commands.getstatusoutput("echo foo; sleep 10", timeout=0.5) == (124, "foo")
+    with commands.popen(["sleep", "10"], timeout=0.5) as process:
+        process.stdout.read()
+    assert time.monotonic() - start < 5
+    assert [r["timed_out"] for r in commands.records] == [True, True]
+
+
+def test_max_parallel(monkeypatch):
+    monkeypatch.setattr(config.commands, "max_parallel", 2)
+    commands = Commands()
+    threads = [threading.Thread(target=commands.run, args=(["sleep", "0.2"],)) for _ in range(4)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - start >= 0.4
@@ -0,0 +1,34 @@
+from requests.adapters import HTTPAdapter
+
+from netbox_agent.config import TimeoutHTTPAdapter, config, get_http_session
+
+
+def test_http_session(monkeypatch):
+    monkeypatch.setattr(config.netbox, "connect_timeout", 5)
+    monkeypatch.setattr(config.netbox, "read_timeout", 60)
+    monkeypatch.setattr(config.netbox, "retries", 3)
+    monkeypatch.setattr(config.netbox, "backoff_factor", 0.5)
+    monkeypatch.setattr(config.netbox, "pool_size", 8)
+    monkeypatch.setattr(config.netbox, "gzip", True)
+    session = get_http_session()
+
+    adapter = session.get_adapter("https://netbox/api/")
+    assert session.get_adapter("http://netbox/api/") is adapter
+    assert adapter.timeout == (5, 60)
+    assert adapter.max_retries.total == 3
+    assert adapter.max_retries.backoff_factor == 0.5
+    assert set(adapter.max_retries.status_forcelist) == {429, 503}
+    assert adapter.max_retries.respect_retry_after_header
+    assert adapter._pool_connections == adapter._pool_maxsize == 8
+    assert session.headers["Accept-Encoding"] == "gzip, deflate"
+
+
+def test_http_adapter_timeout(monkeypatch):
+    timeouts = []
+    monkeypatch.setattr(HTTPAdapter, "send", lambda self, request, **kw: timeouts.append(kw))
+    adapter = TimeoutHTTPAdapter(timeout=(5, 60))
+    # pynetbox doesn't give any timeout, the default one is applied
+    adapter.send(None)
+    adapter.send(None, timeout=None)
+    adapter.send(None, timeout=1)
+    assert [kw["timeout"] for kw in timeouts] == [(5, 60), (5, 60), 1]
@@ -0,0 +1,128 @@
+import os
+import struct
+
+import pytest
+
+from netbox_agent import dmidecode, smbios
+from tests.conftest import parametrize_with_fixtures
+
+SMBIOS_FIXTURES = "tests/fixtures/smbios"
+
+COMPARED_KEYS = {
+    0: ("Vendor", "Version", "Release Date"),
+    1: ("Manufacturer", "Product Name", "Version", "Serial Number", "UUID", "SKU Number"),
+    2: ("Manufacturer", "Product Name", "Serial Number", "Location In Chassis"),
+    3: ("Manufacturer", "Type", "Serial Number", "Version"),
+    4: ("Socket Designation", "Version", "Core Count", "Thread Count"),
+    17: ("Locator", "Manufacturer", "Serial Number", "Part Number", "Type"),
+    39: ("Name", "Manufacturer", "Serial Number", "Max Power Capacity", "Status"),
+    204: ("Strings", "Server Bay", "Enclosure Model", "Enclosure Serial"),
+}
+
+
+@pytest.mark.parametrize("name", sorted(os.listdir(SMBIOS_FIXTURES)))
+def test_smbios_parse_matches_dmidecode(name):
+    native = smbios.parse(*smbios.read_tables(os.path.join(SMBIOS_FIXTURES, name)))
+    with open(os.path.join("tests/fixtures/dmidecode", name)) as f:
+        expected = dmidecode.parse(f.read())
+
+    for type_id, keys in COMPARED_KEYS.items():
+        handles = [h for h, entry in native.items() if entry["DMIType"] == type_id]
+        assert len(handles) == len(dmidecode.get_by_type(expected, type_id))
+        for handle in handles:
+            entry, reference = native[handle], expected[handle]
+            for key in keys:
+                # the text output only has one of the shapes of the HP records
+                if key not in reference or reference[key] == "<OUT OF SPEC>":
+                    continue
+                assert entry.get(key) == reference.get(key), (type_id, key)
+
+
+# SMBIOS 3.2 entry point
+ENTRY_POINT = b"_SM3_" + bytes([0, 0x18, 3, 2, 0]) + bytes(0x10)
+
+
+def structure(type_id, handle, data, strings=()):
+    """
+    Build a raw SMBIOS structure as laid out by the specification
+    """
+    header = struct.pack("<BBH", type_id, 4 + len(data), handle)
+    strings = b"".join(s + b"\0" for s in strings) or b"\0"
+    return header + data + strings + b"\0"
+
+
+def system(manufacturer):
+    # manufacturer, product name, version and serial number strings
+    return structure(1, 0x0100, bytes([1, 2, 0, 3]) + bytes(0x11), [manufacturer, b"S1", b"42"])
+
+
+def rack_locator():
+    # rack, enclosure name, model and serial, server bay and bays counts
+    data = bytes([1, 2, 3, 4, 16, 8, 5])
+    return structure(204, 0xCC00, data, [b"R1", b"E1", b"c7000", b"1", b"CZ42"])
+
+
+def processor(family):
+    data = bytearray(0x26)
+    data[0x00], data[0x01], data[0x02] = 1, 3, family
+    # status: populated, enabled
+    data[0x14] = 0x41
+    # core count, enabled cores and thread count
+    data[0x1F:0x22] = bytes([8, 8, 16])
+    return structure(4, 0x0400, bytes(data), [b"CPU1"])
+
+
+def test_smbios_parse():
+    table = system(b"HPE") + processor(0xB3) + rack_locator() + structure(127, 0xFEFF, b"")
+    dmi = smbios.parse(ENTRY_POINT, table)
+    assert dmi["0x0100"]["Manufacturer"] == "HPE"
+    assert dmi["0x0100"]["Product Name"] == "S1"
+    assert dmi["0x0100"]["Serial Number"] == "42"
+    cpu = dmi["0x0400"]
+    assert cpu["Socket Designation"] == "CPU1"
+    assert cpu["Family"] == "Xeon"
+    assert cpu["Status"] == "Populated, Enabled"
+    assert (cpu["Core Count"], cpu["Thread Count"]) == ("8", "16")
+    locator = dmi["0xCC00"]
+    assert locator["DMIName"] == "HP ProLiant System/Rack Locator"
+    assert (locator["Enclosure Model"], locator["Server Bay"]) == ("c7000", "1")
+    assert locator["Enclosure Serial"] == "CZ42"
+
+
+def test_smbios_oem_type():
+    # type 204 is only the HP rack locator on HP servers
+    table = system(b"Dell Inc.") + rack_locator() + structure(127, 0xFEFF, b"")
+    entry = smbios.parse(ENTRY_POINT, table)["0xCC00"]
+    assert entry["DMIName"] == "OEM-specific Type"
+    assert "Server Bay" not in entry
+    assert entry["Strings"] == ["R1", "E1", "c7000", "1", "CZ42"]
+
+
+def test_smbios_unknown_processor_family(monkeypatch):
+    table = system(b"HPE") + processor(0x3F) + structure(127, 0xFEFF, b"")
+    with pytest.raises(smbios.ParseError):
+        smbios.parse(ENTRY_POINT, table)
+
+    # dmidecode is run for the processor families only it knows
+    with open("tests/fixtures/dmidecode/HP_DL380p_Gen8") as f:
+        output = f.read()
+    monkeypatch.setattr(smbios, "read_tables", lambda: (ENTRY_POINT, table))
+    monkeypatch.setattr(dmidecode, "_execute_cmd", lambda: output)
+    assert dmidecode.parse().system["Manufacturer"] == "HP"
+
+
+def test_smbios_invalid_entry_point():
+    with pytest.raises(smbios.ParseError):
+        smbios.parse(b"_SM3_", b"")
+    with pytest.raises(smbios.ParseError):
+        smbios.parse(b"\0" * 0x18, b"")
+
+
+@parametrize_with_fixtures("dmidecode/")
+def test_dmi_index(fixture):
+    dmi = dmidecode.parse(fixture)
+    for type_id in (0, 1, 2, 3, 17, 39):
+        assert dmi.get_by_type(type_id) == [e for e in dmi.values() if e["DMIType"] == type_id]
+    assert dmi.get_by_type("Power Supply") == dmi.get_by_type(39)
+    assert dmi.system.get("Serial Number") == dmi.get_by_type(1)[0]["Serial Number"].strip()
+    assert dmi.system is dmi.system
@@ -0,0 +1,67 @@
+import struct
+
+from netbox_agent.ethtool import (
+    EEPROM,
+    ETHTOOL_GLINKSETTINGS,
+    ETHTOOL_GMODULEEEPROM,
+    ETHTOOL_GMODULEINFO,
+    ETHTOOL_GPERMADDR,
+    LINK_SETTINGS,
+    MODULE_INFO,
+    PERM_ADDR,
+    Ethtool,
+)
+
+
+class FakeEthtool(Ethtool):
+    """
+    Ethtool answering the SIOCETHTOOL ioctl as the kernel does for a
+    25G SFP28 NIC
+    """
+
+    def _ioctl(self, sock, data):
+        cmd = struct.unpack_from("=I", data)[0]
+        if cmd == ETHTOOL_GLINKSETTINGS:
+            values = list(LINK_SETTINGS.unpack_from(data))
+            if values[9] != 3:
+                return LINK_SETTINGS.pack(cmd, *[0] * 8, -3, *[0] * 11)
+            # 1000baseKX, 10000baseKR, 25000baseSR
+            supported = (1 << 17 | 1 << 19 | 1 << 33).to_bytes(12, "little")
+            values[1:6] = [25000, 1, 0x04, 0, 1]
+            return LINK_SETTINGS.pack(*values) + supported + bytes(24)
+        if cmd == ETHTOOL_GMODULEINFO:
+            return MODULE_INFO.pack(cmd, 2, 512, *[0] * 8)
+        if cmd == ETHTOOL_GMODULEEEPROM:
+            return EEPROM.pack(cmd, 0, 0, 1) + b"\x03"
+        if cmd == ETHTOOL_GPERMADDR:
+            return PERM_ADDR.pack(cmd, 6) + bytes.fromhex("b8cef6010203") + bytes(26)
+        raise OSError(95, "Operation not supported")
+
+
+def test_ethtool_ioctl(tmp_path):
+    (tmp_path / "eth0").mkdir()
+    (tmp_path / "eth0/speed").write_text("25000\n")
+    (tmp_path / "eth0/duplex").write_text("full\n")
+    (tmp_path / "eth0/carrier").write_text("1\n")
+
+    assert FakeEthtool("eth0", sysfs=str(tmp_path)).parse_ioctl() == {
+        "speed": "25000Mb/s",
+        "max_speed": "25000Mb/s",
+        "duplex": "Full",
+        "link": "yes",
+        "port": "FIBRE",
+        "autoneg": "on",
+        "form_factor": "SFP",
+        "mac_address": "b8:ce:f6:01:02:03",
+    }
+
+
+def test_ethtool_ioctl_unsupported(tmp_path):
+    # ie: a down interface of a driver without ethtool support
+    (tmp_path / "eth0").mkdir()
+    ethtool = FakeEthtool("eth0", sysfs=str(tmp_path))
+    ethtool._ioctl = lambda sock, data: FakeEthtool._ioctl(ethtool, sock, b"\0" * len(data))
+    fields = ethtool.parse_ioctl()
+    assert fields["speed"] == fields["duplex"] == fields["max_speed"] == "-"
+    assert fields["link"] == "no"
+    assert "mac_address" not in fields
@@ -0,0 +1,115 @@
+from types import SimpleNamespace
+
+import pytest
+
+from netbox_agent import fingerprint as fingerprint_module
+from netbox_agent.collectors import collectors
+from netbox_agent.config import config
+from netbox_agent.fingerprint import Fingerprint
+
+
+class StubServer:
+    dmi = {"system": {"Serial Number": "4242"}}
+    device_platform = SimpleNamespace(name="Debian 12")
+
+    def __init__(self, device=None):
+        self.device = device
+        self.lookups = 0
+
+    def get_hostname(self):
+        return "server1"
+
+    def get_datacenter(self):
+        return "dc1"
+
+    def get_rack(self):
+        return "rack1"
+
+    def get_tenant(self):
+        return None
+
+    def get_service_tag(self):
+        return "4242"
+
+    def get_netbox_server(self):
+        self.lookups += 1
+        return self.device
+
+
+class StubDevices:
+    def __init__(self):
+        self.updates = []
+
+    def update(self, objects):
+        self.updates.extend(objects)
+        return [SimpleNamespace(last_updated="2026-10-18T10:00:00Z")]
+
+
+@pytest.fixture
+def nics(monkeypatch, tmp_path):
+    scans = []
+    nics = [{"name": "eth0", "mac": "AA:BB:CC:DD:EE:FF", "ip": ["10.0.0.1/24"]}]
+    monkeypatch.setitem(collectors.factories, "nics", lambda: scans.append(1) or nics)
+    collectors.clear()
+    monkeypatch.setattr(config.cache, "directory", str(tmp_path))
+    monkeypatch.setattr(config.network, "lldp", None)
+    monkeypatch.setattr(config.network, "ipmi", False)
+    monkeypatch.setattr(config, "inventory", False)
+    monkeypatch.setattr(config.virtual, "hypervisor", False)
+    monkeypatch.setattr(config, "force_sync", False)
+    monkeypatch.setattr(
+        fingerprint_module, "nb", SimpleNamespace(dcim=SimpleNamespace(devices=StubDevices()))
+    )
+    yield nics, scans
+    collectors.clear()
+
+
+def sync(server):
+    device = SimpleNamespace(
+        id=1, custom_fields={config.fingerprint.custom_field: None}, last_updated=None
+    )
+    Fingerprint(server).save(device)
+    return SimpleNamespace(
+        id=1,
+        custom_fields={config.fingerprint.custom_field: Fingerprint(server).compute()},
+        last_updated="2026-10-18T10:00:00Z",
+    )
+
+
+def test_fingerprint_facts(nics):
+    nics, scans = nics
+    server = StubServer()
+    facts = Fingerprint(server).get_facts()
+    assert facts["hostname"] == "server1"
+    assert facts["network"] == nics
+    assert "inventory" not in facts
+
+    value = Fingerprint(server).compute()
+    assert len(value) == 64
+    assert Fingerprint(server).compute() == value
+    nics[0]["ip"] = ["10.0.0.2/24"]
+    assert Fingerprint(server).compute() != value
+    # the NICs are scanned once per run
+    assert len(scans) == 1
+
+
+def test_fingerprint_up_to_date(nics):
+    server = StubServer()
+    assert not Fingerprint(server).is_up_to_date()
+    # nothing stored yet, Netbox isn't queried
+    assert server.lookups == 0
+
+    server.device = sync(server)
+    assert Fingerprint(server).is_up_to_date()
+
+    # the device has been modified in Netbox since the last sync
+    server.device.last_updated = "2026-10-18T11:00:00Z"
+    assert not Fingerprint(server).is_up_to_date()
+
+
+def test_fingerprint_force_sync(nics, monkeypatch):
+    server = StubServer()
+    server.device = sync(server)
+    monkeypatch.setattr(config, "force_sync", True)
+    assert not Fingerprint(server).is_up_to_date()
+    assert server.lookups == 0
@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+import pytest
+
+from netbox_agent import inventory as inventory_module
+from netbox_agent.config import config
+from netbox_agent.inventory import INVENTORY_TAG, Inventory
+
+
+class FakeInventoryItems:
+    """
+    pynetbox inventory items endpoint recording the bulk requests
+    """
+
+    url = "http://netbox/api/dcim/inventory-items/"
+
+    def __init__(self):
+        self.requests = []
+
+    def create(self, items):
+        self.requests.append(("create", items))
+
+    def delete(self, items):
+        self.requests.append(("delete", items))
+
+
+@pytest.fixture
+def inventory(monkeypatch):
+    endpoint = FakeInventoryItems()
+    monkeypatch.setattr(
+        inventory_module, "nb", SimpleNamespace(dcim=SimpleNamespace(inventory_items=endpoint))
+    )
+    monkeypatch.setattr(config.netbox, "bulk_size", 100)
+    monkeypatch.setattr(inventory_module.plan, "enabled", False)
+    inventory = object.__new__(Inventory)
+    inventory.pending_creates, inventory.pending_deletes = [], []
+    return inventory, endpoint
+
+
+def test_flush_netbox_inventory(inventory):
+    inventory, endpoint = inventory
+    nb_items = [SimpleNamespace(id=i) for i in range(3)]
+    for kind, nb_item in zip(("cpu", "disk", "gpu"), nb_items):
+        inventory.delete_netbox_inventory_item(nb_item)
+        inventory.queue_netbox_inventory_item(
+            device=1, name=kind, tags=[{"name": INVENTORY_TAG[kind]["name"]}]
+        )
+
+    # the items of every kind are sent in a single request per action
+    inventory.flush_netbox_inventory()
+    assert [action for action, _ in endpoint.requests] == ["delete", "create"]
+    assert endpoint.requests[0][1] == nb_items
+    assert [item["name"] for item in endpoint.requests[1][1]] == ["cpu", "disk", "gpu"]
+    assert inventory.pending_creates == inventory.pending_deletes == []
+
+
+def test_flush_netbox_inventory_empty(inventory):
+    inventory, endpoint = inventory
+    inventory.flush_netbox_inventory()
+    assert endpoint.requests == []
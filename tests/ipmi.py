@@ -0,0 +1,84 @@
+import ctypes
+import errno
+
+import pytest
+
+from netbox_agent import ipmi
+from netbox_agent.config import config
+from netbox_agent.ipmi import (
+    IPMI,
+    IPMI_RECV,
+    IPMI_REQ,
+    IPMICTL_RECEIVE_MSG_TRUNC,
+    IPMICTL_SEND_COMMAND,
+    IPMIDevice,
+)
+
+# responses of a BMC on channel 8, by (netfn, cmd, data)
+RESPONSES = {
+    (0x06, 0x42, bytes([8])): bytes([0, 8, 0x04, 0x01, 0x80, 0xF2, 0x1B, 0, 0, 0]),
+    (0x0C, 0x02, bytes([8, 3, 0, 0])): bytes([0, 0x11, 10, 192, 2, 1]),
+    (0x0C, 0x02, bytes([8, 5, 0, 0])): bytes([0, 0x11, 0x98, 0xF2, 0xB3, 0xF0, 0xEE, 0x1E]),
+    (0x0C, 0x02, bytes([8, 6, 0, 0])): bytes([0, 0x11, 255, 255, 240, 0]),
+    (0x0C, 0x02, bytes([8, 20, 0, 0])): bytes([0, 0x11, 0x2C, 0x81]),
+}
+
+
+class FakeIPMIDevice(IPMIDevice):
+    """
+    OpenIPMI device answering as a BMC, from a regular file
+    """
+
+    def _ioctl(self, request, arg):
+        if request == IPMICTL_SEND_COMMAND:
+            _, _, msgid, netfn, cmd, length, data = IPMI_REQ.unpack(arg)
+            # completion code 0xcb: requested data not present
+            self.response = RESPONSES.get((netfn, cmd, ctypes.string_at(data, length)), b"\xcb")
+            self.response_msgid = msgid
+            return 0
+        assert request == IPMICTL_RECEIVE_MSG_TRUNC
+        values = list(IPMI_RECV.unpack(arg))
+        ctypes.memmove(values[7], self.response, len(self.response))
+        values[3], values[6] = self.response_msgid, len(self.response)
+        IPMI_RECV.pack_into(arg, 0, *values)
+        return 0
+
+
+def test_ipmi_device(tmp_path, monkeypatch):
+    device = tmp_path / "ipmi0"
+    device.write_bytes(b"")
+    monkeypatch.setattr(ipmi, "IPMIDevice", FakeIPMIDevice)
+    monkeypatch.setattr(config.cache, "directory", str(tmp_path / "cache"))
+    monkeypatch.setattr(config.cache, "ipmi_ttl", 3600)
+
+    lan = IPMI(device=str(device))
+    assert lan.parse() == {
+        "name": "IPMI",
+        "mtu": 1500,
+        "bonding": False,
+        "mac": "98:F2:B3:F0:EE:1E",
+        "vlan": 300,
+        "ip": ["10.192.2.1/20"],
+        "ipmi": True,
+    }
+
+    # the BMC isn't queried again before `cache.ipmi_ttl`
+    device.unlink()
+    assert IPMI(device=str(device)).parse() == lan.parse()
+
+
+class HungIPMIDevice(FakeIPMIDevice):
+    def command(self, netfn, cmd, data=b""):
+        self.calls = getattr(self, "calls", 0) + 1
+        raise OSError(errno.ETIMEDOUT, "No answer from the BMC")
+
+
+def test_ipmi_device_timeout(tmp_path):
+    device = tmp_path / "ipmi0"
+    device.write_bytes(b"")
+    with HungIPMIDevice(str(device)) as ipmi_device:
+        with pytest.raises(OSError) as e:
+            ipmi_device.get_lan_channel()
+        # the other channels aren't tried
+        assert e.value.errno == errno.ETIMEDOUT
+        assert ipmi_device.calls == 1
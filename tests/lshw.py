@@ -0,0 +1,84 @@
+import io
+import json
+import tracemalloc
+
+from netbox_agent.lshw import LSHW, LSHW_CLASSES, NODE_FIELDS, get_command, load
+from tests.benchmarks.lshw import synthetic_dump
+from tests.conftest import parametrize_with_fixtures
+
+
+def prune(value, fields=NODE_FIELDS):
+    if isinstance(value, list):
+        return [prune(v, fields) for v in value]
+    if isinstance(value, dict) and fields is not None:
+        return {k: prune(v, fields[k]) for k, v in value.items() if k in fields}
+    return value
+
+
+def test_lshw_command():
+    assert get_command() == ["lshw", "-quiet", "-json"]
+    assert get_command(list(LSHW_CLASSES)) == ["lshw", "-quiet", "-json"]
+    command = get_command(["cpu", "storage"])
+    assert command[3:] == [
+        "-class",
+        "processor",
+        "-class",
+        "storage",
+        "-class",
+        "disk",
+        "-disable",
+        "spd",
+        "-disable",
+        "network",
+    ]
+
+
+@parametrize_with_fixtures("lshw/", only_filenames=["classes.json"])
+def test_lshw_classes(fixture):
+    lshw = LSHW(classes=["cpu", "memory", "network", "storage", "gpu"], output=fixture)
+    assert [cpu["location"] for cpu in lshw.cpus] == ["Proc 1", "Proc 2"]
+    assert len(lshw.memories) == 1
+    assert lshw.memories[0]["size"] == 4
+    assert [i["name"] for i in lshw.interfaces] == ["eno1", "unknown0"]
+    assert [d["logicalname"] for d in lshw.disks] == ["/dev/sda"]
+    assert lshw.gpus[0]["product"] == "MGA G200EH"
+    assert lshw.motherboard == "Motherboard"
+
+
+@parametrize_with_fixtures("lshw/", only_filenames=["classes-unwrapped.json"])
+def test_lshw_unwrapped(fixture):
+    # nodes printed one after another, without a list
+    with open("tests/fixtures/lshw/classes.json") as f:
+        expected = LSHW(output=f)
+    for streaming in (False, True):
+        lshw = LSHW(output=fixture, streaming=streaming)
+        for attr in ("cpus", "memories", "interfaces", "disks", "gpus"):
+            assert getattr(lshw, attr) == getattr(expected, attr)
+    assert len(load(io.StringIO(fixture.replace("\n}\n", "\n},\n")), fields=None)) == 8
+
+
+@parametrize_with_fixtures("lshw/", only_filenames=["classes.json"])
+def test_lshw_streaming(fixture):
+    expected = prune(json.loads(fixture))
+    assert load(io.StringIO(fixture)) == expected
+    # values cut by the end of the read chunks
+    assert load(io.StringIO(fixture), chunk_size=7) == expected
+
+    lshw, streamed = LSHW(output=fixture), LSHW(output=fixture, streaming=True)
+    for attr in ("cpus", "memories", "interfaces", "disks", "gpus", "motherboard"):
+        assert getattr(streamed, attr) == getattr(lshw, attr)
+
+
+def test_lshw_streaming_peak_memory(tmp_path):
+    path = tmp_path / "lshw.json"
+    path.write_text(synthetic_dump(switch_depth=3))
+    with open(path) as f:
+        tracemalloc.start()
+        try:
+            lshw = LSHW(output=f, streaming=True)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    assert len(lshw.disks) == 90
+    # neither the whole output nor its full tree are ever held
+    assert peak < path.stat().st_size
@@ -1,4 +1,13 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+from netbox_agent import network
+from netbox_agent.config import config
 from netbox_agent.lldp import LLDP
+from netbox_agent.netlink import parse_addresses, parse_links
+from netbox_agent.network import Network, get_interface_class
 from tests.conftest import parametrize_with_fixtures
 
 
@@ -34,3 +43,132 @@ def test_lldp_parse_with_vlan(fixture):
     lldp = LLDP(fixture)
     assert lldp.get_switch_vlan("eth0") == {"300": {"pvid": True}}
     assert lldp.get_switch_vlan("eth1") == {"300": {}}
+    assert lldp.get_switch_ip("eth0") is None
+    assert lldp.get_switch_port("eth0") is None
+
+
+@parametrize_with_fixtures(
+    "lldp/",
+    only_filenames=[
+        "qfx.json",
+    ],
+)
+def test_lldp_parse_json(fixture):
+    lldp = LLDP(fixture)
+    assert lldp.get_switch_ip("eth0") == "10.192.192.116"
+    assert lldp.get_switch_port("eth0") == "xe-0/0/1"
+    assert lldp.get_switch_vlan("eth0") == {"296": {"pvid": True}}
+    # the IPv6 link-local address comes after the IPv4 one
+    assert lldp.get_switch_ip("eth1") == "10.192.192.115"
+    assert lldp.get_switch_port("eth1") == "xe-0/0/1"
+    assert lldp.get_switch_vlan("eth1") == {"296": {"pvid": True}, "300": {}}
+    assert lldp.get_switch_port("eth2") is None
+
+
+def test_interface_class(tmp_path):
+    for interface, type_id in (("lo", 772), ("eno1", 1), ("bond0", 1), ("bond0.100", 1)):
+        (tmp_path / interface).mkdir()
+        (tmp_path / interface / "type").write_text("{}\n".format(type_id))
+    (tmp_path / "veth1").mkdir()
+    (tmp_path / "eno1/device").symlink_to(tmp_path)
+    (tmp_path / "bond0/bonding").mkdir()
+
+    classes = {i: get_interface_class(i, sysfs=str(tmp_path)) for i in os.listdir(tmp_path)}
+    assert classes == {
+        "lo": "loopback",
+        "eno1": "physical",
+        "bond0": "bond",
+        "bond0.100": "vlan",
+        "veth1": "virtual",
+    }
+
+
+def test_scan_links():
+    with open("tests/fixtures/netlink/links", "rb") as f:
+        links = parse_links(f.read())
+    with open("tests/fixtures/netlink/addresses", "rb") as f:
+        addresses = parse_addresses(f.read())
+
+    nics = {nic["name"]: nic for nic in Network.scan_links(links, addresses)}
+    assert list(nics) == ["lo", "ifb0", "ifb1", "eth0", "veth1", "veth0", "br0"]
+    assert nics["lo"]["mac"] is None
+    assert nics["lo"]["ip"] is None
+    # the alias veth0:1 isn't veth0
+    assert nics["veth0"]["ip"] == ["10.0.0.1/24", "2001:db8::1/64"]
+    assert nics["veth0"]["mac"] == "FE:4C:11:AE:60:70"
+    assert nics["veth0"]["virtual"]
+    assert nics["eth0"]["mtu"] == 1400
+    assert not nics["br0"]["bonding"]
+
+
+class SlowEthtool:
+    """
+    Ethtool taking the time of the ethtool commands, counting the probes
+    running at once
+    """
+
+    lock = threading.Lock()
+    running = 0
+    max_running = 0
+
+    def __init__(self, interface, timeout=None):
+        self.interface = interface
+
+    def parse(self, probes):
+        cls = type(self)
+        with cls.lock:
+            cls.running += 1
+            cls.max_running = max(cls.max_running, cls.running)
+        time.sleep(0.05)
+        with cls.lock:
+            cls.running -= 1
+        return {"mac_address": "02:00:00:00:00:{:02x}".format(len(self.interface))}
+
+
+def test_probe_interfaces_workers(monkeypatch):
+    monkeypatch.setattr(network, "Ethtool", SlowEthtool)
+    monkeypatch.setattr(config.network, "probe_workers", 8)
+    monkeypatch.setattr(config.network, "primary_mac", "permanent")
+    names = ["eth{}".format(i) for i in range(16)] + ["lo"]
+    nics = [({"name": name, "mac": None}, "physical") for name in names]
+
+    monkeypatch.setattr(SlowEthtool, "max_running", 0)
+    nics = Network.probe_interfaces(nics, {"physical": (0, len(nics))})
+    assert 1 < SlowEthtool.max_running <= 8
+    assert [nic["name"] for nic in nics] == names
+    assert nics[-1]["mac"] == "02:00:00:00:00:02"
+
+
+class StubInterfaces:
+    def __init__(self, interfaces):
+        self.interfaces = interfaces
+        self.filters = []
+
+    def filter(self, **filters):
+        self.filters.append(filters)
+        return self.interfaces
+
+
+def test_netbox_network_cards_index(monkeypatch):
+    eth0 = SimpleNamespace(id=1, name="eth0", mac_address="02:00:00:00:00:01")
+    eth1 = SimpleNamespace(id=2, name="eth1", mac_address=None)
+    interfaces = StubInterfaces([eth0, eth1])
+    nics = object.__new__(Network)
+    nics.nb_nics = None
+    nics.nb_net = SimpleNamespace(interfaces=interfaces)
+    nics.custom_arg_id = {"device_id": 42}
+
+    # the interfaces are fetched once, then looked up by name or MAC address
+    monkeypatch.setattr(config.network, "nic_id", "name")
+    assert nics.get_netbox_network_card({"name": "eth1", "mac": None}) is eth1
+    assert nics.get_netbox_network_card({"name": "eth2", "mac": None}) is None
+    monkeypatch.setattr(config.network, "nic_id", "mac")
+    assert nics.get_netbox_network_card({"name": "eth2", "mac": "02:00:00:00:00:01"}) is eth0
+    assert interfaces.filters == [{"device_id": 42}]
+
+    # a renamed interface is found by its new name only
+    monkeypatch.setattr(config.network, "nic_id", "name")
+    nics._rename_netbox_network_card(eth0, "eno1")
+    assert nics.get_netbox_network_card({"name": "eno1", "mac": None}) is eth0
+    assert nics.get_netbox_network_card({"name": "eth0", "mac": None}) is None
+    assert nics.nb_nics_by_mac["02:00:00:00:00:01"] is eth0
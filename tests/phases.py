@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from netbox_agent.phases import Phases, current_phase, set_phase
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+@pytest.fixture
+def handler():
+    root = logging.getLogger()
+    handler, level = ListHandler(), root.level
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    yield handler
+    root.removeHandler(handler)
+    root.setLevel(level)
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_phases_sequential(handler):
+    calls = []
+    phases = Phases()
+    phases.add("network", lambda: calls.append(current_phase()))
+    phases.add("inventory", lambda: calls.append(current_phase()))
+    phases.run()
+    assert calls == ["network", "inventory"]
+    assert set(phases.timings) == {"network", "inventory"}
+    assert handler.messages[-1].startswith("Phases wall time: network ")
+
+
+def test_phases_logs(handler):
+    network_started, psu_done = threading.Event(), threading.Event()
+
+    def network():
+        logging.info("network 1")
+        network_started.set()
+        # logs of the threads started by the phase
+        with ThreadPoolExecutor(
+            max_workers=2, initializer=set_phase, initargs=(current_phase(),)
+        ) as pool:
+            list(pool.map(lambda i: logging.info("probe %s", i), range(2)))
+        psu_done.wait(5)
+        # the logs of the phases done before are held back until it is done
+        assert wait_for(lambda: phases.timings.keys() == {"inventory", "psu"})
+        assert handler.messages == ["before"]
+        logging.info("network 2")
+
+    def inventory():
+        # the phases end in the reverse order they were added
+        assert wait_for(lambda: "psu" in phases.timings)
+        logging.info("inventory 1")
+        logging.info("inventory 2")
+
+    def psu():
+        network_started.wait(5)
+        logging.info("psu")
+        psu_done.set()
+
+    phases = Phases(workers=3)
+    phases.add("network", network)
+    phases.add("inventory", inventory)
+    phases.add("psu", psu)
+    logging.info("before")
+    phases.run()
+
+    messages = handler.messages
+    assert messages[0] == "before"
+    assert messages[1] == "network 1"
+    assert sorted(messages[2:4]) == ["probe 0", "probe 1"]
+    assert messages[4:8] == ["network 2", "inventory 1", "inventory 2", "psu"]
+    assert messages[8].startswith("Phases wall time: network ")
+
+
+def test_phases_unphased_logs(handler):
+    done = threading.Event()
+
+    def hung():
+        logging.info("hung")
+        done.wait(5)
+
+    def check():
+        # the logs of the other threads aren't held back
+        thread = threading.Thread(target=logging.info, args=("other thread",))
+        thread.start()
+        thread.join()
+        assert "other thread" in handler.messages
+        assert "hung" not in handler.messages
+        done.set()
+
+    phases = Phases(workers=2)
+    phases.add("hung", hung)
+    phases.add("check", check)
+    phases.run()
+    assert "hung" in handler.messages
+
+
+def test_phases_error(handler):
+    calls = []
+
+    def fail():
+        logging.info("failing")
+        raise RuntimeError("network failed")
+
+    phases = Phases(workers=2)
+    phases.add("network", fail)
+    phases.add("inventory", lambda: calls.append("inventory"))
+    with pytest.raises(RuntimeError, match="network failed"):
+        phases.run()
+    # the other phases still run and the logs of the failed one are kept
+    assert calls == ["inventory"]
+    assert "failing" in handler.messages
+    assert set(phases.timings) == {"network", "inventory"}
+    # the root handlers are restored
+    assert not any(h.filters for h in logging.getLogger().handlers)
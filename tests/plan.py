@@ -0,0 +1,93 @@
+import pytest
+
+import netbox_agent.plan as plan_module
+from netbox_agent.config import config
+from netbox_agent.plan import Plan
+
+
+class FakeEndpoint:
+    """
+    pynetbox endpoint recording the requests sent to it
+    """
+
+    def __init__(self, name):
+        self.url = "http://netbox/api/dcim/{}/".format(name.replace("_", "-"))
+        self.requests = []
+
+    def create(self, *args, **data):
+        self.requests.append(("create", args[0] if args else data))
+
+    def update(self, objects):
+        self.requests.append(("update", objects))
+
+    def delete(self, ids):
+        self.requests.append(("delete", ids))
+
+
+class FakeRecord:
+    def __init__(self, endpoint, id, **updates):
+        self.endpoint = endpoint
+        self.id = id
+        self._updates = updates
+
+    def updates(self):
+        return self._updates
+
+
+@pytest.fixture
+def endpoints(monkeypatch):
+    endpoints = {
+        "dcim.manufacturers": FakeEndpoint("manufacturers"),
+        "dcim.inventory_items": FakeEndpoint("inventory_items"),
+    }
+    monkeypatch.setattr(plan_module, "get_endpoint", endpoints.__getitem__)
+    monkeypatch.setattr(config.netbox, "bulk_size", 2)
+    return endpoints
+
+
+def test_plan_create_dedup(endpoints):
+    plan = Plan(enabled=True)
+    manufacturers = endpoints["dcim.manufacturers"]
+    assert plan.create(manufacturers, name="HP", slug="hp") is None
+    # the same object is looked up again by the next sync methods
+    assert plan.create(manufacturers, slug="hp", name="HP") is None
+    plan.create(manufacturers, name="Dell", slug="dell")
+    assert [c.data["name"] for c in plan.changes] == ["HP", "Dell"]
+    assert manufacturers.requests == []
+
+
+def test_plan_save_merges_updates(endpoints):
+    plan = Plan(enabled=True)
+    items = endpoints["dcim.inventory_items"]
+    assert plan.save(FakeRecord(items, 1, name="disk0")) is True
+    assert plan.save(FakeRecord(items, 1, serial="S1")) is True
+    assert plan.save(FakeRecord(items, 2)) is False
+    assert len(plan) == 1
+    assert plan.changes[0].data == {"name": "disk0", "serial": "S1"}
+
+
+def test_plan_apply_groups(endpoints, tmp_path):
+    plan = Plan(enabled=True)
+    manufacturers, items = endpoints["dcim.manufacturers"], endpoints["dcim.inventory_items"]
+    plan.create(manufacturers, name="HP", slug="hp")
+    plan.bulk_create(items, [{"name": "disk{}".format(i)} for i in range(3)])
+    plan.save(FakeRecord(items, 1, serial="S1"))
+    plan.create(manufacturers, name="Dell", slug="dell")
+    plan.bulk_delete(items, [FakeRecord(items, 2), FakeRecord(items, 3)])
+    assert plan.summary() == {"create": 5, "update": 1, "delete": 2}
+
+    # reloaded from its JSON, as with --apply
+    path = tmp_path / "plan.json"
+    path.write_text(plan.to_json())
+    applied = Plan.load(str(path))
+    # one request per group (endpoint, action) and per `netbox.bulk_size` objects
+    assert applied.apply() == 5
+    assert manufacturers.requests == [
+        ("create", [{"name": "HP", "slug": "hp"}, {"name": "Dell", "slug": "dell"}]),
+    ]
+    assert items.requests == [
+        ("create", [{"name": "disk0"}, {"name": "disk1"}]),
+        ("create", [{"name": "disk2"}]),
+        ("update", [{"serial": "S1", "id": 1}]),
+        ("delete", [2, 3]),
+    ]
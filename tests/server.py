@@ -1,4 +1,8 @@
+from types import SimpleNamespace
+
+from netbox_agent import server as server_module
 from netbox_agent.dmidecode import parse
+from netbox_agent.network import Network
 from netbox_agent.server import ServerBase
 from netbox_agent.vendors.hp import HPHost
 from netbox_agent.vendors.qct import QCTHost
@@ -88,3 +92,39 @@ def test_hp_blade_with_gpu_expansion(fixture):
     assert server.is_blade() is True
     assert server.own_expansion_slot() is True
     assert server.get_expansion_service_tag() == "4242 expansion"
+
+
+class StubIPAddresses:
+    def __init__(self, ips):
+        self.ips = ips
+        self.filters = []
+
+    def filter(self, **filters):
+        self.filters.append(filters)
+        return self.ips
+
+
+def test_netbox_ipmi_ip(monkeypatch):
+    ipmi_ip = SimpleNamespace(id=2, assigned_object=SimpleNamespace(display="IPMI"))
+    ips = [SimpleNamespace(id=1, assigned_object=SimpleNamespace(display="eth0")), ipmi_ip]
+    ip_addresses = StubIPAddresses(ips)
+    monkeypatch.setattr(
+        server_module, "nb", SimpleNamespace(ipam=SimpleNamespace(ip_addresses=ip_addresses))
+    )
+    server = object.__new__(ServerBase)
+    device = SimpleNamespace(id=42)
+
+    # the network isn't synced, the IP addresses of the device are queried
+    server.network = None
+    assert server.get_netbox_ipmi_ip(device) is ipmi_ip
+    # nor is its IP addresses snapshot taken
+    server.network = object.__new__(Network)
+    server.network.netbox_ips = None
+    assert server.get_netbox_ipmi_ip(device) is ipmi_ip
+    assert ip_addresses.filters == [{"device_id": 42}] * 2
+
+    # the snapshot taken while syncing the network is reused
+    server.network.get_netbox_ipmi_ip = lambda: ips[0]
+    server.network.netbox_ips = {1: ips[0]}
+    assert server.get_netbox_ipmi_ip(device) is ips[0]
+    assert len(ip_addresses.filters) == 2
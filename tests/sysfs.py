@@ -0,0 +1,69 @@
+from netbox_agent.dmidecode import parse
+from netbox_agent.sysfs import Sysfs
+from tests.conftest import parametrize_with_fixtures
+
+
+@parametrize_with_fixtures("dmidecode/", only_filenames=["HP_DL380p_Gen8"])
+def test_sysfs_collector(fixture):
+    hw = Sysfs(parse(fixture), root="tests/fixtures/sysfs")
+
+    assert hw.get_hw_linux("cpu") == [
+        {
+            "product": "Intel(R) Xeon(R) CPU E5-2650 0 @ 2.00GHz",
+            "vendor": "Intel Corp.",
+            "description": "CPU",
+            "location": "Proc 1",
+        },
+        {
+            "product": "Intel(R) Xeon(R) CPU E5-2650 0 @ 2.00GHz",
+            "vendor": "Intel Corp.",
+            "description": "CPU",
+            "location": "Proc 2",
+        },
+    ]
+    assert hw.memories[0] == {
+        "slot": "PROC  1 DIMM  1",
+        "description": "DIMM DDR3 Synchronous Registered (Buffered) 1333 MHz (0.8 ns)",
+        "id": "bank:0",
+        "serial": "4242",
+        "vendor": "HP",
+        "product": "647647-071",
+        "size": 4.0,
+    }
+    assert [d["logicalname"] for d in hw.disks] == ["/dev/nvme0n1", "/dev/sda"]
+    assert hw.disks[1] == {
+        "logicalname": "/dev/sda",
+        "product": "INTEL SSDSC2KB480G8",
+        "serial": "PHYF0001",
+        "version": "XCV10110",
+        "size": 480103981056,
+        "description": "ATA Disk",
+        "type": "ATA Disk",
+    }
+    assert hw.disks[0]["product"] == "SAMSUNG MZQLB960HAJR-00007"
+    assert hw.disks[0]["description"] == "NVME"
+    assert hw.interfaces == [
+        {
+            "name": "eno1",
+            "macaddress": "98:f2:b3:f0:ee:1e",
+            "serial": "98:f2:b3:f0:ee:1e",
+            "product": "Ethernet Controller X710 for 10GbE SFP+",
+            "vendor": "Intel Corporation",
+            "description": "Ethernet interface",
+        },
+        {
+            "name": "unknown0",
+            "macaddress": "",
+            "serial": "",
+            "product": "Ethernet Controller X710 for 10GbE SFP+",
+            "vendor": "Intel Corporation",
+            "description": "Ethernet interface",
+        },
+    ]
+    assert hw.gpus == [
+        {
+            "product": "TU104GL [Tesla T4]",
+            "vendor": "NVIDIA Corporation",
+            "description": "3D controller",
+        }
+    ]